@@ -1,4 +1,7 @@
-import argparse, json
+import argparse, json, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.pipeline import format_answer
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
@@ -6,9 +9,7 @@ if __name__ == "__main__":
     p.add_argument("--output", required=True)
     args = p.parse_args()
 
-    # Simple formatter: split into lines and prefix bullets
-    lines = args.raw.split("\n")
-    formatted = "\n".join(f"- {line.strip()}" for line in lines if line.strip())
+    formatted = format_answer(args.raw)
 
     with open(args.output, "w") as f:
         json.dump({"formatted": formatted}, f)
@@ -1,23 +1,26 @@
-import argparse, json, subprocess
+import argparse, json, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.pipeline import generate
+from second_brain.resources import get_context_packer
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--question", required=True)
-    p.add_argument("--context", required=True)
+    ctx = p.add_mutually_exclusive_group(required=True)
+    ctx.add_argument("--context")
+    ctx.add_argument("--context-file", help="read the context from a file instead of argv")
     p.add_argument("--output", required=True)
+    p.add_argument("--max-context-tokens", type=int, default=config.CONTEXT_TOKEN_BUDGET)
     args = p.parse_args()
 
-    prompt = (
-        "You are an academic assistant. Use the context below to answer.\n\n"
-        f"Context:\n{args.context}\n\n"
-        f"Question: {args.question}\n\n"
-        "Answer in detail:"
-    )
-
-    result = subprocess.run(
-        ["ollama", "run", "llama3", prompt],
-        capture_output=True, text=True
-    )
-    answer = result.stdout.strip()
+    context = args.context
+    if args.context_file:
+        with open(args.context_file, encoding="utf-8") as f:
+            context = f.read()
+    # whole [n] entries are dropped from the end, so citations stay valid
+    context = get_context_packer().fit_context(context, budget_tokens=args.max_context_tokens)
+    answer = generate(args.question, context)
     with open(args.output, "w") as f:
         json.dump({"answer": answer}, f)
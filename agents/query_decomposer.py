@@ -1,15 +1,16 @@
-import argparse, json
+import argparse, json, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.pipeline import decompose
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--input", required=True)
     p.add_argument("--output", required=True)
+    p.add_argument("--mode", choices=["rules", "llm", "off"], default=config.DECOMPOSE_MODE)
     args = p.parse_args()
 
-    # For now, we don’t decompose—just pass through
-    decomposed = {
-        "primary": args.input,
-        "subquestions": []
-    }
+    decomposed = decompose(args.input, mode=args.mode)
     with open(args.output, "w") as f:
         json.dump(decomposed, f)
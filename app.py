@@ -1,15 +1,20 @@
 import os
 import sys
-import json
 import subprocess
-import tempfile
 from glob import glob
 
-import gradio as gr
+from second_brain import warmup as warmup_mod   # first: startup is timed from here
+from second_brain import config, tracing
+from second_brain.filters import filter_options, load_catalog
+from second_brain.pipeline import serving_stats, stream_pipeline
+from second_brain.resources import get_worker_pool
+from second_brain.serving import ServerBusy
 
-# Paths (same as before)
-AGENTS_DIR = "agents"
-DATA_DIR   = "data"
+# Loads the embedder, collection and LLM in the background once the UI is up
+warmup = warmup_mod.Warmup()
+
+# Paths (the data dir the scripts use, SECOND_BRAIN_DATA included)
+DATA_DIR   = config.DATA_DIR
 RAW_PDF_DIR    = os.path.join(DATA_DIR, "raw_pdfs")
 RAW_AUDIO_DIR  = os.path.join(DATA_DIR, "audio")
 DIAGRAMS_DIR   = os.path.join(DATA_DIR, "diagrams")
@@ -21,7 +26,21 @@ RAG_SCRIPT     = os.path.join("scripts", "build_rag_db.py")
 for d in (RAW_PDF_DIR, RAW_AUDIO_DIR, DIAGRAMS_DIR, PROCESSED_TEXT, PROCESSED_AUDIO):
     os.makedirs(d, exist_ok=True)
 
+def run_stage(name, script):
+    # wall time of the child process: spawn, imports and model loads included
+    with tracing.span(f"ingest.{name}"):
+        subprocess.run([sys.executable, script], check=True)
+
 def ingest_and_reindex(files):
+    with tracing.request("ingest") as trace:
+        status = _ingest_and_reindex(files)
+    if trace is not None:
+        stages = ", ".join(f"{s['name'][7:]} {s['ms'] / 1000:.1f} s"
+                           for s in trace.spans if s["name"].startswith("ingest."))
+        status += f"\n({stages})"
+    return status
+
+def _ingest_and_reindex(files):
     did_pdf = did_audio = False
     for path in files:
         fname, ext = os.path.basename(path.name), os.path.splitext(path.name)[1].lower()
@@ -37,93 +56,146 @@ def ingest_and_reindex(files):
             out.write(inp.read())
 
     if did_pdf:
-        subprocess.run([sys.executable, "scripts/extract_text.py"], check=True)
-        subprocess.run([sys.executable, "scripts/extract_images.py"], check=True)
+        # text and images in one parallel pass over each new/changed PDF
+        run_stage("extract_pdfs", "scripts/extract_pdfs.py")
     if did_audio:
-        subprocess.run([sys.executable, "scripts/extract_audio.py"], check=True)
+        run_stage("extract_audio", "scripts/extract_audio.py")
 
-    subprocess.run([sys.executable, "scripts/normalize_data.py"], check=True)
-    subprocess.run([sys.executable, RAG_SCRIPT], check=True)
+    run_stage("normalize", "scripts/normalize_data.py")
+    run_stage("build_rag_db", RAG_SCRIPT)
     return "✅ Ingestion and reindexing complete."
 
-def call_agent(script, args):
-    cmd = [sys.executable, script]
-    for k, v in args.items():
-        cmd += [f"--{k}", v]
-    subprocess.run(cmd, check=True)
-    return json.load(open(args["output"], encoding="utf-8"))
-
-def pipeline(query: str) -> str:
+def source_filter_options(source_types=None):
+    # read from the catalog build_rag_db writes, not from the index;
+    # files are narrowed to the selected source types
+    catalog = load_catalog(config.SOURCE_CATALOG)
+    types = filter_options(catalog)["source_types"]
+    if source_types:
+        catalog = {k: e for k, e in catalog.items() if str(e["source_type"]) in source_types}
+    opts = filter_options(catalog)
+    opts["source_types"] = types
+    return opts
+
+def refresh_filters(source_types=None, source_files=None):
+    import gradio as gr
+    opts = source_filter_options(source_types)
+    files = [f for f in (source_files or []) if f in opts["source_files"]]
+    pages = f"Pages/segments {opts['page_min']}–{opts['page_max']}" \
+        if opts["page_min"] is not None else "No page numbers indexed"
+    return (gr.update(choices=opts["source_types"]),
+            gr.update(choices=opts["source_files"], value=files),
+            gr.update(info=pages))
+
+def pipeline(query: str, source_types=None, source_files=None, page_min=None, page_max=None):
     if not query:
-        return "Please enter a question."
+        yield "Please enter a question.", []
+        return
 
+    filters = {"source_type": source_types, "source_file": source_files,
+               "page_min": page_min, "page_max": page_max}
     try:
-        with tempfile.TemporaryDirectory() as tmp:
-            # 1) Decompose
-            dec = call_agent(
-                os.path.join(AGENTS_DIR, "query_decomposer.py"),
-                {"input": query, "output": os.path.join(tmp, "decomp.json")}
-            )
-            primary = dec["primary"]
-
-            # 2) Retrieve (with timing)
-            ctx_out = os.path.join(tmp, "ctx.json")
-            ctx = call_agent(
-                os.path.join(AGENTS_DIR, "retrieve_context.py"),
-                {"question": primary, "output": ctx_out}
-            )
-            context = ctx.get("context", "")
-            rt = ctx.get("retrieval_time_s")
-
-            # 3) Generate
-            raw = call_agent(
-                os.path.join(AGENTS_DIR, "generate_answer.py"),
-                {"question": primary, "context": context, "output": os.path.join(tmp, "raw.json")}
-            )
-
-            # 4) Format
-            fmt = call_agent(
-                os.path.join(AGENTS_DIR, "format_answer.py"),
-                {"raw": raw.get("answer", ""), "output": os.path.join(tmp, "fmt.json")}
-            )
-            answer_text = fmt.get("formatted", "")
-
-        # Append timing footer if available
-        if rt is not None:
-            answer_text += f"\n\n_(retrieval took {rt} s)_"
-
-        return answer_text
-
+        # Bounded worker pool: wait for a slot, or get rejected when the
+        # queue is full. Tokens are shown as the LLM produces them.
+        with get_worker_pool().slot():
+            for result in stream_pipeline(query, filters):
+                images = [p for p in result["images"] if p and os.path.exists(p)]
+                if not result["done"]:
+                    yield result["answer"], images
+                    continue
+
+                answer_text = result["formatted"]
+                rt = result.get("retrieval_time_s")
+
+                # Append timing footer if available
+                if rt is not None:
+                    answer_text += f"\n\n_(retrieval took {rt} s"
+                    stages = ", ".join(f"{k[:-2]} {v} s" for k, v in result["timings"].items()
+                                       if k.endswith("_s"))
+                    if stages:
+                        answer_text += f": {stages}"
+                    answer_text += ")_"
+
+                yield answer_text, images
+                warmup.record_answer()
+
+    except ServerBusy as e:
+        yield f"⏳ {e}", []
     except Exception as e:
         # Surface any errors in the UI
-        return f"❌ Error during pipeline execution: {e}"
+        yield f"❌ Error during pipeline execution: {e}", []
 
-def safe_pipeline(query):
+def safe_pipeline(query, *filters):
     try:
-        return pipeline(query)
+        yield from pipeline(query, *filters)
     except Exception as e:
-        return f"❌ Error: {e}"
-
-with gr.Blocks() as demo:
-    gr.Markdown("## AI Second Brain\nUpload materials, reindex, then ask questions.")
-
-    with gr.Tab("Manage Corpus"):
-        upload     = gr.File(file_count="multiple", label="Upload PDFs, audio, or images")
-        ingest_btn = gr.Button("Ingest & Reindex")
-        ingest_out = gr.Textbox(label="Status")
-        ingest_btn.click(ingest_and_reindex, inputs=[upload], outputs=[ingest_out])
-
-    with gr.Tab("Ask Questions"):
-        with gr.Row():
-            with gr.Column(scale=1):
-                question = gr.Textbox(lines=4, placeholder="Enter your question…", label="Your Question")
-                ask_btn  = gr.Button("Ask AI Second Brain")
-            with gr.Column(scale=1):
-                # The key change is adding max_lines=10
-                # This makes the Textbox scrollable once content exceeds 10 lines.
-                answer   = gr.Textbox(lines=10, max_lines=10, label="Answer", interactive=False)
-
-        ask_btn.click(safe_pipeline, inputs=[question], outputs=[answer])
+        yield f"❌ Error: {e}", []
+
+def server_status():
+    return {"warmup": warmup.stats(), **serving_stats()}
+
+def build_ui():
+    # gradio is imported here so importing app (e.g. for ingest_and_reindex)
+    # stays cheap
+    import gradio as gr
+
+    with gr.Blocks() as demo:
+        gr.Markdown("## AI Second Brain\nUpload materials, reindex, then ask questions.")
+        readiness = gr.Markdown(warmup.summary())
+        gr.Timer(1.0).tick(warmup.summary, inputs=[], outputs=[readiness])
+
+        with gr.Tab("Manage Corpus"):
+            upload     = gr.File(file_count="multiple", label="Upload PDFs, audio, or images")
+            ingest_btn = gr.Button("Ingest & Reindex")
+            ingest_out = gr.Textbox(label="Status")
+            ingest_event = ingest_btn.click(ingest_and_reindex, inputs=[upload], outputs=[ingest_out])
+
+        with gr.Tab("Ask Questions"):
+            with gr.Row():
+                with gr.Column(scale=1):
+                    question = gr.Textbox(lines=4, placeholder="Enter your question…", label="Your Question")
+                    # searched before ranking, so only matching chunks are considered
+                    opts = source_filter_options()
+                    with gr.Accordion("Filter sources", open=False):
+                        source_types = gr.Dropdown(opts["source_types"], multiselect=True,
+                                                   label="Source type")
+                        source_files = gr.Dropdown(opts["source_files"], multiselect=True,
+                                                   label="Source file")
+                        with gr.Row():
+                            page_min = gr.Number(label="From page/segment", precision=0)
+                            page_max = gr.Number(label="To page/segment", precision=0)
+                        refresh_btn = gr.Button("Refresh sources", size="sm")
+                    ask_btn  = gr.Button("Ask AI Second Brain")
+                with gr.Column(scale=1):
+                    # The key change is adding max_lines=10
+                    # This makes the Textbox scrollable once content exceeds 10 lines.
+                    answer   = gr.Textbox(lines=10, max_lines=10, label="Answer", interactive=False)
+                    figures  = gr.Gallery(label="Related figures", columns=3, height="auto")
+
+            filters = [source_types, source_files, page_min, page_max]
+            ask_btn.click(safe_pipeline, inputs=[question, *filters], outputs=[answer, figures])
+            source_types.change(lambda types, files: refresh_filters(types, files)[1:],
+                                inputs=[source_types, source_files],
+                                outputs=[source_files, page_min])
+            refresh_btn.click(refresh_filters, inputs=[source_types, source_files],
+                              outputs=[source_types, source_files, page_min])
+            ingest_event.then(refresh_filters, inputs=[source_types, source_files],
+                              outputs=[source_types, source_files, page_min])
+
+        with gr.Tab("Server Status"):
+            status_btn = gr.Button("Refresh")
+            status_out = gr.JSON(label="Queue depth, wait times, batching and caches")
+            status_btn.click(server_status, inputs=[], outputs=[status_out])
+            # empty unless SECOND_BRAIN_TRACE=1
+            metrics_out = gr.Textbox(lines=12, max_lines=30, label="Metrics (Prometheus text format)")
+            status_btn.click(tracing.export_prometheus, inputs=[], outputs=[metrics_out])
+
+    # Let requests reach the worker pool, which does the queuing and rejection
+    demo.queue(default_concurrency_limit=config.SERVE_WORKERS + config.SERVE_MAX_QUEUE)
+    return demo
 
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    demo = build_ui()
+    demo.launch(prevent_thread_lock=True)
+    print(f"[app] UI up {warmup_mod.since_launch()} s after start; warming up models…", flush=True)
+    warmup.start()
+    demo.block_thread()
\ No newline at end of file
@@ -1,58 +1,71 @@
 import os
-import json
-import subprocess
+import sys
 
-from sentence_transformers import SentenceTransformer
-import chromadb
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.images import format_image_hit
+from second_brain.pipeline import search_images
+from second_brain.resources import get_context_packer, get_llm
+from second_brain.retrieval import chunk_embeddings, hybrid_search
 
-# 1) Connect to persistent RAG DB
-db_path = os.path.join("data", "chroma_db")
-client = chromadb.PersistentClient(path=db_path)
-collection = client.get_or_create_collection(name="ai_second_brain")
-
-# 2) Load embedding model
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-
-# 3) Config
+# Config (the Chroma collection, BM25 index and embedder are shared
+# through second_brain)
 LLM_MODEL = "llama3"   # change to your Ollama model name
 TOP_K = 5                           # how many chunks to retrieve
-CONTEXT_TOKEN_LIMIT = 1500          # approximate max context length
+CONTEXT_TOKEN_BUDGET = config.CONTEXT_TOKEN_BUDGET   # max context length, in tokens
 
-def retrieve_context(question: str):
-    # embed the question
-    q_emb = embed_model.encode(question).tolist()
-    res = collection.query(query_embeddings=[q_emb], n_results=TOP_K)
-    metas = res["metadatas"][0]
-    docs  = res["documents"][0]
-    # build a single context string, numbered
-    context = []
-    for i, (m, d) in enumerate(zip(metas, docs), 1):
+def retrieve_context(question: str, filters: dict = None):
+    # dense + BM25 search, fused by reciprocal rank; filters (source_type,
+    # source_file, page_min / page_max) restrict both to matching chunks
+    hits  = hybrid_search(question, TOP_K, filters=filters)
+    metas = [h["metadata"] for h in hits]
+    docs  = [h["document"] for h in hits]
+    # one line per chunk: source label and text
+    entries = []
+    for m, d in zip(metas, docs):
         src = f"{m['source_type']}:{m['source_file']} pg/seg {m['page_or_segment']}"
         preview = d.replace("\n", " ")
-        context.append(f"[{i}] {src} — {preview}")
-    # join and truncate if too long
-    full = "\n".join(context)
-    if len(full) > CONTEXT_TOKEN_LIMIT:
-        full = full[:CONTEXT_TOKEN_LIMIT] + "\n[...context truncated]"
-    return full
+        entries.append(f"{src} — {preview}")
+    # CLIP matches for the question, listed after the text chunks
+    images = search_images(question, filters=filters) if config.IMAGE_SEARCH else []
+    image_entries = [format_image_hit(m) for m in images]
+    # pack whole chunks under the token budget (less the image lines),
+    # skipping near-duplicates
+    packer = get_context_packer()
+    reserved = sum(packer.count_tokens([f"[{i}] {e}" for i, e in enumerate(image_entries, 1)]))
+    embeddings = chunk_embeddings([h["id"] for h in hits]) if len(hits) > 1 else None
+    kept, _ = packer.pack([f"[{i}] {e}" for i, e in enumerate(entries, 1)], embeddings,
+                          budget_tokens=CONTEXT_TOKEN_BUDGET, reserved_tokens=reserved)
+    lines = [entries[i] for i in kept] + image_entries
+    return "\n".join(f"[{n}] {line}" for n, line in enumerate(lines, 1))
 
-def generate_answer(question: str, context: str):
-    # craft prompt
-    prompt = (
+def build_prompt(question: str, context: str):
+    return (
         "You are an academic research assistant. Use the following context excerpts to answer the question.\n\n"
         f"Context:\n{context}\n\n"
         f"Question: {question}\n\n"
         "Answer in a clear, detailed manner, citing the context indices when helpful."
     )
-    # call Ollama: prompt is positional
-    result = subprocess.run(
-        ["ollama", "run", LLM_MODEL, prompt],
-        capture_output=True, text=True
-    )
-    if result.returncode != 0:
-        print("❌ Ollama error:", result.stderr)
+
+def generate_answer(question: str, context: str, stream=False,
+                    max_context_tokens=CONTEXT_TOKEN_BUDGET):
+    """
+    Asks Ollama over HTTP; with stream=True, tokens are printed as they arrive.
+    A context over max_context_tokens is trimmed by whole [n] entries.
+    """
+    try:
+        context = get_context_packer().fit_context(context, budget_tokens=max_context_tokens)
+        parts = []
+        for token in get_llm().stream(build_prompt(question, context), model=LLM_MODEL):
+            parts.append(token)
+            if stream:
+                print(token, end="", flush=True)
+        if stream:
+            print()
+        return "".join(parts).strip()
+    except Exception as e:
+        print("❌ Ollama error:", e)
         return ""
-    return result.stdout.strip()
 
 def main():
     while True:
@@ -63,8 +76,7 @@ def main():
         print("\n--- Retrieved Context ---")
         print(ctx)
         print("\n--- Generating Answer ---")
-        ans = generate_answer(q, ctx)
-        print(ans)
+        generate_answer(q, ctx, stream=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+
+# Indexing throughput of the process-pool embedder per worker count:
+#   python scripts/benchmark_embedding.py --workers 1 2 4 8 --out embed_scaling.json
+
+def load_texts(corpus_path, n):
+    texts = []
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        for line in f:
+            text = json.loads(line).get("text", "") if line.strip() else ""
+            if len(text.split()) >= 5:
+                texts.append(text)
+            if len(texts) >= n:
+                break
+    return texts
+
+if __name__ == "__main__":
+    # not at the top: the spawned workers re-import this script
+    from second_brain.embed_pool import default_workers, scaling_report
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--corpus", default=os.path.join(config.DATA_DIR, "corpus.jsonl"))
+    p.add_argument("--texts", type=int, default=4096)
+    p.add_argument("--workers", type=int, nargs="+",
+                   help="worker counts to try (default: powers of two up to the machine default)")
+    p.add_argument("--threads-per-worker", type=int, default=config.EMBED_THREADS_PER_WORKER)
+    p.add_argument("--batch-size", type=int, default=256)
+    p.add_argument("--out", help="write the report as JSON")
+    args = p.parse_args()
+
+    texts = load_texts(args.corpus, args.texts)
+    if not texts:
+        sys.exit(f"[benchmark_embedding] No texts in {args.corpus}; run normalize_data.py first.")
+    counts = args.workers
+    if not counts:
+        top = default_workers(threads_per_worker=args.threads_per_worker)
+        counts = sorted({1, top} | {2 ** i for i in range(top.bit_length()) if 2 ** i <= top})
+
+    print(f"[benchmark_embedding] {len(texts)} texts, {os.cpu_count()} cores, "
+          f"{args.threads_per_worker} threads per worker")
+    rows = scaling_report(texts, counts, args.threads_per_worker, batch_size=args.batch_size)
+    for row in rows:
+        print(f"[benchmark_embedding] {row['workers']:>3} workers: "
+              f"{row['texts_per_s']:>8.1f} texts/s  (x{row['speedup']})")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"cores": os.cpu_count(), "texts": len(texts), "runs": rows}, f, indent=2)
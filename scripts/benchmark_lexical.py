@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.lexical import LexicalIndex
+
+# BM25 query latency at scale: builds (or reuses) a synthetic index of
+# Zipf-distributed terms and replays query mixes, comparing the capped
+# search (config.LEXICAL_MAX_POSTINGS) with an exact full scan.
+#   python scripts/benchmark_lexical.py --chunks 1000000 --index /tmp/bm25_1m.sqlite --out bm25.json
+
+BATCH = 10000
+
+def term(rank):
+    return f"t{rank}"
+
+def build_index(path, chunks, words, vocab, seed=0):
+    """
+    Fills a fresh index with `chunks` synthetic chunks of about `words`
+    terms (0.5x-1.5x) drawn from a Zipf(1) vocabulary; 20% are audio, for
+    filtered queries.
+    """
+    rng = np.random.default_rng(seed)
+    p = 1.0 / np.arange(1, vocab + 1)
+    p /= p.sum()
+    names = np.array([term(r) for r in range(vocab)])
+    index = LexicalIndex(path)
+    t = time.perf_counter()
+    for start in range(0, chunks, BATCH):
+        n = min(BATCH, chunks - start)
+        draws = rng.choice(vocab, size=(n, words + words // 2), p=p)
+        lengths = rng.integers(words // 2, words + words // 2 + 1, size=n)
+        index.add([(f"c{start + i}", " ".join(names[row[:length]]),
+                    {"source_type": "audio" if (start + i) % 5 == 0 else "text",
+                     "source_file": f"doc{(start + i) // 100}.json",
+                     "page_or_segment": (start + i) % 100 + 1})
+                   for i, (row, length) in enumerate(zip(draws, lengths))])
+        print(f"[benchmark_lexical] Indexed {start + n}/{chunks} chunks "
+              f"({time.perf_counter() - t:.0f}s)", flush=True)
+    return index
+
+def query_sets(n, seed=1):
+    """
+    Query mixes by how common their terms are (Zipf rank = commonness).
+    """
+    rng = np.random.default_rng(seed)
+    def queries(ranges):
+        return [" ".join(term(int(rng.integers(lo, hi))) for lo, hi in ranges) for _ in range(n)]
+    return {
+        "common": queries([(5, 100), (5, 100), (20, 300)]),
+        "common+rare": queries([(5, 100), (1000, 20000)]),
+        "rare": queries([(1000, 20000), (1000, 20000)]),
+    }
+
+def run(index, exact, queries, k, filters):
+    """
+    Latency percentiles of the capped search (and the exact one's median),
+    and the share of its top-k that belongs in the exact top-k (a chunk
+    tied with the exact k-th score counts).
+    """
+    latencies, exact_latencies, overlaps = [], [], []
+    for q in queries:
+        t = time.perf_counter()
+        got = index.search(q, k, filters=filters)
+        latencies.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        want = exact.search(q, 5 * k, filters=filters)
+        exact_latencies.append(time.perf_counter() - t)
+        if want:
+            kth = want[min(k, len(want)) - 1][1]
+            exact_scores = dict(want)
+            good = sum(1 for cid, _ in got if exact_scores.get(cid, -1.0) >= kth - 1e-9)
+            overlaps.append(good / min(k, len(want)))
+    ms = np.array(latencies) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            "max_ms": round(float(ms.max()), 1),
+            "exact_p50_ms": round(float(np.median(exact_latencies)) * 1000, 1),
+            "overlap_at_k": round(float(np.mean(overlaps)), 4) if overlaps else None}
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--chunks", type=int, default=1000000)
+    p.add_argument("--words", type=int, default=60, help="terms per synthetic chunk")
+    p.add_argument("--vocab", type=int, default=50000)
+    p.add_argument("--index", default=os.path.join(config.DATA_DIR, "benchmark_lexical.sqlite"),
+                   help="index file; reused when it already holds --chunks chunks")
+    p.add_argument("--queries", type=int, default=50, help="queries per mix")
+    p.add_argument("--k", type=int, default=config.HYBRID_CANDIDATES)
+    p.add_argument("--max-postings", type=int, default=config.LEXICAL_MAX_POSTINGS)
+    p.add_argument("--out", help="write the report as JSON")
+    args = p.parse_args()
+
+    index = LexicalIndex(args.index, max_postings=args.max_postings)
+    if index.count() != args.chunks:
+        index.clear()
+        index = build_index(args.index, args.chunks, args.words, args.vocab)
+        index.max_postings = args.max_postings
+    exact = LexicalIndex(args.index, max_postings=None)
+
+    report = {"chunks": index.count(), "max_postings": args.max_postings, "k": args.k, "runs": []}
+    for filters in (None, {"source_type": "audio"}):
+        for mix, queries in query_sets(args.queries).items():
+            index.search(queries[0], args.k, filters=filters)   # warm the page cache
+            row = {"mix": mix, "filtered": bool(filters),
+                   **run(index, exact, queries, args.k, filters)}
+            report["runs"].append(row)
+            print(f"[benchmark_lexical] {mix:>12}{' (filtered)' if filters else '':<11} "
+                  f"p50 {row['p50_ms']:>7.1f} ms  p95 {row['p95_ms']:>7.1f} ms  "
+                  f"max {row['max_ms']:>7.1f} ms  (exact p50 {row['exact_p50_ms']:>7.1f} ms)  "
+                  f"overlap@{args.k} {row['overlap_at_k']}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
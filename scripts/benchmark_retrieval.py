@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT_DIR)
+
+# Retrieval benchmark: builds a corpus per size in a throwaway data dir,
+# indexes it with build_rag_db, replays a labeled query set and writes
+# latency percentiles, throughput and recall@k / MRR as JSON.
+#   python scripts/benchmark_retrieval.py --sizes 200 1000 5000 --out bench.json
+#   python scripts/benchmark_retrieval.py --corpus data/corpus.jsonl --queries qs.jsonl
+#
+# Each size runs in a fresh process, so the first ("cold") pass pays for
+# empty caches and first-call warm-up; "warm" passes replay the same
+# queries afterwards. Generation goes to scripts/stub_ollama.py, so it
+# measures the client and pipeline overhead, not a model.
+
+# Vocabulary for synthetic documents
+WORDS = (
+    "gradient descent optimizer learning rate momentum regularization dropout "
+    "batch normalization convolution kernel stride pooling attention transformer "
+    "encoder decoder embedding token vocabulary softmax logits entropy loss "
+    "backpropagation activation sigmoid relu tanh layer residual network recurrent "
+    "sequence memory gate vector matrix tensor eigenvalue projection manifold "
+    "kernel bayesian prior posterior likelihood sampling variance bias estimator "
+    "inference latent variational autoencoder generative adversarial discriminator "
+    "reward policy agent environment markov state transition value bellman "
+    "cluster centroid distance similarity cosine retrieval index query ranking "
+    "precision recall threshold calibration ensemble boosting forest decision "
+    "pruning quantization distillation compression sparse dense parameter weight "
+    "initialization convergence stability curvature hessian jacobian spectrum "
+    "fourier signal frequency filter wavelet spectrogram phoneme acoustic speech"
+).split()
+SYLLABLES = "ka ro mi tel van dor shi lu pex zen qua bri os tam vel nor".split()
+VERBS = ["uses", "combines", "improves", "replaces", "extends", "approximates", "stabilizes"]
+
+
+def make_name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+
+
+def synthetic_corpus(n_docs, n_queries, seed=0):
+    """
+    Returns (corpus records, labeled queries). Each document describes a
+    uniquely named method with its own topic words; each query asks about
+    one method and is labeled with that document's source_file.
+    """
+    rng = random.Random(seed)
+    names, records, docs = set(), [], []
+    for d in range(n_docs):
+        name = make_name(rng)
+        while name in names:
+            name = make_name(rng) + rng.choice(SYLLABLES)
+        names.add(name)
+        topic = rng.sample(WORDS, 12)
+        sentences = []
+        for _ in range(rng.randint(6, 14)):
+            a, b, c, e = rng.sample(topic, 4)
+            if rng.random() < 0.6:
+                sentences.append(f"The {name} method {rng.choice(VERBS)} {a} {b} for {c} {e}.")
+            else:
+                filler = rng.sample(WORDS, 3)
+                sentences.append(f"In practice {a} {b} depends on {filler[0]} and {filler[1]} {filler[2]}.")
+        source = f"doc_{d:06d}.pdf"
+        records.append({"source_type": "text", "source_file": source,
+                        "page_or_segment": 1, "text": " ".join(sentences)})
+        docs.append((source, name, topic))
+
+    queries = []
+    for source, name, topic in rng.sample(docs, min(n_queries, len(docs))):
+        a, b = rng.sample(topic, 2)
+        queries.append({"question": f"How does the {name} method relate to {a} and {b}?",
+                        "relevant": [source]})
+    return records, queries
+
+
+def load_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(latencies):
+    """
+    Percentiles (ms) and sequential throughput for a list of seconds.
+    """
+    if not latencies:
+        return None
+    arr = np.asarray(latencies) * 1000
+    total = float(np.sum(latencies))
+    return {
+        "n": len(latencies),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+        "qps": round(len(latencies) / total, 2) if total > 0 else None,
+    }
+
+
+def replay(fn, items, warm_passes):
+    """
+    Calls fn on every item once (cold) and then warm_passes more times.
+    Returns ({"cold": summary, "warm": summary}, results of the first pass).
+    """
+    cold, results = [], []
+    for item in items:
+        t = time.perf_counter()
+        results.append(fn(item))
+        cold.append(time.perf_counter() - t)
+    warm = []
+    for _ in range(warm_passes):
+        for item in items:
+            t = time.perf_counter()
+            fn(item)
+            warm.append(time.perf_counter() - t)
+    return {"cold": summarize(cold), "warm": summarize(warm)}, results
+
+
+def ranking_quality(ranked_hits, queries, k):
+    """
+    recall@k and MRR, with relevance judged on the hit's source_file.
+    """
+    recalls, rr = [], []
+    for hits, q in zip(ranked_hits, queries):
+        relevant = set(q["relevant"])
+        sources = [h["metadata"].get("source_file") for h in hits[:k]]
+        found = relevant.intersection(sources)
+        recalls.append(len(found) / len(relevant))
+        rank = next((i for i, s in enumerate(sources, 1) if s in relevant), None)
+        rr.append(1.0 / rank if rank else 0.0)
+    return {f"recall@{k}": round(float(np.mean(recalls)), 4),
+            "mrr": round(float(np.mean(rr)), 4)}
+
+
+def run_worker(args):
+    """
+    One corpus size, inside a process whose SECOND_BRAIN_DATA points at a
+    fresh data dir. Writes its result dict to args.result.
+    """
+    from second_brain import config
+
+    records = load_jsonl(os.path.join(config.DATA_DIR, "corpus.jsonl"))
+    queries = load_jsonl(os.path.join(config.DATA_DIR, "queries.jsonl"))
+    k = args.k
+    result = {"size": len(records), "queries": len(queries),
+              "vector_backend": config.VECTOR_BACKEND}
+
+    # ingest through the real indexing script
+    t = time.perf_counter()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import build_rag_db
+    build_rag_db.open_stores()
+    result["ingest_startup_s"] = round(time.perf_counter() - t, 3)
+    t = time.perf_counter()
+    build_rag_db.process_corpus(os.path.join(config.DATA_DIR, "corpus.jsonl"),
+                                export_flat=config.VECTOR_BACKEND == "flat")
+    elapsed = time.perf_counter() - t
+    chunks = build_rag_db.collection.count()
+    result["chunks"] = chunks
+    result["ingest"] = {"seconds": round(elapsed, 3),
+                        "chunks_per_s": round(chunks / elapsed, 1) if elapsed > 0 else None}
+
+    from second_brain import pipeline
+    from second_brain.resources import get_embedder, get_reranker
+    from second_brain.retrieval import dense_search, hybrid_search
+
+    t = time.perf_counter()
+    embedder = get_embedder()
+    result["startup_s"] = round(time.perf_counter() - t, 3)
+    questions = [q["question"] for q in queries]
+    latency, quality = {}, {}
+
+    latency["embed"], embeddings = replay(embedder.encode, questions, args.warm_passes)
+    pairs = list(zip(questions, embeddings))
+
+    latency["dense_search"], dense = replay(lambda p: dense_search(p[1], k), pairs,
+                                            args.warm_passes)
+    quality["dense"] = ranking_quality(dense, queries, k)
+    latency["hybrid_search"], hybrid = replay(lambda p: hybrid_search(p[0], k, q_emb=p[1]),
+                                              pairs, args.warm_passes)
+    quality["hybrid"] = ranking_quality(hybrid, queries, k)
+
+    if args.rerank:
+        reranker = get_reranker()
+        n = reranker.candidate_count(k)
+        candidates = [hybrid_search(q, n, q_emb=e) for q, e in pairs]
+        latency["rerank"], reranked = replay(
+            lambda i: reranker.rerank(questions[i], candidates[i], k)[0],
+            range(len(questions)), args.warm_passes)
+        quality["rerank"] = ranking_quality(reranked, queries, k)
+        result["rerank_candidates"] = n
+
+    # end to end through the caches: cold misses, warm hits the exact cache
+    latency["retrieve"], infos = replay(pipeline.retrieve_with_info, questions,
+                                        args.warm_passes)
+    cache_hits = {}
+    for info in infos:
+        cache_hits[info["cache"]] = cache_hits.get(info["cache"], 0) + 1
+    result["cold_cache_outcomes"] = cache_hits
+
+    n_gen = min(args.generate, len(questions))
+    if n_gen:
+        first_token = []
+
+        def generate(i):
+            t = time.perf_counter()
+            got_first = False
+            for _ in pipeline.generate_stream(questions[i], infos[i]["context"]):
+                if not got_first:
+                    first_token.append(time.perf_counter() - t)
+                    got_first = True
+
+        latency["generate"], _ = replay(generate, range(n_gen), args.warm_passes)
+        latency["generate_first_token"] = summarize(first_token)
+
+    result["latency"] = latency
+    result["quality"] = quality
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def run_size(args, records, queries, llm_url):
+    """
+    Writes the corpus into a temporary data dir and benchmarks it in a
+    child process. Returns the child's result dict.
+    """
+    with tempfile.TemporaryDirectory(prefix="sb_bench_") as data_dir:
+        for name, rows in (("corpus.jsonl", records), ("queries.jsonl", queries)):
+            with open(os.path.join(data_dir, name), "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        result_path = os.path.join(data_dir, "result.json")
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--result", result_path,
+               "--k", str(args.k), "--warm-passes", str(args.warm_passes),
+               "--generate", str(args.generate)]
+        if args.rerank:
+            cmd.append("--rerank")
+        env = {**os.environ, "SECOND_BRAIN_DATA": data_dir, "OLLAMA_HOST": llm_url}
+        subprocess.run(cmd, env=env, check=True)
+        with open(result_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def main(args):
+    import stub_ollama
+
+    server = stub_ollama.serve(port=0, delay=args.llm_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    if args.corpus:
+        if not args.queries:
+            raise SystemExit("--corpus needs --queries (JSONL of {question, relevant})")
+        corpora = [(load_jsonl(args.corpus), load_jsonl(args.queries))]
+    else:
+        corpora = [synthetic_corpus(n, args.n_queries, seed=args.seed) for n in args.sizes]
+
+    runs = []
+    for records, queries in corpora:
+        print(f"[benchmark] {len(records)} records, {len(queries)} queries ...", flush=True)
+        run = run_size(args, records, queries, llm_url)
+        runs.append(run)
+        q = run["quality"]["hybrid"]
+        s = run["latency"]["hybrid_search"]["warm"]
+        print(f"[benchmark] {run['chunks']} chunks: hybrid recall@{args.k} "
+              f"{q[f'recall@{args.k}']}, MRR {q['mrr']}, warm p50 {s['p50_ms']} ms, "
+              f"p95 {s['p95_ms']} ms", flush=True)
+    server.shutdown()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {"k": args.k, "warm_passes": args.warm_passes, "rerank": args.rerank,
+                     "llm_delay_s": args.llm_delay, "seed": args.seed,
+                     "corpus": args.corpus or "synthetic"},
+        "runs": runs,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[benchmark] Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000],
+                   help="synthetic corpus sizes (documents)")
+    p.add_argument("--n-queries", type=int, default=100)
+    p.add_argument("--corpus", help="fixture corpus.jsonl instead of synthetic documents")
+    p.add_argument("--queries", help="fixture queries JSONL: {question, relevant: [source_file]}")
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--warm-passes", type=int, default=2)
+    p.add_argument("--rerank", action="store_true", help="also benchmark the cross-encoder")
+    p.add_argument("--generate", type=int, default=20,
+                   help="queries sent to the stubbed LLM (0 to skip)")
+    p.add_argument("--llm-delay", type=float, default=0.0, help="stub seconds between tokens")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", default="benchmark_results.json")
+    # internal: one size inside a child process
+    p.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    p.add_argument("--result", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        run_worker(args)
+    else:
+        main(args)
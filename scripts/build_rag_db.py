@@ -1,62 +1,149 @@
 import os
+import sys
 import json
+import time
+import argparse
 from glob import glob
-from tqdm import tqdm
 
-import chromadb
-from chromadb.utils import embedding_functions
-from sentence_transformers import SentenceTransformer
-from transformers import CLIPProcessor, CLIPModel
-from PIL import Image
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config, tracing
 
-# --- MODIFIED SECTION START ---
+# Embed workers are spawned processes that import this script again as
+# __mp_main__, before their own setup; they only need
+# second_brain.embed_worker, so numpy, torch and chromadb are imported in
+# the building process only.
+if __name__ != "__mp_main__":
+    from tqdm import tqdm
+    import chromadb
 
-# 1) Configure a persistent Chroma client & collection
-# This will save the database to a directory named 'chroma_db'
-# inside your 'data' folder.
-db_path = os.path.join("data", "chroma_db")
-os.makedirs(db_path, exist_ok=True)
-client = chromadb.PersistentClient(path=db_path)
+    from second_brain.chunking import Chunker
+    from second_brain.dedup import DedupIndex
+    from second_brain.embed_pool import EmbedPool, default_workers
+    from second_brain.embedder import backend_signature, load_embedder
+    from second_brain.filters import catalog_entry, load_catalog, save_catalog
+    from second_brain.images import embed_images
+    from second_brain.lexical import LexicalIndex
+    from second_brain.manifest import Manifest, chunk_id, file_hash, text_hash
+    from second_brain.vector_store import FlatIndex, current_generation, export_collection
 
-# Use get_or_create_collection to either create a new collection
-# or load an existing one. This prevents errors on subsequent runs.
-collection = client.get_or_create_collection(
-    name="ai_second_brain",
-    metadata={"description": "Multimodal docs for AI Second Brain"}
-)
+    # Process-pool encoder for multi-core machines, started with the first
+    # batch: one worker per EMBED_THREADS_PER_WORKER cores unless
+    # EMBED_WORKERS or --embed-workers says otherwise (1 = in-process)
+    embed_workers = config.EMBED_WORKERS or default_workers()
 
-# --- MODIFIED SECTION END ---
+COLLECTION_METADATA = {"description": "Multimodal docs for AI Second Brain"}
 
+# Stores and text model, opened by open_stores()
+client = collection = image_collection = lexical_index = dedup_index = None
+text_model = chunker = None
 
-# 2) Load text embedding model (Sentence-Transformer)
-text_model = SentenceTransformer("all-MiniLM-L6-v2")  # fast, small
+def open_stores():
+    """
+    Opens the Chroma collections, the BM25 and dedup indexes and the text
+    embedder. Called by the building process only, so importing this
+    script (as the spawned embed workers do) loads none of them.
+    """
+    global client, collection, image_collection, lexical_index, dedup_index
+    global text_model, chunker
+    # --- MODIFIED SECTION START ---
+
+    # 1) Configure a persistent Chroma client & collection
+    # This will save the database to a directory named 'chroma_db'
+    # inside your 'data' folder.
+    db_path = config.DB_PATH
+    os.makedirs(db_path, exist_ok=True)
+    client = chromadb.PersistentClient(path=db_path)
+
+    # Use get_or_create_collection to either create a new collection
+    # or load an existing one. This prevents errors on subsequent runs.
+    collection = client.get_or_create_collection(
+        name=config.COLLECTION,
+        metadata=COLLECTION_METADATA
+    )
+
+    # CLIP image vectors are 512-dim (text vectors are 384), so they live in
+    # their own collection and are searched with CLIP's text encoder
+    image_collection = client.get_or_create_collection(
+        name=config.IMAGE_COLLECTION,
+        metadata={**COLLECTION_METADATA, "hnsw:space": "cosine"}
+    )
+
+    # BM25 inverted index, kept in sync with the text collection
+    lexical_index = LexicalIndex(config.LEXICAL_INDEX)
+
+    # MinHash/LSH index of the embedded chunks: near-duplicates become aliases
+    dedup_index = DedupIndex(config.DEDUP_INDEX, threshold=config.DEDUP_THRESHOLD,
+                             num_perm=config.DEDUP_NUM_PERM,
+                             bands=config.DEDUP_BANDS) if config.DEDUP else None
+
+    # --- MODIFIED SECTION END ---
+
+    # 2) Load text embedding model (Sentence-Transformer)
+    with tracing.span("load.text_model"):
+        # fast, small; fp32, int8 or ONNX per config.EMBED_BACKEND
+        text_model = load_embedder(config.EMBED_MODEL, config.EMBED_BACKEND, config.EMBED_ONNX_FILE)
+
+    # Sentence-aware chunks packed to the embedder's token budget
+    # (max_seq_length minus the [CLS]/[SEP] tokens)
+    chunker = Chunker(text_model.tokenizer, max_tokens=text_model.max_seq_length - 2)
+
+# 3) CLIP for images, loaded with the first image batch (a text-only
+# corpus never pays for it)
+clip_model = clip_processor = None
 
-# 3) Load CLIP for images
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+def load_clip():
+    global clip_model, clip_processor
+    if clip_model is None:
+        from transformers import CLIPProcessor, CLIPModel
+        with tracing.span("load.clip"):
+            clip_model = CLIPModel.from_pretrained(config.CLIP_MODEL).eval()
+            clip_processor = CLIPProcessor.from_pretrained(config.CLIP_MODEL)
+    return clip_model, clip_processor
 
-def chunk_text(text, max_len=500, overlap=50):
+# Chunks encoded per encode() call and written per collection.upsert()
+DEFAULT_BATCH_SIZE = 256
+
+embed_pool = None
+
+def get_encoder():
+    """
+    Returns what encodes chunk batches: the in-process model, or (with
+    more than one worker) an EmbedPool returning results in input order.
+    """
+    global embed_pool
+    if embed_workers <= 1:
+        return text_model
+    if embed_pool is None:
+        threads = config.EMBED_THREADS_PER_WORKER
+        print(f"[build_rag] Embedding on {embed_workers} worker processes x {threads} threads")
+        embed_pool = EmbedPool(config.EMBED_MODEL, embed_workers, threads,
+                               backend=config.EMBED_BACKEND, onnx_file=config.EMBED_ONNX_FILE,
+                               pin=config.EMBED_PIN_CORES)
+    return embed_pool
+# Images per CLIP forward pass
+IMAGE_BATCH_SIZE = 32
+# Mixed into image sources' hashes: bumped when image vector IDs change
+# (v2: keyed on content alone), so old vectors are replaced once
+IMAGE_ID_SCHEME = "image-ids:v2"
+
+# Last committed corpus byte offset, for --resume after a crash
+CHECKPOINT_FILE = os.path.join(config.DATA_DIR, "build_checkpoint.json")
+# Chunk-count / token statistics of the last run
+CHUNK_STATS_FILE = os.path.join(config.DATA_DIR, "chunk_stats.json")
+
+def chunk_text(text, source_type=None):
     """
-    Splits text into chunks of ~max_len chars with given overlap.
+    Splits text into sentence-aligned chunks that fit the embedder.
     """
-    chunks = []
-    start = 0
-    length = len(text)
-    while start < length:
-        end = min(start + max_len, length)
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        start += max_len - overlap
-    return chunks
+    return chunker.chunk(text, source_type)
 
 # … inside build_rag_db.py …
 
-def embed_and_add(item_id, embedding, metadata):
+def clean_metadata(metadata):
     """
-    Adds an item to ChromaDB collection, cleaning None → "".
+    Chroma only accepts primitive metadata values: replace None → "" and
+    stringify anything else.
     """
-    # clean metadata: only keep primitives, replace None
     clean_meta = {}
     for k, v in metadata.items():
         if v is None:
@@ -66,16 +153,285 @@ def embed_and_add(item_id, embedding, metadata):
         else:
             # if it's something else, convert to string
             clean_meta[k] = str(v)
+    return clean_meta
 
-    collection.add(
-        ids=[item_id],
-        embeddings=[embedding],
-        metadatas=[clean_meta],
-        documents=[clean_meta.get("text_preview", "")]
+def reset_collection():
+    """
+    Drops and recreates the collection (used for --rebuild and for indexes
+    built before content-derived IDs existed).
+    """
+    global collection, image_collection
+    client.delete_collection(name=config.COLLECTION)
+    collection = client.get_or_create_collection(
+        name=config.COLLECTION,
+        metadata=COLLECTION_METADATA
+    )
+    lexical_index.clear()
+    if dedup_index is not None:
+        dedup_index.clear()
+    client.delete_collection(name=config.IMAGE_COLLECTION)
+    image_collection = client.get_or_create_collection(
+        name=config.IMAGE_COLLECTION,
+        metadata={**COLLECTION_METADATA, "hnsw:space": "cosine"}
     )
 
+def embed_and_add_images(batch):
+    """
+    Embeds a batch of (item_id, image_path, metadata) with one CLIP forward
+    pass and upserts them into the image collection. Unreadable images are
+    skipped. Returns (n_added, set of failed IDs).
+    """
+    if not batch:
+        return 0, set()
+    from PIL import Image
+
+    ids, images, metas, failed = [], [], [], set()
+    for item_id, img_path, metadata in batch:
+        try:
+            images.append(Image.open(img_path).convert("RGB"))
+        except Exception as e:
+            print(f"[build_rag] Skipping image {img_path}: {e}")
+            failed.add(item_id)
+            continue
+        ids.append(item_id)
+        metas.append(clean_metadata(metadata))
+    if not ids:
+        return 0, failed
+
+    with tracing.span("clip_embed"):
+        embeddings = embed_images(images, *load_clip())
+    # Upsert, so re-adding an ID after an interrupted run is harmless
+    with tracing.span("chroma_upsert_images"):
+        image_collection.upsert(
+            ids=ids,
+            embeddings=embeddings.tolist(),
+            metadatas=metas,
+            documents=[m.get("text", "") for m in metas]
+        )
+    return len(ids), failed
+
+
+def embed_and_add_batch(batch, batch_size):
+    """
+    Encodes a batch of (item_id, chunk, metadata) with one encode() call
+    and writes it with one collection.upsert(). Returns the number of chunks.
+    """
+    if not batch:
+        return 0
+    ids, chunks, metas = zip(*batch)
+    # One forward pass per batch; returns an (n, dim) NumPy array
+    with tracing.span("embed"):
+        embeddings = get_encoder().encode(
+            list(chunks), batch_size=batch_size,
+            convert_to_numpy=True, show_progress_bar=False
+        )
+    clean_metas = [clean_metadata(m) for m in metas]
+    with tracing.span("chroma_upsert"):
+        collection.upsert(
+            ids=list(ids),
+            embeddings=embeddings.tolist(),
+            metadatas=clean_metas,
+            # the full chunk text, so generation sees more than a preview
+            documents=list(chunks)
+        )
+    with tracing.span("lexical_index"):
+        lexical_index.add(zip(ids, chunks, clean_metas))
+    return len(ids)
+
+
+def delete_ids(ids, target=None, batch_size=5000):
+    """
+    Removes vectors by ID (from the text collection unless another target
+    is given), in slices to stay under Chroma's batch limit.
+    """
+    target = target if target is not None else collection
+    ids = list(ids)
+    for i in range(0, len(ids), batch_size):
+        target.delete(ids=ids[i:i + batch_size])
+    if target is collection:
+        lexical_index.delete(ids)
+    return len(ids)
+
+
+def update_aliases(canonical_ids, batch_size=5000):
+    """
+    Writes each canonical chunk's current alias list (source_type,
+    source_file, page_or_segment of its near-duplicates) into its
+    "aliases" metadata, as JSON, and into the BM25 index, where search
+    filters match chunks through their aliases too.
+    """
+    ids = sorted(canonical_ids)
+    aliases = dedup_index.aliases(ids)
+    for i in range(0, len(ids), batch_size):
+        got = collection.get(ids=ids[i:i + batch_size], include=["metadatas"])
+        if got["ids"]:
+            collection.update(
+                ids=got["ids"],
+                metadatas=[{**m, "aliases": json.dumps(aliases[cid])}
+                           for cid, m in zip(got["ids"], got["metadatas"])]
+            )
+            lexical_index.set_aliases((cid, aliases[cid]) for cid in got["ids"])
+
+
+def backfill_lexical_index(page_size=1000):
+    """
+    Builds the BM25 index from the documents already in the collection
+    (for indexes created before it, or before it stored chunk metadata).
+    """
+    total = collection.count()
+    for offset in tqdm(range(0, total, page_size), desc="Backfilling BM25 index"):
+        got = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+        lexical_index.add(zip(got["ids"], got["documents"], got["metadatas"]))
+
+
+def iter_lines(f):
+    """
+    Streams (line, end_offset) pairs from a binary file handle, so the
+    corpus is never held in memory and progress can follow the byte offset.
+    """
+    offset = f.tell()
+    for raw in iter(f.readline, b""):
+        offset += len(raw)
+        yield raw.decode("utf-8"), offset
+
+
+def iter_sources(lines, salt=""):
+    """
+    Groups consecutive corpus records by source (type + file) and yields
+    (source_key, records, content_hash, end_offset). normalize_data writes
+    each source's records contiguously, so one pass is enough and only one
+    source is held in memory at a time. `salt` (the chunker signature and
+    embedding backend) is mixed into the hash, so changing the chunking or
+    the embedding runtime re-embeds every source.
+    """
+    key, records, raw, end = None, [], [], 0
+    for idx, (line, offset) in enumerate(lines):
+        if not line.strip():
+            end = offset
+            continue
+        try:
+            doc = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"[build_rag] Warning: Skipping malformed JSON at byte {end}")
+            end = offset
+            continue
+        doc_key = f"{doc.get('source_type')}:{doc.get('source_file')}"
+        if doc_key != key and records:
+            yield key, records, text_hash(salt + "".join(raw)), end
+            records, raw = [], []
+        key = doc_key
+        records.append(doc)
+        raw.append(line)
+        end = offset
+    if records:
+        yield key, records, text_hash(salt + "".join(raw)), end
+
+
+def load_checkpoint(corpus_path):
+    """
+    Returns the saved checkpoint if it belongs to this exact corpus file
+    (same size and mtime), else None.
+    """
+    if not os.path.exists(CHECKPOINT_FILE):
+        return None
+    with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+        ckpt = json.load(f)
+    st = os.stat(corpus_path)
+    if ckpt.get("size") != st.st_size or ckpt.get("mtime") != st.st_mtime:
+        print("[build_rag] Corpus changed since the checkpoint; starting over.")
+        return None
+    return ckpt
+
+
+def save_checkpoint(corpus_path, offset, seen):
+    st = os.stat(corpus_path)
+    tmp = CHECKPOINT_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"size": st.st_size, "mtime": st.st_mtime,
+                   "offset": offset, "seen": sorted(seen)}, f)
+    os.replace(tmp, CHECKPOINT_FILE)
+
+
+def image_metadata(doc, meta, img_path):
+    """
+    Metadata of an image vector. It is the same for every record of the
+    image: its first PDF page is the source, and every other page it
+    appears on (in any PDF) is an alias, so search filters on any of
+    those PDFs and pages find it.
+    """
+    extra = doc.get("extra", {})
+    occurrences = extra.get("occurrences") or {}
+    places = [(os.path.splitext(pdf)[0] + ".json", page)
+              for pdf, pages in sorted(occurrences.items()) for page in sorted(pages)]
+    if places:
+        meta = {**meta, "source_file": places[0][0], "page_or_segment": places[0][1]}
+    aliases = [{"source_type": "image", "source_file": f, "page_or_segment": p}
+               for f, p in places[1:]]
+    return {**meta, "image_path": img_path, "occurrences": json.dumps(occurrences),
+            "image_file": extra.get("image_file"), "aliases": json.dumps(aliases),
+            "text": doc.get("text") or ""}
+
+
+def source_items(records):
+    """
+    Turns one source's records into {item_id: (kind, payload, metadata)}
+    with content-derived IDs. kind is "text" (payload = chunk) or "image"
+    (payload = image path).
+    """
+    items = {}
+    for doc in records:
+        src_type = doc.get("source_type")
+        src_file = doc.get("source_file")
+        page_seg = doc.get("page_or_segment")
+        text = doc.get("text")
+        meta = {
+            "source_type": src_type,
+            "source_file": src_file,
+            "page_or_segment": page_seg
+        }
+
+        # TEXT / AUDIO: one item per chunk
+        if src_type in ("text", "audio"):
+            if src_type == "audio":
+                # time window of the merged transcript segments
+                extra = doc.get("extra", {})
+                meta = {**meta, "start": extra.get("start"), "end": extra.get("end")}
+            for chunk in chunk_text(text or "", src_type):
+                item_id = chunk_id(src_type, src_file, page_seg, chunk)
+                items[item_id] = ("text", chunk, {**meta, "text_preview": chunk[:100]})
+
+        # IMAGE: keyed on the image bytes alone, so an image shared by
+        # several PDFs is one vector whichever source lists it
+        elif src_type == "image":
+            img_path = doc.get("extra", {}).get("path")
+            if not img_path or not os.path.exists(img_path):
+                print(f"[build_rag] Skipping image entry {src_file} due to missing path.")
+                continue
+            item_id = chunk_id(src_type, "", "", file_hash(img_path))
+            items[item_id] = ("image", img_path, image_metadata(doc, meta, img_path))
+
+        # skip unknown types
+    return items
+
+
+def export_flat_index(version, force=False):
+    """
+    Copies the text collection into the memory-mapped flat index read by
+    the "flat" vector backend, unless it is already at this version.
+    """
+    if not force and current_generation(config.FLAT_INDEX_DIR) is not None:
+        current = FlatIndex(config.FLAT_INDEX_DIR)
+        if current.version == version and current.dtype == config.FLAT_INDEX_DTYPE:
+            return
+    t = time.perf_counter()
+    n = export_collection(collection, config.FLAT_INDEX_DIR,
+                          dtype=config.FLAT_INDEX_DTYPE, version=version)
+    print(f"[build_rag] Flat index: {n} vectors ({config.FLAT_INDEX_DTYPE}) "
+          f"written in {time.perf_counter() - t:.1f}s")
+
 
-def process_corpus(corpus_path):
+def process_corpus(corpus_path, batch_size=DEFAULT_BATCH_SIZE, rebuild=False, resume=False,
+                   export_flat=False):
     # Check if the corpus file exists to avoid errors
     if not os.path.exists(corpus_path):
         print(f"[build_rag] Error: Corpus file not found at {corpus_path}")
@@ -84,64 +440,292 @@ def process_corpus(corpus_path):
             pass # an empty file
         return
 
-    with open(corpus_path, "r", encoding="utf-8") as f:
-        # Read all lines to prevent TQDM from erroring on an empty file
-        lines = f.readlines()
-        if not lines:
-            print("[build_rag] Corpus file is empty. Nothing to process.")
+    manifest = Manifest(config.INDEX_MANIFEST)
+    # An index without a manifest was built with positional IDs that can't
+    # be reconciled with content IDs, so start over once.
+    if rebuild or (not manifest.keys() and collection.count() > 0):
+        print("[build_rag] Rebuilding collection from scratch.")
+        reset_collection()
+        manifest.entries = {}
+        manifest.bump_version()
+        resume = False
+    elif collection.count() > 0 and (lexical_index.count() == 0
+                                     or lexical_index.missing_metadata()
+                                     or (dedup_index is not None and dedup_index.count()[1]
+                                         and not lexical_index.alias_count())):
+        backfill_lexical_index()
+    if dedup_index is not None and not manifest.keys():
+        dedup_index.clear()
+
+    # image vector ID -> sources listing it: a shared image is embedded
+    # once and deleted with the last source that lists it
+    image_refs = {}
+    for key in manifest.keys():
+        for image_id in manifest.get(key).get("image_ids", []):
+            image_refs.setdefault(image_id, set()).add(key)
+    queued_images = set()   # embedded (or queued) in this run
+    image_updates = {}      # stored images whose metadata is rewritten
+
+    pending = []          # text chunks waiting for the next batch
+    pending_images = []   # images waiting for the next CLIP batch
+    failed_images = set()  # kept for the run: other sources may list them
+    ready = []     # sources whose items are all pending (or written)
+    uncommitted = {"text": 0, "image": 0}   # items queued since the last commit
+    seen = set()
+    stats = {"unchanged": 0, "updated": 0, "removed": 0, "added": 0, "deleted": 0,
+             "aliased": 0}
+    # source key -> type, file and page range, for search filters
+    catalog = {} if rebuild else load_catalog(config.SOURCE_CATALOG)
+    dirty_aliases = set()   # canonical chunks whose alias lists changed
+    requeued = set()        # sources whose aliased chunks lost their canonical
+    start = time.perf_counter()
+
+    offset = 0
+    ckpt = load_checkpoint(corpus_path) if resume else None
+    if ckpt:
+        offset = ckpt["offset"]
+        seen.update(ckpt["seen"])
+        print(f"[build_rag] Resuming at byte {offset} ({len(seen)} sources done).")
+
+    def write_pending():
+        nonlocal pending
+        stats["added"] += embed_and_add_batch(pending, batch_size)
+        pending = []
+
+    def write_pending_images():
+        nonlocal pending_images
+        added, failed = embed_and_add_images(pending_images)
+        stats["added"] += added
+        failed_images.update(failed)
+        pending_images = []
+        # a new PDF (or a changed one) may list an image already stored
+        ids = [i for i in image_updates if i not in failed_images]
+        if ids:
+            image_collection.update(ids=ids,
+                                    metadatas=[clean_metadata(image_updates[i]) for i in ids])
+        image_updates.clear()
+
+    def release_images(key, ids):
+        """
+        Drops key's claim on image vectors; deletes those no source lists.
+        """
+        unused = []
+        for image_id in ids:
+            refs = image_refs.get(image_id, set())
+            refs.discard(key)
+            if not refs:
+                image_refs.pop(image_id, None)
+                queued_images.discard(image_id)
+                unused.append(image_id)
+        return delete_ids(unused, image_collection)
+
+    def save_sources():
+        save_catalog(config.SOURCE_CATALOG,
+                     {key: entry for key, entry in catalog.items() if manifest.get(key)})
+
+    def flush_aliases():
+        if dedup_index is None:
             return
+        if dirty_aliases:
+            update_aliases(dirty_aliases)
+            dirty_aliases.clear()
+        dedup_index.commit()
 
-        for idx, line in enumerate(tqdm(lines, desc="Reading corpus")):
-            try:
-                doc = json.loads(line)
-            except json.JSONDecodeError:
-                print(f"[build_rag] Warning: Skipping malformed JSON on line {idx+1}")
+    def delete_text(ids):
+        """
+        delete_ids() for text chunks, keeping the dedup index in step. A
+        source with aliases of a deleted chunk loses those chunk IDs from
+        its manifest entry and is marked stale, so they are indexed again.
+        """
+        ids = list(ids)
+        deleted = delete_ids(ids)
+        if dedup_index is None or not ids:
+            return deleted
+        changed, orphaned = dedup_index.remove(ids)
+        dirty_aliases.update(changed)
+        for key, alias_ids in orphaned.items():
+            entry = manifest.get(key)
+            if entry is None:
                 continue
+            entry["hash"] = ""
+            entry["chunk_ids"] = [i for i in entry.get("chunk_ids", []) if i not in alias_ids]
+            requeued.add(key)
+        return deleted
+
+    def commit(end_offset):
+        nonlocal ready
+        write_pending()
+        write_pending_images()
+        # canonical chunks are stored now; their alias lists can be written
+        flush_aliases()
+        # every item of these sources is now stored: record them
+        for key, digest, text_ids, image_ids in ready:
+            image_ids = [i for i in image_ids if i not in failed_images]
+            manifest.set(key, digest, chunk_ids=text_ids, image_ids=image_ids)
+        ready = []
+        uncommitted.update(text=0, image=0)
+        manifest.save()
+        # with the manifest, so a resumed run keeps the sources done so far
+        save_sources()
+        save_checkpoint(corpus_path, end_offset, seen)
 
-            src_type = doc.get("source_type")
-            src_file = doc.get("source_file")
-            page_seg = doc.get("page_or_segment")
-            text = doc.get("text")
-            meta = {
-                "source_type": src_type,
-                "source_file": src_file,
-                "page_or_segment": page_seg
-            }
-
-            # TEXT / AUDIO: chunk & embed
-            if src_type in ("text", "audio"):
-                chunks = chunk_text(text)
-                for i, chunk in enumerate(chunks):
-                    # Ensure embedding is a list of floats
-                    emb = text_model.encode(chunk).tolist()
-                    item_id = f"{idx}-{i}"
-                    metadata = {**meta, "text_preview": chunk[:100]}
-                    embed_and_add(item_id, emb, metadata)
-
-            # IMAGE: embed via CLIP
-            elif src_type == "image":
-                img_path = doc.get("extra", {}).get("path")
-                if not img_path:
-                    print(f"[build_rag] Skipping image entry at index {idx} due to missing path.")
+    # vectors from another chunking or embedding runtime are stale
+    index_salt = chunker.signature + backend_signature(config.EMBED_BACKEND,
+                                                       config.EMBED_ONNX_FILE)
+    total = os.path.getsize(corpus_path)
+
+    def index_pass(offset, only=None):
+        """
+        Indexes the corpus from `offset` (only the sources in `only`, if
+        given) and commits; returns the end offset.
+        """
+        with open(corpus_path, "rb") as f, \
+                tqdm(total=total, initial=offset, unit="B", unit_scale=True,
+                     desc="Indexing corpus") as pbar:
+            f.seek(offset)
+            for key, records, digest, end in iter_sources(iter_lines(f), salt=index_salt):
+                pbar.update(end - pbar.n)
+                if only is not None and key not in only:
+                    continue
+                if key.startswith("image:"):
+                    digest = text_hash(IMAGE_ID_SCHEME + digest)
+                seen.add(key)
+                catalog[key] = catalog_entry(records)
+                if manifest.is_current(key, digest):
+                    stats["unchanged"] += 1
                     continue
-                try:
-                    image = Image.open(img_path).convert("RGB")
-                    inputs = clip_processor(images=image, return_tensors="pt")
-                    outputs = clip_model.get_image_features(**inputs)
-                    # Ensure embedding is a list of floats
-                    emb = outputs.detach().cpu().numpy()[0].tolist()
-                    item_id = f"{idx}-img"
-                    metadata = {**meta, "image_path": img_path}
-                    embed_and_add(item_id, emb, metadata)
-                except Exception as e:
-                    print(f"[build_rag] Skipping image {img_path}: {e}")
-
-            else:
-                # skip unknown types
-                continue
+
+                stats["updated"] += 1
+                items = source_items(records)
+                old = manifest.get(key) or {}
+                old_images = set(old.get("image_ids", []))
+
+                # vectors of items that changed or disappeared
+                stats["deleted"] += delete_text(set(old.get("chunk_ids", [])) - set(items))
+                stats["deleted"] += release_images(key, old_images - set(items))
+                # (re-read: the deletions may have orphaned aliases of this source)
+                old_text = set((manifest.get(key) or {}).get("chunk_ids", []))
+
+                text_ids, image_ids = [], []
+                for item_id, (kind, payload, metadata) in items.items():
+                    if kind == "text":
+                        text_ids.append(item_id)
+                        if item_id in old_text:
+                            continue
+                        if dedup_index is not None:
+                            canonical, _ = dedup_index.find_or_add(item_id, payload, key, {
+                                k: metadata.get(k)
+                                for k in ("source_type", "source_file", "page_or_segment")})
+                            if canonical != item_id:
+                                # near-duplicate: listed on the kept chunk, not embedded
+                                dirty_aliases.add(canonical)
+                                stats["aliased"] += 1
+                                continue
+                        pending.append((item_id, payload, metadata))
+                        uncommitted["text"] += 1
+                        # keep memory bounded even for very long sources
+                        if len(pending) >= batch_size:
+                            write_pending()
+                    else:
+                        image_ids.append(item_id)
+                        refs = image_refs.setdefault(item_id, set())
+                        stored = item_id in old_images or item_id in queued_images or refs - {key}
+                        refs.add(key)
+                        if stored:
+                            # same vector; the pages it appears on may differ
+                            image_updates[item_id] = metadata
+                            continue
+                        queued_images.add(item_id)
+                        pending_images.append((item_id, payload, metadata))
+                        uncommitted["image"] += 1
+                        if len(pending_images) >= IMAGE_BATCH_SIZE:
+                            write_pending_images()
+
+                ready.append((key, digest, sorted(text_ids), sorted(image_ids)))
+                # sources are batched together; commit once a batch's worth
+                # is queued (full batches may already have been written)
+                if uncommitted["text"] >= batch_size or uncommitted["image"] >= IMAGE_BATCH_SIZE:
+                    commit(end)
+            end = f.tell()
+
+        # flush the last partial batch
+        commit(end)
+        return end
+
+    offset = index_pass(offset)
+
+    # sources that are no longer in the corpus
+    for key in manifest.keys():
+        if key not in seen:
+            entry = manifest.pop(key)
+            stats["deleted"] += delete_text(entry.get("chunk_ids", []))
+            stats["deleted"] += release_images(key, entry.get("image_ids", []))
+            stats["removed"] += 1
+    flush_aliases()
+
+    # sources already passed whose aliases lost their canonical chunk
+    stale = {key for key in requeued if (manifest.get(key) or {}).get("hash") == ""}
+    if stale:
+        print(f"[build_rag] Re-indexing {len(stale)} sources whose duplicate chunks were removed.")
+        index_pass(0, only=stale)
+
+    if stats["updated"] or stats["removed"]:
+        manifest.bump_version()
+    manifest.save()
+    save_sources()
+    # readers key their caches on this, so a changed index invalidates them
+    with open(config.INDEX_VERSION_FILE, "w", encoding="utf-8") as f:
+        f.write(str(manifest.version))
+    if export_flat or config.VECTOR_BACKEND == "flat":
+        export_flat_index(manifest.version, force=rebuild)
+    # the run completed: the next one starts from the top
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+
+    elapsed = time.perf_counter() - start
+    rate = stats["added"] / elapsed if elapsed > 0 else 0.0
+    print(f"[build_rag] Sources: {stats['updated']} new/changed, "
+          f"{stats['unchanged']} unchanged, {stats['removed']} removed")
+    print(f"[build_rag] Embedded {stats['added']} chunks, deleted {stats['deleted']} "
+          f"in {elapsed:.1f}s ({rate:.1f} chunks/sec, batch size {batch_size})")
+    if dedup_index is not None:
+        canonical, aliases = dedup_index.count()
+        print(f"[build_rag] Near-duplicates: {stats['aliased']} new chunks aliased "
+              f"({aliases} aliases of {canonical} unique chunks in the index)")
+
+    # chunk sizes of the sources (re)chunked in this run, for index sizing
+    summary = chunker.stats.summary()
+    with open(CHUNK_STATS_FILE, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    for src_type, s in summary.items():
+        if s["chunks"]:
+            print(f"[build_rag] {src_type}: {s['chunks']} chunks, {s['tokens']} tokens "
+                  f"(mean {s['mean_tokens']}, p95 {s['p95_tokens']}, max {s['max_tokens']})")
 
 if __name__ == "__main__":
-    os.makedirs("data", exist_ok=True)
-    corpus_file = os.path.join("data", "corpus.jsonl")
-    process_corpus(corpus_file)
-    print(f"[build_rag] Done. Collection size: {collection.count()} vectors.")
\ No newline at end of file
+    p = argparse.ArgumentParser()
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                   help="number of chunks encoded and inserted per batch")
+    p.add_argument("--rebuild", action="store_true",
+                   help="drop the collection and re-embed the whole corpus")
+    p.add_argument("--resume", action="store_true",
+                   help="continue from the last checkpointed corpus offset")
+    p.add_argument("--embed-workers", type=int, default=embed_workers,
+                   help=f"embedding processes (default {embed_workers}, one per "
+                        f"{config.EMBED_THREADS_PER_WORKER} cores; 1 = in-process)")
+    p.add_argument("--export-flat", action="store_true",
+                   help="also write the flat index (always on when VECTOR_BACKEND is 'flat')")
+    args = p.parse_args()
+    embed_workers = args.embed_workers
+    open_stores()
+
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    corpus_file = os.path.join(config.DATA_DIR, "corpus.jsonl")
+    process_corpus(corpus_file, batch_size=args.batch_size,
+                   rebuild=args.rebuild, resume=args.resume,
+                   export_flat=args.export_flat)
+    if embed_pool is not None:
+        embed_pool.close()
+    tracing.print_summary("build_rag")
+    print(f"[build_rag] Done. Collection size: {collection.count()} text vectors, "
+          f"{image_collection.count()} image vectors.")
@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.chunking import split_sentences
+from second_brain.embedder import BACKENDS, compare_embedders, load_embedder
+
+# Compares a quantized / ONNX embedding backend with the fp32 model on
+# chunks from the index (or a corpus file) before switching EMBED_BACKEND:
+#   python scripts/check_embedder.py --backend int8
+#   python scripts/check_embedder.py --backend onnx --onnx-file onnx/model_qint8_avx2.onnx
+
+def sample_texts(corpus_path, n, seed=0):
+    """
+    Up to n chunk texts: from the Chroma collection, or from a corpus JSONL.
+    """
+    if corpus_path:
+        with open(corpus_path, "r", encoding="utf-8") as f:
+            texts = [json.loads(line).get("text", "") for line in f if line.strip()]
+    else:
+        from second_brain.resources import get_collection
+        coll = get_collection()
+        texts = coll.get(limit=n * 4, include=["documents"])["documents"]
+    texts = [t for t in texts if t and len(t.split()) >= 5]
+    random.Random(seed).shuffle(texts)
+    return texts[:n]
+
+
+def make_queries(texts, n, seed=0):
+    """
+    Query-like strings: one sentence from each of n chunks.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for text in texts[:n]:
+        sentences = [s for s in split_sentences(text) if len(s.split()) >= 4] or [text]
+        queries.append(rng.choice(sentences))
+    return queries
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--backend", choices=[b for b in BACKENDS if b != "torch"],
+                   default=config.EMBED_BACKEND if config.EMBED_BACKEND != "torch" else "int8")
+    p.add_argument("--onnx-file", default=config.EMBED_ONNX_FILE)
+    p.add_argument("--corpus", help="corpus JSONL to sample from instead of the index")
+    p.add_argument("--texts", type=int, default=2000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=10)
+    args = p.parse_args()
+
+    texts = sample_texts(args.corpus, args.texts)
+    if not texts:
+        sys.exit("[check_embedder] No texts to compare; build the index or pass --corpus.")
+    queries = make_queries(texts, args.queries)
+
+    print(f"[check_embedder] fp32 vs {args.backend} on {len(texts)} texts, {len(queries)} queries")
+    reference = load_embedder(config.EMBED_MODEL, "torch")
+    candidate = load_embedder(config.EMBED_MODEL, args.backend, args.onnx_file)
+    report = compare_embedders(reference, candidate, texts, queries, k=args.k)
+    print(json.dumps(report, indent=2))
+
+    ok = (report["cosine_mean"] >= config.EMBED_CHECK_MIN_COSINE
+          and report[f"recall@{args.k}"] >= config.EMBED_CHECK_MIN_RECALL)
+    if ok:
+        print(f"[check_embedder] PASS: set EMBED_BACKEND = \"{args.backend}\" and rebuild the index.")
+    else:
+        print(f"[check_embedder] FAIL: below cosine {config.EMBED_CHECK_MIN_COSINE} "
+              f"or recall {config.EMBED_CHECK_MIN_RECALL}; keep the fp32 backend.")
+    sys.exit(0 if ok else 1)
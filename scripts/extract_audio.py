@@ -1,55 +1,250 @@
 import os
+import sys
 import json
-import whisper
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 
-def transcribe_file(model, audio_path):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.manifest import Manifest, file_hash
+
+SAMPLE_RATE = 16000   # what Whisper expects
+AUDIO_EXTS = (".mp3", ".wav", ".m4a")
+# seconds each window runs past the next one's start, so words cut at a
+# window boundary are heard whole by one of the two windows
+CHUNK_OVERLAP = 5
+
+# one Whisper model per worker process, loaded by init_worker()
+_model = None
+
+def probe_duration(audio_path):
     """
-    Transcribes a single audio file.
-    Returns a dict: {
-      "filename": <str>,
-      "duration": <float>,
-      "transcript": <str>,
-      "segments": [ {start, end, text}, … ]
-    }
+    Returns the duration in seconds via ffprobe (None if unavailable).
+    """
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", audio_path],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return float(out)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+def load_audio_range(audio_path, start, duration):
+    """
+    Decodes [start, start+duration) seconds to 16 kHz mono float32 with
+    ffmpeg, so a worker only decodes the part it transcribes.
+    """
+    import numpy as np
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-ss", str(start), "-t", str(duration),
+           "-i", audio_path, "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"]
+    raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(raw, np.int16).flatten().astype(np.float32) / 32768.0
+
+def init_worker(model_name, threads):
+    global _model
+    import torch
+    import whisper
+    torch.set_num_threads(threads)
+    _model = whisper.load_model(model_name)
+
+def transcribe_chunk(task):
     """
-    result = model.transcribe(audio_path)
+    Worker: transcribes one time window of a file. Segment timestamps are
+    shifted by the window start so they refer to the whole recording.
+    """
+    audio_path, index, start, duration = task
+    if duration is None:
+        result = _model.transcribe(audio_path)
+    else:
+        result = _model.transcribe(load_audio_range(audio_path, start, duration))
     return {
-        "filename": os.path.basename(audio_path),
-        "duration": result.get("duration", None),
-        "transcript": result["text"].strip(),
+        "index": index,
+        "text": result["text"].strip(),
         "segments": [
             {
-                "start": seg["start"],
-                "end": seg["end"],
+                "start": round(seg["start"] + start, 3),
+                "end": round(seg["end"] + start, 3),
                 "text": seg["text"].strip()
             }
             for seg in result.get("segments", [])
         ],
     }
 
-def main():
-    base_dir = os.path.dirname(__file__)
-    audio_dir = os.path.join(base_dir, "..", "data", "audio")
-    output_dir = os.path.join(base_dir, "..", "data", "processed_audio")
-    os.makedirs(output_dir, exist_ok=True)
+def plan_chunks(audio_path, chunk_seconds, overlap=CHUNK_OVERLAP):
+    """
+    Splits long recordings into windows starting every chunk_seconds and
+    overlapping the next by `overlap` seconds; short ones (or files whose
+    duration can't be probed) are one task.
+    """
+    duration = probe_duration(audio_path)
+    if duration is None or duration <= chunk_seconds:
+        return duration, [(audio_path, 0, 0.0, None)]
+    tasks, start, index = [], 0.0, 0
+    while start < duration:
+        tasks.append((audio_path, index, start,
+                      min(chunk_seconds + overlap, duration - start)))
+        start += chunk_seconds
+        index += 1
+    return duration, tasks
 
-    # Load Whisper model once (you can switch to "small", "medium", etc.)
-    model = whisper.load_model("base")
+def transcript_hash(out_path):
+    """
+    The audio hash recorded in an existing transcript, or None.
+    """
+    if not os.path.exists(out_path):
+        return None
+    try:
+        with open(out_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("sha256")
+    except (OSError, ValueError):
+        return None
+
+def partial_dir(output_dir, fname, digest):
+    return os.path.join(output_dir, ".partial", f"{fname}.{digest[:12]}")
 
-    for fname in tqdm(os.listdir(audio_dir), desc="Transcribing audio"):
-        if not fname.lower().endswith((".mp3", ".wav", ".m4a")):
+def remove_partials(output_dir, fname, keep_digest=None):
+    """
+    Deletes the unfinished chunk directories of fname, except the one for
+    keep_digest (those of earlier versions of the file can't be reused).
+    """
+    root = os.path.join(output_dir, ".partial")
+    if not os.path.isdir(root):
+        return
+    keep = os.path.basename(partial_dir(output_dir, fname, keep_digest)) if keep_digest else None
+    for name in os.listdir(root):
+        if name.startswith(f"{fname}.") and len(name) == len(fname) + 13 and name != keep:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+def stitch(fname, duration, parts, starts):
+    """
+    Joins chunk results (in time order) into one transcript:
+    {"filename", "duration", "transcript", "segments": [{start, end, text}]}.
+    starts maps chunk index to window start. In the overlap of two windows
+    a segment is kept from the earlier window, and the later window's
+    segments are skipped until they pass the end of the last kept one.
+    """
+    parts = sorted(parts, key=lambda p: p["index"])
+    if len(parts) == 1:
+        return {"filename": fname, "duration": duration,
+                "transcript": parts[0]["text"], "segments": parts[0]["segments"]}
+    segments, last_end = [], None
+    for i, part in enumerate(parts):
+        # segments starting after the next window's start belong to it
+        owned_end = starts[parts[i + 1]["index"]] if i + 1 < len(parts) else None
+        for seg in part["segments"]:
+            if owned_end is not None and seg["start"] >= owned_end:
+                continue
+            if last_end is not None and (seg["start"] + seg["end"]) / 2 < last_end:
+                continue
+            segments.append(seg)
+            last_end = seg["end"]
+    return {
+        "filename": fname,
+        "duration": duration,
+        "transcript": " ".join(seg["text"] for seg in segments if seg["text"]).strip(),
+        "segments": segments,
+    }
+
+def main(workers=2, chunk_seconds=600, model_name="base"):
+    audio_dir = os.path.join(config.DATA_DIR, "audio")
+    output_dir = os.path.join(config.DATA_DIR, "processed_audio")
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(audio_dir, exist_ok=True)
+
+    # Transcripts are cached by content hash; keys are "audio:<file name>"
+    manifest = Manifest(config.EXTRACT_MANIFEST)
+    seen, jobs = set(), {}
+    for fname in sorted(os.listdir(audio_dir)):
+        if not fname.lower().endswith(AUDIO_EXTS):
             continue
+        key = f"audio:{fname}"
+        seen.add(key)
         audio_path = os.path.join(audio_dir, fname)
-        print(f"\n→ Transcribing {fname} …")
-        data = transcribe_file(model, audio_path)
-
         out_fname = os.path.splitext(fname)[0] + ".json"
         out_path = os.path.join(output_dir, out_fname)
+        digest = file_hash(audio_path)
+        remove_partials(output_dir, fname, keep_digest=digest)
+        if manifest.is_current(key, digest) and os.path.exists(out_path):
+            continue
+        if transcript_hash(out_path) == digest:
+            # transcript already matches this exact audio (e.g. lost manifest)
+            manifest.set(key, digest, outputs=[out_fname])
+            continue
+        duration, tasks = plan_chunks(audio_path, chunk_seconds)
+
+        # chunks finished by an interrupted run are reused
+        pdir = partial_dir(output_dir, fname, digest)
+        os.makedirs(pdir, exist_ok=True)
+        done = {}
+        for task in tasks:
+            path = os.path.join(pdir, f"chunk_{task[1]:04d}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    done[task[1]] = json.load(f)
+        jobs[fname] = {"key": key, "digest": digest, "duration": duration, "out": out_fname,
+                       "dir": pdir, "tasks": tasks, "done": done}
+
+    # Audio files that were removed: drop their transcripts too
+    for key in manifest.keys():
+        if key.startswith("audio:") and key not in seen:
+            for out_fname in manifest.pop(key).get("outputs", []):
+                out_path = os.path.join(output_dir, out_fname)
+                if os.path.exists(out_path):
+                    os.remove(out_path)
+            remove_partials(output_dir, key[len("audio:"):])
+            print(f"[extract_audio] Removed transcript for deleted {key[len('audio:'):]}")
+
+    def finish(fname):
+        job = jobs[fname]
+        data = stitch(fname, job["duration"], job["done"].values(),
+                      {t[1]: t[2] for t in job["tasks"]})
+        data["sha256"] = job["digest"]
+        out_path = os.path.join(output_dir, job["out"])
         with open(out_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
-
+        manifest.set(job["key"], job["digest"], outputs=[job["out"]])
+        manifest.save()
+        shutil.rmtree(job["dir"], ignore_errors=True)
         print(f"[extract_audio] Saved transcript to {out_path}")
 
+    todo = [t for job in jobs.values() for t in job["tasks"] if t[1] not in job["done"]]
+    for fname, job in jobs.items():
+        if len(job["done"]) == len(job["tasks"]):
+            finish(fname)
+
+    if todo:
+        workers = max(1, min(workers, len(todo)))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(model_name, threads)) as pool:
+            futures = {pool.submit(transcribe_chunk, t): t for t in todo}
+            for fut in tqdm(as_completed(futures), total=len(futures), desc="Transcribing audio"):
+                audio_path, index, _, _ = futures[fut]
+                fname = os.path.basename(audio_path)
+                job = jobs[fname]
+                part = fut.result()
+                # persist each chunk as soon as it is done
+                with open(os.path.join(job["dir"], f"chunk_{index:04d}.json"), "w", encoding="utf-8") as f:
+                    json.dump(part, f, ensure_ascii=False)
+                job["done"][index] = part
+                if len(job["done"]) == len(job["tasks"]):
+                    finish(fname)
+
+    manifest.save()
+
 if __name__ == "__main__":
-    main()
+    p = argparse.ArgumentParser()
+    p.add_argument("--workers", type=int, default=2,
+                   help="worker processes, each with its own Whisper model")
+    p.add_argument("--chunk-seconds", type=int, default=600,
+                   help="long recordings are transcribed in windows of this length "
+                        f"(each overlapping the next by {CHUNK_OVERLAP}s)")
+    p.add_argument("--model", default="base",
+                   help='Whisper model size ("base", "small", "medium", …)')
+    args = p.parse_args()
+    main(workers=args.workers, chunk_seconds=args.chunk_seconds, model_name=args.model)
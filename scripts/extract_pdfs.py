@@ -0,0 +1,247 @@
+import fitz  # PyMuPDF
+import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.manifest import Manifest, file_hash
+
+# One extraction stage for PDFs: each PDF (or page range of a large PDF) is
+# opened once and both its text and its images are pulled in the same pass.
+# Work is spread over a process pool; results are merged in file/page order,
+# so the output is identical regardless of scheduling.
+
+INPUT_DIR  = os.path.join(config.DATA_DIR, "raw_pdfs")
+TEXT_DIR   = os.path.join(config.DATA_DIR, "processed_text")
+IMAGE_DIR  = os.path.join(config.DATA_DIR, "diagrams")
+
+# Images smaller than this (either side, in pixels / encoded bytes) are
+# treated as decoration and not extracted
+MIN_IMAGE_SIDE  = 64
+MIN_IMAGE_BYTES = 2048
+
+def save_image(data, ext):
+    """
+    Writes image bytes under a content-derived name and returns the name.
+    Identical images (across pages, ranges or PDFs) map to one file.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    out_name = f"img_{digest[:16]}.{ext}"
+    out_path = os.path.join(IMAGE_DIR, out_name)
+    if not os.path.exists(out_path):
+        # write-then-rename: concurrent workers may save the same image
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as img_file:
+            img_file.write(data)
+        os.replace(tmp, out_path)
+    return out_name, digest
+
+# A worker's xref -> image info (None if filtered out) for the PDF it last
+# read from. map() hands out a PDF's page ranges one after another, so an
+# image repeated through a document (a logo on every page) is extracted
+# once per worker, not once per range; save_image() dedups the rest.
+_xrefs = {"pdf": None, "info": {}}
+
+def extract_page_range(task):
+    """
+    Worker: extracts text and images from pages [start, end) of one PDF.
+    Returns {"pages": [{"page", "text"}], "images": [{"name", ...}, ...]}
+    with one image entry per (unique image, page) occurrence.
+    """
+    pdf_path, start, end, min_side, min_bytes = task
+    doc = fitz.open(pdf_path)
+    pages, images = [], []
+    if _xrefs["pdf"] != pdf_path:
+        _xrefs.update(pdf=pdf_path, info={})
+    seen_xrefs = _xrefs["info"]
+
+    for page_index in range(start, min(end, len(doc))):
+        page = doc.load_page(page_index)
+
+        text = page.get_text("text")
+        if text.strip():
+            pages.append({"page": page_index + 1, "text": text})
+
+        on_page = set()
+        for img in page.get_images(full=True):
+            xref, width, height = img[0], img[2], img[3]
+            if xref not in seen_xrefs:
+                info = None
+                # tiny decorative images (bullets, rules, spacers) are skipped
+                if width >= min_side and height >= min_side:
+                    base_image = doc.extract_image(xref)
+                    data = base_image["image"]
+                    if len(data) >= min_bytes:
+                        name, digest = save_image(data, base_image.get("ext", "png"))
+                        info = {"name": name, "sha256": digest, "width": width,
+                                "height": height, "bytes": len(data)}
+                seen_xrefs[xref] = info
+            info = seen_xrefs[xref]
+            if info and info["name"] not in on_page:
+                on_page.add(info["name"])
+                images.append({**info, "page": page_index + 1})
+
+    doc.close()
+    return {"pages": pages, "images": images}
+
+def plan_tasks(pdf_path, pages_per_task, min_side, min_bytes):
+    """
+    Splits a PDF into page ranges so very large files use several workers.
+    """
+    with fitz.open(pdf_path) as doc:
+        n_pages = len(doc)
+    return [(pdf_path, start, start + pages_per_task, min_side, min_bytes)
+            for start in range(0, max(n_pages, 1), pages_per_task)]
+
+def load_image_index():
+    if os.path.exists(config.IMAGE_INDEX):
+        with open(config.IMAGE_INDEX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_image_index(index):
+    tmp = config.IMAGE_INDEX + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, config.IMAGE_INDEX)
+
+def remove_outputs(fname, outputs, image_index):
+    """
+    Deletes a PDF's extracted text and forgets its image occurrences; an
+    image file is only deleted once no other PDF uses it.
+    """
+    for name in outputs.get("text", []):
+        path = os.path.join(TEXT_DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
+    for name in outputs.get("images", []):
+        entry = image_index.get(name)
+        if entry:
+            entry["occurrences"].pop(fname, None)
+            if entry["occurrences"]:
+                continue
+            del image_index[name]
+        path = os.path.join(IMAGE_DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+def migrate_legacy_keys(manifest):
+    """
+    Drops the "text:" / "images:" entries of the former extract_text and
+    extract_images scripts. Their images used per-page names that the
+    content-hashed ones replace, so those files are deleted; the PDFs are
+    then extracted once more under "pdf:" keys. Returns the number of
+    entries dropped.
+    """
+    legacy = [key for key in manifest.keys() if key.startswith(("text:", "images:"))]
+    for key in legacy:
+        entry = manifest.pop(key)
+        if key.startswith("images:"):
+            for name in entry.get("outputs", []):
+                path = os.path.join(IMAGE_DIR, name)
+                if os.path.exists(path):
+                    os.remove(path)
+        elif not os.path.exists(os.path.join(INPUT_DIR, key[len("text:"):])):
+            # the PDF is gone; otherwise its text file is rewritten below
+            for name in entry.get("outputs", []):
+                path = os.path.join(TEXT_DIR, name)
+                if os.path.exists(path):
+                    os.remove(path)
+    return len(legacy)
+
+def main(workers=None, pages_per_task=50, min_side=MIN_IMAGE_SIDE, min_bytes=MIN_IMAGE_BYTES):
+    os.makedirs(TEXT_DIR, exist_ok=True)
+    os.makedirs(IMAGE_DIR, exist_ok=True)
+    os.makedirs(INPUT_DIR, exist_ok=True)
+
+    # Only new or changed PDFs are extracted; keys are "pdf:<file name>"
+    manifest = Manifest(config.EXTRACT_MANIFEST)
+    if migrate_legacy_keys(manifest):
+        manifest.save()
+        print("[extract_pdfs] Replaced outputs of the old extract_text / extract_images "
+              "scripts; PDFs are extracted once more.")
+    image_index = load_image_index()
+    seen, todo = set(), []
+    for fname in sorted(os.listdir(INPUT_DIR)):
+        if not fname.lower().endswith(".pdf"):
+            continue
+        key = f"pdf:{fname}"
+        seen.add(key)
+        pdf_path = os.path.join(INPUT_DIR, fname)
+        digest = file_hash(pdf_path)
+        if not manifest.is_current(key, digest):
+            todo.append((fname, pdf_path, digest))
+
+    # PDFs that were removed: drop their outputs too
+    for key in manifest.keys():
+        if key.startswith("pdf:") and key not in seen:
+            remove_outputs(key[len("pdf:"):], manifest.pop(key).get("outputs", {}), image_index)
+            print(f"[extract_pdfs] Removed outputs for deleted {key[len('pdf:'):]}")
+
+    # a changed PDF may have fewer pages/images now: clear the old outputs
+    for fname, _, _ in todo:
+        old = manifest.get(f"pdf:{fname}")
+        if old:
+            remove_outputs(fname, old.get("outputs", {}), image_index)
+
+    tasks, owners = [], []
+    for i, (_, pdf_path, _) in enumerate(todo):
+        for task in plan_tasks(pdf_path, pages_per_task, min_side, min_bytes):
+            tasks.append(task)
+            owners.append(i)
+
+    results = [{"pages": [], "images": []} for _ in todo]
+    if tasks:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            # map() yields in submission order: file order, then page order
+            for owner, part in tqdm(zip(owners, pool.map(extract_page_range, tasks)),
+                                    total=len(tasks), desc="Extracting PDFs"):
+                results[owner]["pages"].extend(part["pages"])
+                results[owner]["images"].extend(part["images"])
+
+    for (fname, _, digest), result in zip(todo, results):
+        out_fname = os.path.splitext(fname)[0] + ".json"
+        with open(os.path.join(TEXT_DIR, out_fname), "w", encoding="utf-8") as f:
+            json.dump(result["pages"], f, ensure_ascii=False, indent=2)
+
+        # unique images of this PDF, with every page each one appears on
+        names = []
+        for occ in result["images"]:
+            entry = image_index.setdefault(occ["name"], {
+                "sha256": occ["sha256"], "width": occ["width"],
+                "height": occ["height"], "bytes": occ["bytes"], "occurrences": {},
+            })
+            pages = entry["occurrences"].setdefault(fname, [])
+            if occ["page"] not in pages:
+                pages.append(occ["page"])
+            if occ["name"] not in names:
+                names.append(occ["name"])
+        for name in names:
+            image_index[name]["occurrences"][fname].sort()
+
+        manifest.set(f"pdf:{fname}", digest,
+                     outputs={"text": [out_fname], "images": names})
+        print(f"[extract_pdfs] Processed {fname}: {len(result['pages'])} pages, "
+              f"{len(names)} unique images ({len(result['images'])} occurrences)")
+    save_image_index(image_index)
+    manifest.save()
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--workers", type=int, default=None,
+                   help="worker processes (default: number of CPUs)")
+    p.add_argument("--pages-per-task", type=int, default=50,
+                   help="large PDFs are split into page ranges of this size")
+    p.add_argument("--min-side", type=int, default=MIN_IMAGE_SIDE,
+                   help="skip images narrower or shorter than this many pixels")
+    p.add_argument("--min-bytes", type=int, default=MIN_IMAGE_BYTES,
+                   help="skip images whose encoded size is below this many bytes")
+    args = p.parse_args()
+    main(workers=args.workers, pages_per_task=args.pages_per_task,
+         min_side=args.min_side, min_bytes=args.min_bytes)
@@ -1,12 +1,32 @@
 import os
+import sys
 from typing import List
 
 # --- Key LangChain Imports ---
 from langchain_community.llms import Ollama
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate # Import PromptTemplate
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.retrieval import hybrid_search
+
+# -----------------------------------------------------------------------------
+# 0) Hybrid (dense + BM25) retriever over the shared index
+# -----------------------------------------------------------------------------
+class HybridRetriever(BaseRetriever):
+    """
+    LangChain wrapper around second_brain's dense + BM25 search, fused by
+    reciprocal rank.
+    """
+    k: int = 5
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return [
+            Document(page_content=hit["document"], metadata=hit["metadata"])
+            for hit in hybrid_search(query, self.k)
+        ]
 
 # -----------------------------------------------------------------------------
 # 1) Build the RetrievalQA chain with a CUSTOM PROMPT
@@ -16,30 +36,11 @@ def build_chain():
     Builds and returns a RetrievalQA chain with a custom prompt.
     """
     # --- Configuration ---
-    CHROMA_PATH = os.path.join("data", "chroma_db")
-    COLLECTION_NAME = "ai_second_brain"
-    EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
     LLM_MODEL = "llama3"
 
-    print("Loading embedding model...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBED_MODEL_NAME,
-        model_kwargs={'device': 'cpu'}
-    )
-    print("Embedding model loaded.")
-
-    print("Loading Chroma vector store...")
-    vector_store = Chroma(
-        persist_directory=CHROMA_PATH,
-        collection_name=COLLECTION_NAME,
-        embedding_function=embeddings
-    )
-    print("Vector store loaded.")
-
-    retriever = vector_store.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": 5}
-    )
+    # The embedding model, Chroma collection and BM25 index are loaded
+    # lazily by second_brain on the first query.
+    retriever = HybridRetriever(k=5)
 
     llm = Ollama(model=LLM_MODEL)
 
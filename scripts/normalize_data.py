@@ -1,9 +1,17 @@
 import os
+import sys
 import json
 from glob import glob
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.chunking import merge_segments
+
+# Transcript segments are merged into windows of about this many seconds
+AUDIO_WINDOW_S = 60
+
 def load_text_chunks(text_dir):
-    for path in glob(os.path.join(text_dir, "*.json")):
+    for path in sorted(glob(os.path.join(text_dir, "*.json"))):
         fname = os.path.basename(path)
         with open(path, 'r', encoding='utf-8') as f:
             pages = json.load(f)
@@ -17,52 +25,78 @@ def load_text_chunks(text_dir):
             }
 
 def load_audio_segments(audio_dir):
-    for path in glob(os.path.join(audio_dir, "*.json")):
+    for path in sorted(glob(os.path.join(audio_dir, "*.json"))):
         fname = os.path.basename(path)
         with open(path, 'r', encoding='utf-8') as f:
             data = json.load(f)
-        # full transcript as one chunk
-        yield {
-            "source_type": "audio",
-            "source_file": fname,
-            "page_or_segment": None,
-            "text": data["transcript"].replace("\n", " ").strip(),
-            "extra": {
-                "duration": data.get("duration"),
+        segments = data.get("segments", [])
+        if not segments:
+            # no timestamps: the full transcript is the only record
+            yield {
+                "source_type": "audio",
+                "source_file": fname,
+                "page_or_segment": None,
+                "text": data["transcript"].replace("\n", " ").strip(),
+                "extra": {
+                    "duration": data.get("duration"),
+                }
             }
-        }
-        # individual segments
-        for idx, seg in enumerate(data.get("segments", []), start=1):
+            continue
+        # segments merged into time windows (the transcript is not repeated)
+        for idx, win in enumerate(merge_segments(segments, window_s=AUDIO_WINDOW_S), start=1):
             yield {
                 "source_type": "audio",
                 "source_file": fname,
                 "page_or_segment": idx,
-                "text": seg["text"].replace("\n", " ").strip(),
+                "text": win["text"].replace("\n", " ").strip(),
                 "extra": {
-                    "start": seg["start"],
-                    "end": seg["end"]
+                    "start": win["start"],
+                    "end": win["end"]
                 }
             }
 
-def load_images(image_dir):
-    for img_path in glob(os.path.join(image_dir, "*.*")):
+def load_images(image_dir, index_path=None):
+    # image_index.json (written by extract_pdfs) lists the PDF pages each
+    # unique image appears on; uploaded diagrams have no entry.
+    # An extracted image gets one record per PDF it appears in, with the
+    # same source_file as that PDF's text and its first page there; the
+    # image's own name is in image_file. build_rag_db stores one vector
+    # per unique image, whichever PDFs list it.
+    index = {}
+    if index_path and os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+
+    records = []
+    for img_path in sorted(glob(os.path.join(image_dir, "*.*"))):
         fname = os.path.basename(img_path)
-        yield {
-            "source_type": "image",
-            "source_file": fname,
-            "page_or_segment": None,
-            "text": f"[Image: {fname}]",  # placeholder text to embed
-            "extra": {
-                "path": img_path
-            }
-        }
+        if fname.endswith(".tmp"):
+            continue
+        occurrences = index.get(fname, {}).get("occurrences", {})
+        owners = sorted(occurrences.items()) or [(None, [])]
+        for pdf_name, pages in owners:
+            records.append({
+                "source_type": "image",
+                "source_file": os.path.splitext(pdf_name)[0] + ".json" if pdf_name else fname,
+                "page_or_segment": min(pages, default=None),
+                "text": f"[Image: {fname}]",  # placeholder text to embed
+                "extra": {
+                    "path": img_path,
+                    "image_file": fname,
+                    "pdf_file": pdf_name,
+                    "occurrences": occurrences
+                }
+            })
+    # build_rag_db reads each source's records as one contiguous run
+    records.sort(key=lambda r: (r["source_file"], r["extra"]["image_file"]))
+    yield from records
 
 def main():
-    base = os.path.dirname(__file__)
-    text_dir  = os.path.join(base, "..", "data", "processed_text")
-    audio_dir = os.path.join(base, "..", "data", "processed_audio")
-    image_dir = os.path.join(base, "..", "data", "diagrams")
-    out_path  = os.path.join(base, "..", "data", "corpus.jsonl")
+    text_dir  = os.path.join(config.DATA_DIR, "processed_text")
+    audio_dir = os.path.join(config.DATA_DIR, "processed_audio")
+    image_dir = os.path.join(config.DATA_DIR, "diagrams")
+    image_index = config.IMAGE_INDEX
+    out_path  = os.path.join(config.DATA_DIR, "corpus.jsonl")
 
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     with open(out_path, "w", encoding="utf-8") as outf:
@@ -70,7 +104,7 @@ def main():
             outf.write(json.dumps(doc, ensure_ascii=False) + "\n")
         for doc in load_audio_segments(audio_dir):
             outf.write(json.dumps(doc, ensure_ascii=False) + "\n")
-        for doc in load_images(image_dir):
+        for doc in load_images(image_dir, image_index):
             outf.write(json.dumps(doc, ensure_ascii=False) + "\n")
 
     print(f"[normalize] Wrote unified corpus to {out_path}")
@@ -1,23 +1,25 @@
 import os
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+import sys
 
-# 1) Connect to persistent DB
-db_path = os.path.join("data", "chroma_db")
-client = chromadb.PersistentClient(path=db_path)
-collection = client.get_or_create_collection(name="ai_second_brain")
-
-# 2) Load query embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config
+from second_brain.images import format_image_hit
+from second_brain.pipeline import search_images
+from second_brain.retrieval import hybrid_search
 
 def query_and_print(text, k=3):
-    q_emb = model.encode(text).tolist()
-    results = collection.query(query_embeddings=[q_emb], n_results=k)
-    for idx, (meta, doc) in enumerate(zip(results["metadatas"][0], results["documents"][0]), 1):
+    # dense + BM25 search, fused by reciprocal rank
+    hits = hybrid_search(text, k)
+    for idx, hit in enumerate(hits, 1):
+        meta, doc = hit["metadata"], hit["document"]
         print(f"\n=== Result {idx} ===")
         print("Source:", meta["source_type"], meta["source_file"], "pg/seg", meta["page_or_segment"])
         print("Preview:", doc)
+    # CLIP matches for the query, from the image collection
+    images = search_images(text) if config.IMAGE_SEARCH else []
+    for idx, meta in enumerate(images, 1):
+        print(f"\n=== Image {idx} ===")
+        print(format_image_hit(meta))
 
 if __name__ == "__main__":
     while True:
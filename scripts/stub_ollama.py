@@ -0,0 +1,79 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A tiny stand-in for the Ollama HTTP API, for testing streaming and
+# benchmarking the pipeline without a real model:
+#   python scripts/stub_ollama.py --port 11434 --delay 0.02
+#   OLLAMA_HOST=http://localhost:11434 python app.py
+
+ANSWER = ("This is a stubbed answer generated from the retrieved context. "
+          "It streams one word at a time so the UI can be tested.")
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real server
+    delay = 0.0
+    answer = ANSWER
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._json(200, {"models": [{"name": "stub"}]})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        req = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/api/generate":
+            self._json(404, {"error": "not found"})
+            return
+        words = self.answer.split(" ") if req.get("prompt") else []
+        if not req.get("stream", True):
+            self._json(200, {"model": req.get("model"), "response": self.answer, "done": True})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            token = word if i == 0 else " " + word
+            self._chunk({"model": req.get("model"), "response": token, "done": False})
+            time.sleep(self.delay)
+        self._chunk({"model": req.get("model"), "response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, msg):
+        data = (json.dumps(msg) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+def serve(port=11434, delay=0.0, answer=ANSWER):
+    """
+    Starts the stub server and returns it (call .serve_forever() or run it
+    in a thread; .shutdown() stops it).
+    """
+    handler = type("Handler", (StubHandler,), {"delay": delay, "answer": answer})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--port", type=int, default=11434)
+    p.add_argument("--delay", type=float, default=0.02, help="seconds between tokens")
+    args = p.parse_args()
+
+    server = serve(args.port, args.delay)
+    print(f"[stub_ollama] Listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,7 @@
+"""
+Importable building blocks for the AI Second Brain.
+
+Models and database clients are loaded lazily, once per process, and then
+reused, so the Gradio app and the CLI can answer many questions without
+paying the start-up cost on every query.
+"""
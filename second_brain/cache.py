@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+def normalize_question(question):
+    """
+    Lower-cases and collapses whitespace so trivially different spellings
+    of the same question share a cache entry.
+    """
+    return re.sub(r"\s+", " ", question.strip().lower())
+
+
+class RetrievalCache:
+    """
+    Bounded retrieval cache stored in SQLite.
+
+    Each entry is a single row, so a miss costs one small write instead of
+    rewriting the whole cache. Entries are evicted least-recently-used once
+    max_entries is exceeded and ignored after ttl_s seconds (if set). Keys
+    include the collection fingerprint, so a reindex invalidates them.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl_s=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(question, k, fingerprint):
+        raw = f"{normalize_question(question)}\x1f{k}\x1f{fingerprint}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl_s is not None and now - created > self.ttl_s:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return json.loads(value)
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN"
+                " (SELECT key FROM entries ORDER BY accessed LIMIT ?)", (excess,)
+            )
+        if self.ttl_s is not None:
+            self._db.execute("DELETE FROM entries WHERE created < ?",
+                             (time.time() - self.ttl_s,))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
@@ -0,0 +1,174 @@
+import re
+
+# Sentence boundary: ., ! or ? (optionally followed by a closing quote or
+# bracket) and whitespace, or a blank line
+_SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]?\s+|\n\s*\n')
+_PUNCT = re.compile(r"[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    WordPiece-like token count without a tokenizer: one per word, one per
+    punctuation mark and one more per 10 characters of long words. It is a
+    sum over words, so the estimate of space-joined texts is the sum of
+    their estimates, and packing by parts stays within the budget.
+    """
+    return sum(1 + len(w) // 10 for w in text.split()) + len(_PUNCT.findall(text))
+
+
+def split_sentences(text):
+    """
+    Splits text into sentences, keeping their punctuation.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+class Chunker:
+    """
+    Sentence-aware chunker that packs whole sentences up to the embedder's
+    token budget, so chunks are neither cut mid-sentence nor silently
+    truncated by the model.
+
+    `tokenizer` is a Hugging Face tokenizer (e.g. SentenceTransformer's
+    .tokenizer); without one, tokens are estimated with estimate_tokens().
+    """
+
+    def __init__(self, tokenizer=None, max_tokens=254, overlap_sentences=1):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_sentences = overlap_sentences
+        self.stats = ChunkStats()
+
+    @property
+    def signature(self):
+        """
+        Changes whenever chunk boundaries would change, so the index can
+        tell that stored chunks are stale.
+        """
+        name = getattr(self.tokenizer, "name_or_path", "estimate")
+        return f"sentences:v1:{name}:{self.max_tokens}:{self.overlap_sentences}"
+
+    def count_tokens(self, texts):
+        """
+        Token counts (without special tokens) for a list of strings.
+        """
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            return [estimate_tokens(t) for t in texts]
+        ids = self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+        return [len(x) for x in ids]
+
+    def _split_long(self, sentence):
+        """
+        Breaks a single over-budget sentence into word windows.
+        """
+        words = sentence.split()
+        # WordPiece tokenizes space-separated words independently (and
+        # estimate_tokens() is a per-word sum), so per-word counts add up
+        pieces, current, current_tokens = [], [], 0
+        for word, n in zip(words, self.count_tokens(words)):
+            if current and current_tokens + n > self.max_tokens:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += n
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def chunk(self, text, source_type=None):
+        """
+        Returns a list of chunk strings for text.
+        """
+        sentences = []
+        raw = split_sentences(text)
+        for sentence, n in zip(raw, self.count_tokens(raw)):
+            if n > self.max_tokens:
+                sentences.extend(self._split_long(sentence))
+            else:
+                sentences.append(sentence)
+        counts = self.count_tokens(sentences)
+
+        chunks, current, current_tokens = [], [], 0
+        for sentence, n in zip(sentences, counts):
+            if current and current_tokens + n > self.max_tokens:
+                chunks.append(" ".join(s for s, _ in current))
+                # carry the last sentence(s) over for context continuity
+                current = current[-self.overlap_sentences:] if self.overlap_sentences else []
+                current_tokens = sum(c for _, c in current)
+                if current_tokens + n > self.max_tokens:
+                    current, current_tokens = [], 0
+            current.append((sentence, n))
+            current_tokens += n
+        if current:
+            chunks.append(" ".join(s for s, _ in current))
+
+        self.stats.add(source_type, self.count_tokens(chunks))
+        return chunks
+
+
+def merge_segments(segments, window_s=60.0, max_chars=1200):
+    """
+    Merges consecutive transcript segments ({start, end, text}) into time
+    windows of at most window_s seconds (and max_chars characters).
+    Returns [{"start", "end", "text"}] with the window's time span.
+    """
+    windows, current = [], None
+    for seg in segments:
+        text = seg.get("text", "").strip()
+        if not text:
+            continue
+        if current is not None and (
+            seg["end"] - current["start"] > window_s
+            or len(current["text"]) + len(text) + 1 > max_chars
+        ):
+            windows.append(current)
+            current = None
+        if current is None:
+            current = {"start": seg["start"], "end": seg["end"], "text": text}
+        else:
+            current["end"] = seg["end"]
+            current["text"] += " " + text
+    if current is not None:
+        windows.append(current)
+    return windows
+
+
+class ChunkStats:
+    """
+    Running chunk-count and token statistics, overall and per source type,
+    for sizing the index.
+    """
+
+    def __init__(self):
+        self.by_type = {}
+
+    def add(self, source_type, token_counts):
+        self.by_type.setdefault(source_type or "unknown", []).extend(token_counts)
+
+    @staticmethod
+    def _summary(counts):
+        if not counts:
+            return {"chunks": 0}
+        ordered = sorted(counts)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))]
+        return {
+            "chunks": len(ordered),
+            "tokens": sum(ordered),
+            "mean_tokens": round(sum(ordered) / len(ordered), 1),
+            "min_tokens": ordered[0],
+            "p50_tokens": pick(0.5),
+            "p95_tokens": pick(0.95),
+            "max_tokens": ordered[-1],
+        }
+
+    def summary(self):
+        everything = [n for counts in self.by_type.values() for n in counts]
+        return {
+            "all": self._summary(everything),
+            **{t: self._summary(c) for t, c in sorted(self.by_type.items())},
+        }
@@ -0,0 +1,131 @@
+import os
+
+# Paths are anchored at the repo root so scripts work from any working dir
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# SECOND_BRAIN_DATA points everything at another data dir (e.g. a benchmark corpus)
+DATA_DIR = os.environ.get("SECOND_BRAIN_DATA", os.path.join(ROOT_DIR, "data"))
+
+# Vector store
+DB_PATH    = os.path.join(DATA_DIR, "chroma_db")
+COLLECTION = "ai_second_brain"
+IMAGE_COLLECTION = "ai_second_brain_images"   # CLIP vectors (512-dim, cosine)
+
+# Dense search backend: "chroma", or "flat" for exact brute-force search
+# over a memory-mapped copy of the embeddings (float16 or int8), exported
+# by build_rag_db. Chroma remains the source of truth either way.
+VECTOR_BACKEND   = "chroma"
+FLAT_INDEX_DIR   = os.path.join(DATA_DIR, "flat_index")
+FLAT_INDEX_DTYPE = "float16"
+
+# Models
+EMBED_MODEL = "all-MiniLM-L6-v2"
+# CPU runtime for EMBED_MODEL: "torch" (fp32), "int8" (dynamic quantization)
+# or "onnx" (ONNX Runtime; EMBED_ONNX_FILE picks e.g. a quantized export).
+# Check quality first: python scripts/check_embedder.py --backend int8
+EMBED_BACKEND   = "torch"
+EMBED_ONNX_FILE = None
+EMBED_CHECK_MIN_COSINE = 0.99    # mean cosine vs fp32 for check_embedder to pass
+EMBED_CHECK_MIN_RECALL = 0.95    # recall@10 vs fp32
+
+# Indexing: shard each chunk batch across embedder processes, each with a
+# fixed torch thread count (pinned to its own cores). None = one worker per
+# EMBED_THREADS_PER_WORKER cores (embed_pool.default_workers()); 1 = encode
+# in-process.
+EMBED_WORKERS            = None
+EMBED_THREADS_PER_WORKER = 4
+EMBED_PIN_CORES          = True
+CLIP_MODEL  = "openai/clip-vit-base-patch32"
+LLM_MODEL   = "llama3"
+
+# Local Ollama-compatible HTTP endpoint (OLLAMA_HOST is Ollama's own variable)
+OLLAMA_URL     = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+LLM_KEEP_ALIVE = "30m"    # keep the model loaded between questions
+LLM_TIMEOUT_S  = 300
+
+# Retrieval
+TOP_K      = 5
+
+# Query decomposition: "rules" splits compound questions with regexes, "llm"
+# asks the local LLM (falling back to the rules), "off" disables it. Each
+# sub-question is retrieved concurrently and the hits are merged by chunk ID.
+DECOMPOSE_MODE         = "rules"
+DECOMPOSE_MAX_PARTS    = 4
+SUBQUERY_WORKERS       = 4
+MULTI_QUERY_MAX_CHUNKS = 10     # merged chunks passed to the LLM
+
+# Prompt context: whole chunks are packed by rank under a token budget, and
+# chunks nearly identical (cosine >= threshold) to a better one are dropped.
+# CONTEXT_TOKENIZER is a Hugging Face tokenizer name for the LLM; None
+# counts with the embedder's tokenizer.
+CONTEXT_TOKEN_BUDGET    = 1500
+CONTEXT_TOKENIZER       = None
+CONTEXT_DEDUP_THRESHOLD = 0.95
+
+# Hybrid retrieval: BM25 over a local inverted index, fused with the dense
+# results by reciprocal-rank fusion
+HYBRID_SEARCH      = True
+HYBRID_CANDIDATES  = 20       # per-retriever candidates before fusion
+RRF_K              = 60
+LEXICAL_INDEX      = os.path.join(DATA_DIR, "lexical_index.sqlite")
+# Postings read per query term at most (highest BM25 impact first); bounds
+# the cost of common terms in large corpora
+LEXICAL_MAX_POSTINGS = 10000
+
+# Near-duplicate chunks at ingestion: MinHash signatures over word 5-grams,
+# LSH-banded (DEDUP_BANDS bands of DEDUP_NUM_PERM / DEDUP_BANDS rows). A chunk
+# whose estimated Jaccard similarity to an indexed one reaches the threshold
+# is not embedded; its source is listed in the kept chunk's "aliases".
+DEDUP           = True
+DEDUP_THRESHOLD = 0.8
+DEDUP_NUM_PERM  = 128
+DEDUP_BANDS     = 16
+DEDUP_INDEX     = os.path.join(DATA_DIR, "dedup_index.sqlite")
+
+# Optional cross-encoder reranking: over-fetch candidates (adaptively, to
+# fit the latency budget), score them in one batch, keep the best TOP_K
+RERANK                 = False
+RERANK_MODEL           = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_MAX_CANDIDATES  = 30
+RERANK_BUDGET_MS       = 150
+
+# Text-to-image search through CLIP's text encoder. CLIP text/image cosine
+# similarities are low (~0.2-0.35), so the cut-off is on cosine distance.
+IMAGE_SEARCH       = True
+IMAGE_TOP_K        = 2
+IMAGE_MAX_DISTANCE = 0.75
+
+# Retrieval cache: SQLite, LRU-bounded, optional TTL (None = never expires)
+CACHE_DB          = os.path.join(DATA_DIR, "retrieve_cache.sqlite")
+CACHE_MAX_ENTRIES = 10000
+CACHE_TTL_S       = None
+
+# Semantic cache: reuse results for near-duplicate questions (cosine >= threshold)
+SEMANTIC_CACHE_SIZE      = 2048
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_ANSWERS   = False   # also reuse generated answers
+
+# Incremental indexing manifests (content hashes -> outputs / vector IDs)
+EXTRACT_MANIFEST = os.path.join(DATA_DIR, "extract_manifest.json")
+INDEX_MANIFEST   = os.path.join(DATA_DIR, "index_manifest.json")
+# Unique extracted images -> size, hash and the PDF pages they appear on
+IMAGE_INDEX = os.path.join(DATA_DIR, "image_index.json")
+
+# Indexed sources with their type and page_or_segment range, written by
+# build_rag_db, so search filters can be offered without scanning the index
+SOURCE_CATALOG = os.path.join(DATA_DIR, "source_catalog.json")
+
+INDEX_VERSION_FILE = os.path.join(DATA_DIR, "index_version")
+
+# Serving: concurrent questions share one embedder / collection / LLM client
+SERVE_WORKERS         = 4      # questions answered at once
+SERVE_MAX_QUEUE       = 16     # waiting questions before new ones are rejected
+SERVE_QUEUE_TIMEOUT_S = 120
+EMBED_BATCH_MAX       = 32     # concurrent query embeddings per encode() call
+EMBED_BATCH_WAIT_MS   = 5
+
+# Tracing: per-stage spans, cache counters and latency histograms
+# (Prometheus text export), off unless SECOND_BRAIN_TRACE=1. With
+# SECOND_BRAIN_PROFILE=<dir>, each traced request also dumps a cProfile.
+TRACING     = os.environ.get("SECOND_BRAIN_TRACE", "0") == "1"
+PROFILE_DIR = os.environ.get("SECOND_BRAIN_PROFILE") or None
+TRACE_KEEP  = 50        # recent request traces kept for the status tab
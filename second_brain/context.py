@@ -0,0 +1,99 @@
+import re
+
+import numpy as np
+
+from .chunking import estimate_tokens
+
+_ENTRY_START = re.compile(r"^\[\d+\] ", re.MULTILINE)
+
+
+class ContextPacker:
+    """
+    Fits retrieved chunks into a token budget for the prompt.
+
+    Hits are taken in rank order and packed whole: a chunk that does not
+    fit is skipped (a shorter, lower-ranked one may still fit) rather than
+    cut mid-sentence. With chunk embeddings, near-duplicates of an already
+    packed chunk are dropped first, so the budget is not spent twice on
+    the same passage.
+
+    Token counts come from `tokenizer` (a Hugging Face tokenizer); without
+    one, they are estimated with chunking.estimate_tokens, as the chunker
+    does.
+    """
+
+    def __init__(self, tokenizer=None, budget_tokens=1500, dedup_threshold=0.95):
+        self.tokenizer = tokenizer
+        self.budget_tokens = budget_tokens
+        self.dedup_threshold = dedup_threshold
+
+    def count_tokens(self, texts):
+        """
+        Token counts (without special tokens) for a list of strings.
+        """
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            return [max(1, estimate_tokens(t)) for t in texts]
+        ids = self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+        return [len(x) for x in ids]
+
+    def _duplicates(self, embeddings):
+        """
+        Marks each row that is a near-duplicate of an earlier (better
+        ranked) row that is not itself a duplicate.
+        """
+        if embeddings is None or self.dedup_threshold is None or len(embeddings) < 2:
+            return [False] * (0 if embeddings is None else len(embeddings))
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        vecs = vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+        sims = vecs @ vecs.T
+        dup, kept = [], []
+        for i in range(len(vecs)):
+            is_dup = bool(kept) and float(sims[i, kept].max()) >= self.dedup_threshold
+            dup.append(is_dup)
+            if not is_dup:
+                kept.append(i)
+        return dup
+
+    def pack(self, entries, embeddings=None, reserved_tokens=0, budget_tokens=None):
+        """
+        Selects entries (formatted context lines, best first) under the
+        budget (`budget_tokens` or the packer's) minus `reserved_tokens`.
+        `embeddings` are optional rows aligned with entries, used for
+        near-duplicate removal.
+        Returns (indices of the kept entries in rank order, stats).
+        """
+        total = self.budget_tokens if budget_tokens is None else budget_tokens
+        budget = max(0, total - reserved_tokens)
+        counts = self.count_tokens(entries)
+        dup = self._duplicates(embeddings) if embeddings is not None else [False] * len(entries)
+
+        kept, used, dropped_dup, dropped_budget = [], 0, 0, 0
+        for i, n in enumerate(counts):
+            if dup[i]:
+                dropped_dup += 1
+            elif used + n > budget:
+                dropped_budget += 1
+            else:
+                kept.append(i)
+                used += n
+        stats = {"tokens": used + reserved_tokens, "budget": total,
+                 "kept": len(kept), "dropped_duplicates": dropped_dup,
+                 "dropped_over_budget": dropped_budget}
+        return kept, stats
+
+    def fit_context(self, context, reserved_tokens=0, budget_tokens=None):
+        """
+        Trims an already numbered context ("[1] ...\\n[2] ...") to the
+        budget, dropping whole entries. Kept entries keep their numbers,
+        so citations still point at the same source.
+        """
+        starts = [m.start() for m in _ENTRY_START.finditer(context)]
+        if not starts:
+            return context
+        bounds = starts + [len(context)]
+        entries = [context[a:b].rstrip("\n") for a, b in zip(bounds, bounds[1:])]
+        kept, _ = self.pack(entries, reserved_tokens=reserved_tokens,
+                            budget_tokens=budget_tokens)
+        return "\n".join(entries[i] for i in kept)
@@ -0,0 +1,52 @@
+import re
+
+# "... and how/what/why ..." starts a new question; "difference between X
+# and Y" does not, because no question word follows the "and"
+_QUESTION_WORDS = (r"what|how|why|when|where|which|who|whom|whose|is|are|was|were|"
+                   r"do|does|did|can|could|should|would|will|explain|describe|"
+                   r"compare|list|give|define|summari[sz]e")
+_CLAUSE_SPLIT = re.compile(
+    rf"\s*(?:;|,?\s+(?:and|also|as well as|plus)\s+(?:also\s+)?)(?=\s*(?:{_QUESTION_WORDS})\b)",
+    re.IGNORECASE,
+)
+# sentence boundaries: after "?" always, after "." / "!" before a capital
+_QUESTION_SPLIT = re.compile(r"(?<=\?)\s+|(?<=[.!])\s+(?=[A-Z])")
+
+MIN_WORDS = 2   # shorter fragments are not worth a retrieval of their own
+
+
+def decompose_rules(question, max_parts=4):
+    """
+    Rule-based decomposition: splits on sentence boundaries, on
+    semicolons, and on "and"/"also" when a new question word follows.
+    Returns the list of sub-questions ([] when the question is simple).
+    """
+    parts = []
+    for sentence in _QUESTION_SPLIT.split(question.strip()):
+        for clause in _CLAUSE_SPLIT.split(sentence):
+            clause = clause.strip(" ,;")
+            if len(clause.split()) >= MIN_WORDS:
+                parts.append(clause)
+    parts = list(dict.fromkeys(parts))
+    return parts[:max_parts] if len(parts) > 1 else []
+
+
+DECOMPOSE_PROMPT = (
+    "Split the user's question into the separate, self-contained questions it "
+    "contains. Reply with one question per line and nothing else. If it is a "
+    "single question, reply with it unchanged.\n\nQuestion: {question}"
+)
+
+
+def parse_llm_subquestions(text, max_parts=4):
+    """
+    Parses an LLM reply (one question per line, possibly numbered or
+    bulleted) into sub-questions.
+    """
+    parts = []
+    for line in text.splitlines():
+        line = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip()
+        if len(line.split()) >= MIN_WORDS:
+            parts.append(line)
+    parts = list(dict.fromkeys(parts))
+    return parts[:max_parts] if len(parts) > 1 else []
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PRIME = np.uint64(4294967291)   # largest prime below 2**32
+
+
+def shingles(text, size=5):
+    """
+    Hashes of the overlapping `size`-word windows of the normalized text
+    (case, punctuation and spacing ignored). Short texts are one shingle.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)),
+                       dtype=np.uint64)
+
+
+class MinHasher:
+    """
+    MinHash signatures: for each of `num_perm` hash functions
+    h(x) = (a*x + b) mod p, the minimum over a text's shingles. The share
+    of equal positions in two signatures estimates their Jaccard
+    similarity.
+    """
+
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # a, b, x < 2**32 keep a*x + b inside uint64
+        self.a = rng.integers(1, 2**32 - 1, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        x = shingles(text, self.shingle_size)
+        if not len(x):
+            x = np.zeros(1, dtype=np.uint64)
+        hashed = (np.outer(x, self.a) + self.b) % _PRIME
+        return hashed.min(axis=0).astype(np.uint32)
+
+
+class DedupIndex:
+    """
+    Near-duplicate detection for chunks, stored in SQLite next to the
+    other indexes.
+
+    Canonical chunks are indexed by LSH banding: the signature is cut into
+    `bands` bands, each hashed to a bucket, so a new chunk is only compared
+    with chunks that share at least one bucket (roughly linear in corpus
+    size). A candidate whose estimated Jaccard similarity reaches
+    `threshold` makes the new chunk an alias: it is not embedded, and its
+    source is recorded against the canonical chunk instead.
+
+    Changes are written in a transaction that commit() closes, so the
+    index stays in step with the manifest after an interrupted run.
+    """
+
+    def __init__(self, path, threshold=0.8, num_perm=128, bands=16, shingle_size=5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS sigs (chunk_id TEXT PRIMARY KEY, sig BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL, bucket INTEGER NOT NULL, chunk_id TEXT NOT NULL,
+                PRIMARY KEY (band, bucket, chunk_id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS buckets_chunk ON buckets(chunk_id);
+            CREATE TABLE IF NOT EXISTS aliases (
+                alias_id TEXT PRIMARY KEY, canonical_id TEXT NOT NULL,
+                source_key TEXT NOT NULL, meta TEXT NOT NULL, similarity REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS aliases_canonical ON aliases(canonical_id);
+        """)
+        self._db.commit()
+
+    def _buckets(self, sig):
+        for band in range(self.bands):
+            part = sig[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(part, digest_size=8).digest()
+            yield band, int.from_bytes(digest, "little", signed=True)
+
+    def find_or_add(self, chunk_id, text, source_key, meta):
+        """
+        Returns (canonical_id, similarity). canonical_id == chunk_id when
+        the chunk is new content (it is then indexed as canonical);
+        otherwise the chunk is recorded as an alias of canonical_id, with
+        `meta` (its source_type/file/page) and `source_key`.
+        """
+        with self._lock:
+            cur = self._db.cursor()
+            if cur.execute("SELECT 1 FROM sigs WHERE chunk_id = ?", (chunk_id,)).fetchone():
+                return chunk_id, 1.0
+            row = cur.execute("SELECT canonical_id, similarity FROM aliases WHERE alias_id = ?",
+                              (chunk_id,)).fetchone()
+            if row:
+                return row[0], row[1]
+
+            sig = self.hasher.signature(text)
+            buckets = list(self._buckets(sig))
+            candidates = set()
+            for band, bucket in buckets:
+                candidates.update(r[0] for r in cur.execute(
+                    "SELECT chunk_id FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)))
+
+            best, best_sim = None, 0.0
+            for cand in candidates:
+                blob = cur.execute("SELECT sig FROM sigs WHERE chunk_id = ?", (cand,)).fetchone()[0]
+                sim = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == sig))
+                if sim > best_sim:
+                    best, best_sim = cand, sim
+
+            if best is not None and best_sim >= self.threshold:
+                cur.execute("INSERT INTO aliases VALUES (?, ?, ?, ?, ?)",
+                            (chunk_id, best, source_key, json.dumps(meta), round(best_sim, 4)))
+                return best, best_sim
+
+            cur.execute("INSERT INTO sigs VALUES (?, ?)", (chunk_id, sig.tobytes()))
+            cur.executemany("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                            [(band, bucket, chunk_id) for band, bucket in buckets])
+            return chunk_id, 1.0
+
+    def aliases(self, canonical_ids):
+        """
+        {canonical_id: [alias meta, ...]} for the given canonical chunks.
+        """
+        out = {cid: [] for cid in canonical_ids}
+        with self._lock:
+            for cid in canonical_ids:
+                for (meta,) in self._db.execute(
+                        "SELECT meta FROM aliases WHERE canonical_id = ? ORDER BY alias_id", (cid,)):
+                    out[cid].append(json.loads(meta))
+        return out
+
+    def remove(self, chunk_ids):
+        """
+        Forgets chunks. Returns (canonical IDs whose alias lists changed,
+        {source_key: alias IDs} of the aliases of removed canonical chunks —
+        those chunks have to be indexed again).
+        """
+        changed, orphaned = set(), {}
+        with self._lock:
+            cur = self._db.cursor()
+            for cid in chunk_ids:
+                row = cur.execute("SELECT canonical_id FROM aliases WHERE alias_id = ?",
+                                  (cid,)).fetchone()
+                if row:
+                    cur.execute("DELETE FROM aliases WHERE alias_id = ?", (cid,))
+                    changed.add(row[0])
+                    continue
+                cur.execute("DELETE FROM sigs WHERE chunk_id = ?", (cid,))
+                cur.execute("DELETE FROM buckets WHERE chunk_id = ?", (cid,))
+                for alias_id, source_key in cur.execute(
+                        "SELECT alias_id, source_key FROM aliases WHERE canonical_id = ?", (cid,)).fetchall():
+                    orphaned.setdefault(source_key, set()).add(alias_id)
+                cur.execute("DELETE FROM aliases WHERE canonical_id = ?", (cid,))
+        return changed - set(chunk_ids), orphaned
+
+    def count(self):
+        """
+        (canonical chunks, aliases)
+        """
+        with self._lock:
+            return (self._db.execute("SELECT COUNT(*) FROM sigs").fetchone()[0],
+                    self._db.execute("SELECT COUNT(*) FROM aliases").fetchone()[0])
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.executescript("DELETE FROM sigs; DELETE FROM buckets; DELETE FROM aliases;")
+            self._db.commit()
@@ -0,0 +1,100 @@
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import config
+from .embed_worker import encode_shard, init_worker
+
+
+def default_workers(cores=None, threads_per_worker=None):
+    """
+    Worker count for the machine: one worker per `threads_per_worker`
+    cores. 1 (in-process encoding) on small machines.
+    """
+    cores = cores or os.cpu_count() or 1
+    threads = threads_per_worker or config.EMBED_THREADS_PER_WORKER
+    return max(1, cores // threads)
+
+
+class EmbedPool:
+    """
+    Encodes chunk batches on a pool of worker processes, each running its
+    own copy of the embedder with a fixed torch thread count (and, with
+    pin=True, its own set of cores). A single encode() at torch's default
+    threading leaves most cores of a large machine idle; N small workers
+    keep them busy.
+
+    encode() has the SentenceTransformer signature: the texts are split
+    into one contiguous shard per worker and the shard results are
+    concatenated in order, so the caller's IDs still line up.
+
+    Workers are started with "spawn": the parent has usually loaded torch
+    and the model already, and forking a process with torch's thread pools
+    running can deadlock. Spawn re-imports the calling script as
+    __mp_main__ before the worker starts, so that script must leave numpy,
+    torch and its stores to code the child does not run (see embed_worker).
+    """
+
+    def __init__(self, model_name, workers, threads_per_worker, backend="torch",
+                 onnx_file=None, pin=True):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        ctx = mp.get_context("spawn")
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx, initializer=init_worker,
+            initargs=(model_name, backend, onnx_file, threads_per_worker,
+                      ctx.Value("i", 0), pin),
+        )
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True,
+               show_progress_bar=False, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        size = -(-len(texts) // self.workers)
+        shards = [texts[i:i + size] for i in range(0, len(texts), size)]
+        futures = [self._pool.submit(encode_shard, shard, min(batch_size, len(shard)))
+                   for shard in shards]
+        return np.concatenate([f.result() for f in futures])
+
+    def warm(self):
+        """
+        Starts every worker and loads its model (so timings exclude it).
+        """
+        futures = [self._pool.submit(encode_shard, ["warmup"], 1) for _ in range(self.workers)]
+        for f in futures:
+            f.result()
+
+    def close(self):
+        self._pool.shutdown()
+
+
+def scaling_report(texts, worker_counts, threads_per_worker, model_name=None,
+                   backend=None, onnx_file=None, batch_size=256):
+    """
+    Encoding throughput (texts/s) per worker count, after warm-up, plus
+    the speedup over one worker.
+    """
+    model_name = model_name or config.EMBED_MODEL
+    backend = backend or config.EMBED_BACKEND
+    rows = []
+    for workers in worker_counts:
+        pool = EmbedPool(model_name, workers, threads_per_worker, backend, onnx_file)
+        try:
+            pool.warm()
+            t = time.perf_counter()
+            for i in range(0, len(texts), batch_size):
+                pool.encode(texts[i:i + batch_size], batch_size=batch_size)
+            elapsed = time.perf_counter() - t
+        finally:
+            pool.close()
+        rows.append({"workers": workers, "threads_per_worker": threads_per_worker,
+                     "texts_per_s": round(len(texts) / elapsed, 1)})
+    base = rows[0]["texts_per_s"] if rows else None
+    for row in rows:
+        row["speedup"] = round(row["texts_per_s"] / base, 2) if base else None
+    return rows
@@ -0,0 +1,32 @@
+import os
+
+# Entry point of EmbedPool's worker processes. A spawned worker imports this
+# module before anything else of second_brain, so it must not import numpy,
+# torch or tokenizers at the top: their thread pools size themselves from
+# OMP_NUM_THREADS & co. when first loaded, which init_worker() sets first.
+
+_model = None
+
+
+def init_worker(model_name, backend, onnx_file, threads, counter, pin):
+    global _model
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    if pin and hasattr(os, "sched_setaffinity"):
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        cores = sorted(os.sched_getaffinity(0))
+        first = (index * threads) % len(cores)
+        os.sched_setaffinity(0, cores[first:first + threads] or cores)
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    from .embedder import load_embedder
+    _model = load_embedder(model_name, backend, onnx_file)
+
+
+def encode_shard(texts, batch_size):
+    return _model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                         show_progress_bar=False)
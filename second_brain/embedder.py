@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def load_embedder(model_name, backend="torch", onnx_file=None):
+    """
+    Returns a SentenceTransformer for model_name on the given CPU backend;
+    every backend keeps the same encode() / tokenizer interface.
+
+    - "torch": the fp32 PyTorch model.
+    - "int8":  the same model with its Linear layers dynamically quantized
+               to int8 (weights int8, activations quantized on the fly).
+    - "onnx":  the ONNX Runtime export (sentence-transformers >= 3.2);
+               onnx_file picks a variant such as "onnx/model_qint8_avx2.onnx".
+    """
+    from sentence_transformers import SentenceTransformer
+    if backend == "torch":
+        return SentenceTransformer(model_name, device="cpu")
+    if backend == "int8":
+        import torch
+        model = SentenceTransformer(model_name, device="cpu")
+        transformer = model[0]
+        transformer.auto_model = torch.quantization.quantize_dynamic(
+            transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        return model
+    if backend == "onnx":
+        kwargs = {"file_name": onnx_file} if onnx_file else {}
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=kwargs)
+    raise ValueError(f"Unknown embedding backend: {backend} (use one of {BACKENDS})")
+
+
+def backend_signature(backend="torch", onnx_file=None):
+    """
+    Salt for the index manifest: vectors from different backends are not
+    mixed in one index. Empty for the default backend, so existing
+    indexes stay valid.
+    """
+    if backend == "torch":
+        return ""
+    return f"embed:{backend}:{onnx_file or ''}"
+
+
+def _encode(model, texts, batch_size=64):
+    t = time.perf_counter()
+    emb = model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True,
+                       show_progress_bar=False, normalize_embeddings=True)
+    return emb.astype(np.float32), time.perf_counter() - t
+
+
+def _top_k(queries, corpus, k):
+    scores = queries @ corpus.T
+    k = min(k, corpus.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top.tolist()]
+
+
+def compare_embedders(reference, candidate, corpus, queries, k=10):
+    """
+    Quality and speed of `candidate` against `reference` (the fp32 model):
+    - cosine agreement between both models' embeddings of the same texts;
+    - recall@k of the candidate's top-k over the corpus (queries and
+      corpus embedded by the candidate) against the reference's top-k;
+    - mixed recall@k, with candidate queries against reference corpus
+      vectors (an index built with fp32, queried with the candidate);
+    - encoding throughput of both.
+    """
+    ref_c, ref_c_s = _encode(reference, corpus)
+    cand_c, cand_c_s = _encode(candidate, corpus)
+    ref_q, _ = _encode(reference, queries)
+    cand_q, _ = _encode(candidate, queries)
+
+    cos = np.concatenate([(ref_c * cand_c).sum(axis=1), (ref_q * cand_q).sum(axis=1)])
+    truth = _top_k(ref_q, ref_c, k)
+    own = _top_k(cand_q, cand_c, k)
+    mixed = _top_k(cand_q, ref_c, k)
+
+    def recall(found):
+        return float(np.mean([len(f & t) / len(t) for f, t in zip(found, truth)]))
+
+    return {
+        "texts": len(corpus),
+        "queries": len(queries),
+        "cosine_mean": round(float(cos.mean()), 5),
+        "cosine_min": round(float(cos.min()), 5),
+        "cosine_p1": round(float(np.percentile(cos, 1)), 5),
+        f"recall@{k}": round(recall(own), 4),
+        f"recall@{k}_mixed": round(recall(mixed), 4),
+        "reference_texts_per_s": round(len(corpus) / ref_c_s, 1),
+        "candidate_texts_per_s": round(len(corpus) / cand_c_s, 1),
+        "speedup": round(ref_c_s / cand_c_s, 2),
+    }
@@ -0,0 +1,181 @@
+import json
+import os
+
+# Search filters are dicts with any of:
+#   "source_type": str or list  ("text", "audio", "image", …)
+#   "source_file": str or list  (file names as in the corpus)
+#   "page_min" / "page_max": int, an inclusive page_or_segment range
+# Chunks without a page_or_segment never match a page range.
+
+
+def _as_list(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [v for v in value if v not in (None, "")]
+
+
+def _as_int(value):
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def normalize_filters(filters):
+    """
+    Canonical form of a filter dict (sorted value lists, int page bounds,
+    empty fields dropped), or None when nothing is filtered.
+    """
+    if not filters:
+        return None
+    out = {}
+    for field in ("source_type", "source_file"):
+        values = sorted(set(map(str, _as_list(filters.get(field)))))
+        if values:
+            out[field] = values
+    for field in ("page_min", "page_max"):
+        bound = _as_int(filters.get(field))
+        if bound is not None:
+            out[field] = bound
+    return out or None
+
+
+def filter_key(filters):
+    """
+    Stable string for cache keys ("" when unfiltered).
+    """
+    filters = normalize_filters(filters)
+    return json.dumps(filters, sort_keys=True) if filters else ""
+
+
+def chroma_where(filters):
+    """
+    The filter as a Chroma `where` clause (None when unfiltered), so the
+    vector search only considers matching chunks. It sees a chunk's own
+    source only; chunks matching through an alias are added by the caller
+    (LexicalIndex.alias_matches()).
+    """
+    filters = normalize_filters(filters)
+    if not filters:
+        return None
+    clauses = []
+    for field in ("source_type", "source_file"):
+        if field in filters:
+            values = filters[field]
+            clauses.append({field: values[0]} if len(values) == 1 else {field: {"$in": values}})
+    if "page_min" in filters:
+        clauses.append({"page_or_segment": {"$gte": filters["page_min"]}})
+    if "page_max" in filters:
+        clauses.append({"page_or_segment": {"$lte": filters["page_max"]}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def page_number(value):
+    """
+    page_or_segment as a number, or None ("" / None / non-numeric).
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def alias_list(metadata):
+    """
+    The sources a chunk stands in for as near-duplicate canonical (its
+    "aliases" metadata, a JSON list written by build_rag_db).
+    """
+    aliases = metadata.get("aliases")
+    if not aliases:
+        return []
+    return json.loads(aliases) if isinstance(aliases, str) else list(aliases)
+
+
+def matches(filters, metadata):
+    """
+    Whether a chunk passes an already-normalized filter, through its own
+    source or the source of one of its aliases.
+    """
+    if not filters:
+        return True
+    return (_matches_source(filters, metadata)
+            or any(_matches_source(filters, a) for a in alias_list(metadata)))
+
+
+def _matches_source(filters, metadata):
+    for field in ("source_type", "source_file"):
+        if field in filters and str(metadata.get(field)) not in filters[field]:
+            return False
+    if "page_min" in filters or "page_max" in filters:
+        page = page_number(metadata.get("page_or_segment"))
+        if page is None:
+            return False
+        if "page_min" in filters and page < filters["page_min"]:
+            return False
+        if "page_max" in filters and page > filters["page_max"]:
+            return False
+    return True
+
+
+def wants_images(filters):
+    """
+    False when a source_type filter leaves out images.
+    """
+    filters = normalize_filters(filters)
+    return not filters or "source_type" not in filters or "image" in filters["source_type"]
+
+
+# --- Source catalog ---
+def load_catalog(path):
+    """
+    {source_key: {"source_type", "source_file", "page_min", "page_max",
+    "records"}} as written by build_rag_db; {} before the first build.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_catalog(path, catalog):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def catalog_entry(records):
+    """
+    Catalog entry for one source's corpus records.
+    """
+    pages = [p for p in (page_number(r.get("page_or_segment")) for r in records) if p is not None]
+    first = records[0]
+    return {
+        "source_type": first.get("source_type"),
+        "source_file": first.get("source_file"),
+        "page_min": min(pages) if pages else None,
+        "page_max": max(pages) if pages else None,
+        "records": len(records),
+    }
+
+
+def filter_options(catalog):
+    """
+    Values to offer in filter controls: source types, source files and the
+    overall page_or_segment range.
+    """
+    entries = list(catalog.values())
+    lows = [e["page_min"] for e in entries if e.get("page_min") is not None]
+    highs = [e["page_max"] for e in entries if e.get("page_max") is not None]
+    return {
+        "source_types": sorted({str(e["source_type"]) for e in entries}),
+        "source_files": sorted({str(e["source_file"]) for e in entries}),
+        "page_min": min(lows) if lows else None,
+        "page_max": max(highs) if highs else None,
+    }
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def _normalize(features):
+    features = features / features.norm(dim=-1, keepdim=True)
+    return features.cpu().numpy().astype(np.float32)
+
+
+def embed_images(images, model, processor):
+    """
+    Embeds a list of PIL images with CLIP in one batched forward pass.
+    Returns an (n, 512) array of L2-normalized vectors.
+    """
+    import torch
+    inputs = processor(images=images, return_tensors="pt")
+    with torch.inference_mode():
+        features = model.get_image_features(**inputs)
+    return _normalize(features)
+
+
+def embed_texts_for_images(texts, model, processor):
+    """
+    Embeds queries with CLIP's text tower, into the same space as
+    embed_images(), so text can retrieve images.
+    """
+    import torch
+    inputs = processor(text=list(texts), return_tensors="pt", padding=True, truncation=True)
+    with torch.inference_mode():
+        features = model.get_text_features(**inputs)
+    return _normalize(features)
+
+
+def format_image_hit(meta):
+    """
+    One context line for a retrieved image: its file and where it appears.
+    """
+    name = meta.get("image_file") or meta.get("source_file", "")
+    line = f"[Image: {name}] {meta.get('image_path', '')}"
+    if meta.get("image_file") and meta.get("source_file") != name:
+        line += f" from {meta['source_file']}"
+    page = meta.get("page_or_segment")
+    if page not in (None, ""):
+        line += f" (page {page})"
+    return line
@@ -0,0 +1,479 @@
+import itertools
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from .filters import alias_list, normalize_filters, page_number
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+_PARTS = re.compile(r"[._-]")
+
+# chunk masks of this many recent search filters are kept per index
+FILTER_CACHE_SIZE = 16
+
+# Very common words carry no signal and have the longest posting lists
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his how i if in into is it
+its me my of on or our she so than that the their them then there these they this
+to was we were what when where which who why will with you your do does did can
+""".split())
+
+
+def tokenize(text):
+    """
+    Lower-cased terms; compound terms such as "cs-231n", "gpt-4" or "v2.1"
+    are kept whole and also indexed by their parts.
+    """
+    terms = []
+    for tok in _TOKEN.findall(text.lower()):
+        if tok not in STOPWORDS:
+            terms.append(tok)
+        if _PARTS.search(tok):
+            terms.extend(p for p in _PARTS.split(tok) if p and p not in STOPWORDS)
+    return terms
+
+
+class LexicalIndex:
+    """
+    On-disk BM25 inverted index stored in SQLite.
+
+    Postings are a WITHOUT ROWID table clustered by term, so a query reads
+    one contiguous range per term; scores are accumulated with NumPy. Each
+    posting also stores a quantized impact (its BM25 term-frequency factor,
+    0-255), indexed per term, so the longest posting lists are read best
+    first and cut at max_postings rather than scanned in full. Chunks
+    are added and deleted individually, which keeps the index in sync with
+    incremental reindexing. Each chunk's source_type, source_file and page
+    are kept on its docs row, and the sources of its near-duplicate aliases
+    (see second_brain.dedup) in chunk_aliases, so searches can be
+    restricted to chunks matching a filter through either. Searches score
+    from postings alone, with chunk lengths and per-filter chunk masks held
+    in memory until the index changes (here or in another process).
+    """
+
+    def __init__(self, path, k1=1.2, b=0.75, max_postings=10000):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings
+        self._lock = threading.Lock()
+        self._writes = 0          # bumped by every write through this instance
+        self._doc_state = None    # (version, lengths, filter masks), see _docs()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA cache_size=-65536;
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE NOT NULL, length INTEGER NOT NULL,
+                source_type TEXT, source_file TEXT, page REAL);
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL, df INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL, doc_id INTEGER NOT NULL, tf INTEGER NOT NULL,
+                impact INTEGER, PRIMARY KEY (term_id, doc_id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc_id);
+            CREATE TABLE IF NOT EXISTS chunk_aliases (
+                chunk_id TEXT NOT NULL, source_type TEXT, source_file TEXT, page REAL);
+            CREATE INDEX IF NOT EXISTS chunk_aliases_chunk ON chunk_aliases(chunk_id);
+            CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO stats VALUES ('n_docs', 0), ('total_length', 0);
+        """)
+        # indexes created before the metadata columns existed
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(docs)")}
+        for column, kind in (("source_type", "TEXT"), ("source_file", "TEXT"), ("page", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE docs ADD COLUMN {column} {kind}")
+        # ... and before impacts: computed once from the stored lengths
+        if "impact" not in {row[1] for row in self._db.execute("PRAGMA table_info(postings)")}:
+            self._db.execute("ALTER TABLE postings ADD COLUMN impact INTEGER")
+            n_docs, total = self._stat("n_docs"), self._stat("total_length")
+            if n_docs:
+                print(f"[lexical] Computing posting impacts for {n_docs} chunks (once)", flush=True)
+                self._db.execute(
+                    "UPDATE postings SET impact = CAST(255.0 * tf / (tf + ? * (1 - ? + ? * "
+                    "(SELECT length FROM docs WHERE docs.id = postings.doc_id) / ?)) + 0.5 AS INTEGER)",
+                    (k1, b, b, total / n_docs))
+        self._db.execute("CREATE INDEX IF NOT EXISTS postings_impact"
+                         " ON postings(term_id, impact DESC, tf)")
+        self._db.commit()
+
+    def _impact(self, tf, length, avgdl):
+        """
+        A posting's BM25 term-frequency factor, quantized to 0-255; it
+        orders a term's postings by how much they can add to a score.
+        """
+        norm = self.k1 * (1 - self.b + self.b * length / avgdl)
+        return int(255.0 * tf / (tf + norm) + 0.5)
+
+    def _stat(self, key):
+        return self._db.execute("SELECT value FROM stats WHERE key = ?", (key,)).fetchone()[0]
+
+    def count(self):
+        with self._lock:
+            return self._stat("n_docs")
+
+    def alias_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunk_aliases").fetchone()[0]
+
+    def missing_metadata(self):
+        """
+        Number of chunks indexed without source metadata (before filters).
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM docs WHERE source_type IS NULL").fetchone()[0]
+
+    def add(self, items):
+        """
+        Indexes [(chunk_id, text), ...] or [(chunk_id, text, metadata), ...];
+        existing chunk IDs are replaced, aliases included. The whole batch
+        is written in one transaction with bulk statements.
+        """
+        items = [tuple(item) for item in items]
+        if not items:
+            return
+        docs = [(item[0], Counter(tokenize(item[1]))) for item in items]
+        metas = [item[2] if len(item) > 2 and item[2] else {} for item in items]
+        batch_df = Counter()
+        for _, tfs in docs:
+            batch_df.update(tfs.keys())
+
+        with self._lock:
+            cur = self._db.cursor()
+            self._delete(cur, [cid for cid, _ in docs])
+            cur.executemany("INSERT INTO terms (term, df) VALUES (?, ?) "
+                            "ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                            list(batch_df.items()))
+            term_ids = {}
+            terms = list(batch_df)
+            for i in range(0, len(terms), 500):
+                part = terms[i:i + 500]
+                term_ids.update(cur.execute(
+                    f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(part))})",
+                    part).fetchall())
+
+            # impacts use the average length as of this batch; it drifts
+            # slowly, and only the read order depends on it
+            lengths = [sum(tfs.values()) for _, tfs in docs]
+            n_docs = self._stat("n_docs")
+            avgdl = ((self._stat("total_length") + sum(lengths)) / (n_docs + len(docs))) or 1.0
+            postings, added_length = [], 0
+            for (cid, tfs), meta, length in zip(docs, metas, lengths):
+                added_length += length
+                cur.execute("INSERT INTO docs (chunk_id, length, source_type, source_file, page)"
+                            " VALUES (?, ?, ?, ?, ?)",
+                            (cid, length, meta.get("source_type"), meta.get("source_file"),
+                             page_number(meta.get("page_or_segment"))))
+                doc_id = cur.lastrowid
+                postings.extend((term_ids[t], doc_id, tf, self._impact(tf, length, avgdl))
+                                for t, tf in tfs.items())
+            cur.executemany("INSERT INTO postings (term_id, doc_id, tf, impact) VALUES (?, ?, ?, ?)",
+                            postings)
+            # a re-added chunk keeps only the aliases it is given now
+            for (cid, _), meta in zip(docs, metas):
+                self._set_aliases(cur, cid, alias_list(meta))
+            cur.execute("UPDATE stats SET value = value + ? WHERE key = 'n_docs'", (len(docs),))
+            cur.execute("UPDATE stats SET value = value + ? WHERE key = 'total_length'", (added_length,))
+            self._db.commit()
+            self._writes += 1
+
+    def delete(self, chunk_ids):
+        chunk_ids = list(chunk_ids)
+        if not chunk_ids:
+            return
+        with self._lock:
+            cur = self._db.cursor()
+            self._delete(cur, chunk_ids)
+            cur.executemany("DELETE FROM chunk_aliases WHERE chunk_id = ?",
+                            [(cid,) for cid in chunk_ids])
+            self._db.commit()
+            self._writes += 1
+
+    def _set_aliases(self, cur, chunk_id, aliases):
+        cur.execute("DELETE FROM chunk_aliases WHERE chunk_id = ?", (chunk_id,))
+        cur.executemany(
+            "INSERT INTO chunk_aliases (chunk_id, source_type, source_file, page) VALUES (?, ?, ?, ?)",
+            [(chunk_id, a.get("source_type"), a.get("source_file"),
+              page_number(a.get("page_or_segment"))) for a in aliases])
+
+    def set_aliases(self, items):
+        """
+        Replaces the alias sources of chunks: [(chunk_id, [alias metadata,
+        ...]), ...], each alias a dict with source_type, source_file and
+        page_or_segment.
+        """
+        with self._lock:
+            cur = self._db.cursor()
+            for chunk_id, aliases in items:
+                self._set_aliases(cur, chunk_id, aliases)
+            self._db.commit()
+            self._writes += 1
+
+    def alias_matches(self, filters):
+        """
+        IDs of chunks that fail filters on their own metadata but have an
+        alias that passes them.
+        """
+        filters = normalize_filters(filters)
+        if not filters:
+            return []
+        direct, direct_params = self._conditions(filters, "d")
+        alias, alias_params = self._conditions(filters, "a")
+        with self._lock:
+            return [cid for (cid,) in self._db.execute(
+                f"SELECT DISTINCT a.chunk_id FROM chunk_aliases a"
+                f" LEFT JOIN docs d ON d.chunk_id = a.chunk_id"
+                f" WHERE {alias} AND NOT COALESCE({direct}, 0)",
+                alias_params + direct_params)]
+
+    def _delete(self, cur, chunk_ids):
+        for i in range(0, len(chunk_ids), 500):
+            part = chunk_ids[i:i + 500]
+            rows = cur.execute(
+                f"SELECT id, length FROM docs WHERE chunk_id IN ({','.join('?' * len(part))})",
+                part).fetchall()
+            for doc_id, length in rows:
+                term_ids = [t for (t,) in cur.execute(
+                    "SELECT term_id FROM postings WHERE doc_id = ?", (doc_id,))]
+                cur.executemany("UPDATE terms SET df = df - 1 WHERE id = ?",
+                                [(t,) for t in term_ids])
+                cur.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+                cur.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+                cur.execute("UPDATE stats SET value = value - 1 WHERE key = 'n_docs'")
+                cur.execute("UPDATE stats SET value = value - ? WHERE key = 'total_length'", (length,))
+            cur.execute("DELETE FROM terms WHERE df <= 0")
+
+    def clear(self):
+        with self._lock:
+            self._db.executescript("""
+                DELETE FROM postings; DELETE FROM docs; DELETE FROM terms; DELETE FROM chunk_aliases;
+                UPDATE stats SET value = 0;
+            """)
+            self._db.commit()
+            self._writes += 1
+
+    @staticmethod
+    def _conditions(filters, table):
+        """
+        SQL condition (and its parameters) for a normalized filter on the
+        source columns of `table` (docs or chunk_aliases alias).
+        """
+        conds, params = [], []
+        for field in ("source_type", "source_file"):
+            if field in filters:
+                conds.append(f"{table}.{field} IN ({','.join('?' * len(filters[field]))})")
+                params.extend(filters[field])
+        if "page_min" in filters:
+            conds.append(f"{table}.page >= ?")
+            params.append(filters["page_min"])
+        if "page_max" in filters:
+            conds.append(f"{table}.page <= ?")
+            params.append(filters["page_max"])
+        return "(" + " AND ".join(conds) + ")", params
+
+    @classmethod
+    def _filter_sql(cls, filters):
+        """
+        SQL condition on the docs row (alias d) for a search filter: the
+        chunk's own source, or one of its aliases, must match.
+        """
+        filters = normalize_filters(filters)
+        if not filters:
+            return "", []
+        direct, direct_params = cls._conditions(filters, "d")
+        alias, alias_params = cls._conditions(filters, "a")
+        return (f" AND ({direct} OR d.chunk_id IN"
+                f" (SELECT a.chunk_id FROM chunk_aliases a WHERE {alias}))",
+                direct_params + alias_params)
+
+    def _docs(self):
+        """
+        (chunk lengths by doc id, filter mask cache) for the current state
+        of the index, reloaded after any write: this instance's own, or a
+        commit by another connection (PRAGMA data_version). Call with the
+        lock held.
+        """
+        version = (self._writes, self._db.execute("PRAGMA data_version").fetchone()[0])
+        if self._doc_state is None or self._doc_state[0] != version:
+            rows = self._db.execute("SELECT id, length FROM docs").fetchall()
+            ids, lengths = self._array(rows, 2).T if rows else (np.zeros(0, np.int64),) * 2
+            table = np.zeros(int(ids.max(initial=0)) + 1, dtype=np.float64)
+            table[ids] = lengths
+            self._doc_state = (version, table, OrderedDict())
+        return self._doc_state[1], self._doc_state[2]
+
+    def _allowed(self, filters, lengths, masks):
+        """
+        Boolean mask over doc ids of the chunks matching filters (None for
+        no filter), computed once per filter and kept for the
+        FILTER_CACHE_SIZE most recent ones. Call with the lock held.
+        """
+        where, params = self._filter_sql(filters)
+        if not where:
+            return None
+        key = (where, tuple(params))
+        mask = masks.get(key)
+        if mask is None:
+            mask = np.zeros(len(lengths), dtype=bool)
+            mask[[i for (i,) in self._db.execute("SELECT d.id FROM docs d WHERE 1" + where,
+                                                 params)]] = True
+            masks[key] = mask
+            while len(masks) > FILTER_CACHE_SIZE:
+                masks.popitem(last=False)
+        masks.move_to_end(key)
+        return mask
+
+    def search(self, query, k=10, max_df_ratio=0.25, filters=None):
+        """
+        Returns [(chunk_id, bm25_score), ...] best first. Terms present in
+        more than max_df_ratio of the chunks are skipped when the query has
+        rarer terms: their idf is near zero but their posting lists are the
+        longest. A term with more than max_postings postings only reads its
+        max_postings highest-impact ones; candidates that could still reach
+        the top k then get that term's score for any posting the cut left
+        out, so a query costs at most about max_postings rows per term.
+        Chunks that only hold cut terms, each below its cut, can be missed.
+        With filters (see second_brain.filters), only matching chunks are
+        scored: a cut term's postings are read as without a filter and
+        masked (reading on until enough of them match), unless fewer than
+        max_postings chunks match, which are then looked up directly.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            n_docs = self._stat("n_docs")
+            if n_docs == 0:
+                return []
+            avgdl = self._stat("total_length") / n_docs
+            rows = self._db.execute(
+                f"SELECT id, df FROM terms WHERE term IN ({','.join('?' * len(terms))})",
+                terms).fetchall()
+            if not rows:
+                return []
+            rare = [r for r in rows if r[1] <= max_df_ratio * n_docs]
+            rows = rare or rows
+            lengths, masks = self._docs()
+            allowed = self._allowed(filters, lengths, masks)
+            # a filter this selective is cheaper to look up chunk by chunk
+            few = (np.flatnonzero(allowed) if allowed is not None
+                   and self.max_postings and allowed.sum() <= self.max_postings else None)
+
+            select = "SELECT doc_id, tf, impact FROM postings WHERE term_id = ?"
+            doc_parts, score_parts, cut = [], [], []
+            for term_id, df in rows:
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                if few is not None and df > len(few):
+                    post = self._lookup(select, term_id, few.tolist())
+                elif self.max_postings and df > self.max_postings:
+                    post = self._best_postings(select, term_id, allowed, k)
+                    if len(post) < df:
+                        # what an unread posting can add at most (one step
+                        # of slack for quantization and avgdl drift)
+                        bound = min(1.0, (post[-1, 2] + 1) / 255)
+                        cut.append((term_id, np.sort(post[:, 0]),
+                                    idf, idf * (self.k1 + 1) * bound))
+                else:
+                    post = self._postings(select, (term_id,))
+                if allowed is not None:
+                    post = post[allowed[post[:, 0]]]
+                if not len(post):
+                    continue
+                doc_parts.append(post[:, 0])
+                score_parts.append(self._bm25(post, lengths, idf, avgdl))
+            if not doc_parts:
+                return []
+
+            doc_ids, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+            if cut:
+                self._complete(scores, doc_ids, cut, select, k, lengths, avgdl)
+            top = min(k, len(scores))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            ids = [int(doc_ids[i]) for i in best]
+            names = dict(self._db.execute(
+                f"SELECT id, chunk_id FROM docs WHERE id IN ({','.join('?' * len(ids))})",
+                ids).fetchall())
+            return [(names[d], float(scores[i])) for d, i in zip(ids, best)]
+
+    def _complete(self, scores, doc_ids, cut, select, k, lengths, avgdl):
+        """
+        Adds the scores of cut terms to candidates whose postings for them
+        were not read, for every candidate that could still reach the top
+        k (its score plus the most the unread postings can add), best
+        bound first and at most max_postings lookups in all.
+        """
+        missing = [~np.isin(doc_ids, read, assume_unique=True) for _, read, _, _ in cut]
+        gain = sum(m * g for m, (_, _, _, g) in zip(missing, cut))
+        threshold = np.partition(scores, -k)[-k] if len(scores) > k else 0.0
+        upper = scores + gain
+        need = np.flatnonzero((gain > 0) & (upper >= threshold))
+        need = need[np.argsort(-upper[need])][:self.max_postings]
+        for (term_id, _, idf, _), miss in zip(cut, missing):
+            post = self._lookup(select, term_id, doc_ids[need[miss[need]]].tolist())
+            if len(post):
+                at = np.searchsorted(doc_ids, post[:, 0])
+                scores[at] += self._bm25(post, lengths, idf, avgdl)
+
+    def _best_postings(self, select, term_id, allowed, k):
+        """
+        The term's max_postings highest-impact postings, and on (a quarter
+        of max_postings at a time) until a quarter of that many, and at
+        least k, pass the filter mask, or the list ends.
+        """
+        cursor = self._db.execute(select + " ORDER BY impact DESC", (term_id,))
+        step = max(1, self.max_postings // 4)
+        parts, read, matched = [], 0, 0
+        while True:
+            part = self._array(cursor.fetchmany(step), 3)
+            parts.append(part)
+            read += len(part)
+            matched += len(part) if allowed is None else int(allowed[part[:, 0]].sum())
+            if len(part) < step or (read >= self.max_postings and matched >= max(step, k)):
+                cursor.close()
+                return np.concatenate(parts)
+
+    def _lookup(self, select, term_id, doc_ids):
+        """
+        The term's postings for the given doc ids, 500 ids per query.
+        """
+        parts = [self._postings(select + f" AND doc_id IN ({','.join('?' * len(part))})",
+                                (term_id, *part))
+                 for part in (doc_ids[i:i + 500] for i in range(0, len(doc_ids), 500))]
+        return np.concatenate(parts) if parts else np.zeros((0, 3), dtype=np.int64)
+
+    def _postings(self, sql, params):
+        """
+        (doc_id, tf, impact) rows of a postings query as an int array.
+        """
+        return self._array(self._db.execute(sql, params).fetchall(), 3)
+
+    @staticmethod
+    def _array(rows, width):
+        return np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64,
+                           count=width * len(rows)).reshape(-1, width)
+
+    def _bm25(self, post, lengths, idf, avgdl):
+        tf, dl = post[:, 1], lengths[post[:, 0]]
+        return idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / avgdl))
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses several ranked ID lists: score(id) = sum 1 / (k + rank).
+    Returns [(id, score), ...] best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
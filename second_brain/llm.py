@@ -0,0 +1,130 @@
+import http.client
+import json
+import threading
+from urllib.parse import urlsplit
+
+
+class OllamaClient:
+    """
+    Minimal client for an Ollama-compatible /api/generate endpoint.
+
+    The prompt travels in the request body (no argv limits), persistent
+    HTTP connections are reused from a small pool, and responses are
+    streamed token by token from Ollama's newline-delimited JSON. Each
+    request holds its own connection until its response is fully read, so
+    streams can be interleaved on one thread.
+    """
+
+    def __init__(self, base_url, model, keep_alive=None, timeout=300, max_idle=8):
+        if "://" not in base_url:
+            base_url = "http://" + base_url
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if parts.scheme == "https" else 11434)
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []   # connections with no request in flight
+        self._lock = threading.Lock()
+
+    def _acquire(self, fresh=False):
+        if not fresh:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn):
+        """
+        Returns a connection whose response was read to the end.
+        """
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _post(self, path, payload):
+        """
+        Sends a request on a connection of its own. Returns (connection,
+        response); the caller releases the connection after reading the
+        whole response, or closes it.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        # A kept-alive connection may have been closed by the server: retry once
+        for attempt in range(2):
+            conn = self._acquire(fresh=attempt > 0)
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError,
+                    ConnectionResetError, http.client.CannotSendRequest):
+                conn.close()
+                if attempt:
+                    raise
+            except Exception:
+                conn.close()
+                raise
+
+    def stream(self, prompt, model=None, **options):
+        """
+        Yields response tokens as the server produces them.
+        """
+        payload = {"model": model or self.model, "prompt": prompt, "stream": True}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if options:
+            payload["options"] = options
+        conn, resp = self._post("/api/generate", payload)
+        if resp.status != 200:
+            detail = resp.read().decode("utf-8", "replace")
+            self._release(conn)
+            raise RuntimeError(f"Ollama error {resp.status}: {detail}")
+        clean = False
+        try:
+            while True:
+                line = resp.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                msg = json.loads(line)
+                if msg.get("error"):
+                    raise RuntimeError(f"Ollama error: {msg['error']}")
+                if msg.get("response"):
+                    yield msg["response"]
+                if msg.get("done"):
+                    # drain the rest so the connection can be reused
+                    resp.read()
+                    break
+            clean = True
+        finally:
+            # an abandoned or failed stream leaves the connection unusable
+            if clean:
+                self._release(conn)
+            else:
+                conn.close()
+
+    def generate(self, prompt, model=None, **options):
+        """
+        Returns the full completion as one string.
+        """
+        return "".join(self.stream(prompt, model=model, **options)).strip()
+
+    def preload(self, model=None):
+        """
+        Loads the model into memory (a request without a prompt) and keeps
+        it there for keep_alive, so the first question skips the load.
+        """
+        payload = {"model": model or self.model, "stream": False}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        conn, resp = self._post("/api/generate", payload)
+        detail = resp.read()
+        self._release(conn)
+        if resp.status != 200:
+            raise RuntimeError(f"Ollama error {resp.status}: {detail.decode('utf-8', 'replace')}")
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+
+
+def file_hash(path, block_size=1 << 20):
+    """
+    Returns the sha256 hex digest of a file, read in blocks.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def text_hash(text):
+    """
+    Returns the sha256 hex digest of a string.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source_type, source_file, page_or_segment, content):
+    """
+    Stable, content-derived vector ID: the same chunk of the same source
+    always gets the same ID, regardless of its position in corpus.jsonl.
+    """
+    key = f"{source_type}\x1f{source_file}\x1f{page_or_segment}\x1f{content}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    A small JSON file mapping keys (raw files or corpus sources) to the
+    content hash they had when last processed plus whatever was produced
+    from them (output files, vector IDs), so reruns only touch what changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.version = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("entries", {})
+            self.version = data.get("version", 0)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def is_current(self, key, content_hash):
+        entry = self.entries.get(key)
+        return entry is not None and entry.get("hash") == content_hash
+
+    def set(self, key, content_hash, **outputs):
+        self.entries[key] = {"hash": content_hash, **outputs}
+
+    def pop(self, key):
+        return self.entries.pop(key, None)
+
+    def keys(self):
+        return list(self.entries.keys())
+
+    def bump_version(self):
+        self.version += 1
+
+    def save(self):
+        """
+        Writes atomically so a crash never leaves a half-written manifest.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "entries": self.entries}, f,
+                      ensure_ascii=False)
+        os.replace(tmp, self.path)
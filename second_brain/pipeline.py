@@ -0,0 +1,425 @@
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import config, tracing
+from .resources import (
+    collection_fingerprint, get_clip, get_context_packer, get_embed_batcher,
+    get_image_collection, get_llm, get_reranker, get_retrieval_cache, get_semantic_cache,
+    get_worker_pool,
+)
+from .decompose import DECOMPOSE_PROMPT, decompose_rules, parse_llm_subquestions
+from .filters import filter_key, matches, normalize_filters, wants_images
+from .images import embed_texts_for_images, format_image_hit
+from .retrieval import chunk_embeddings, hybrid_search
+
+# --- 1) Decompose ---
+@tracing.traced("decompose")
+def decompose(question: str, mode: str = config.DECOMPOSE_MODE) -> dict:
+    """
+    Splits a question into a primary question and sub-questions.
+    The primary is always the question as asked; "subquestions" is empty
+    unless it contains several separate questions.
+    """
+    subs = []
+    if mode == "llm":
+        try:
+            reply = get_llm().generate(DECOMPOSE_PROMPT.format(question=question))
+            subs = parse_llm_subquestions(reply, config.DECOMPOSE_MAX_PARTS)
+        except Exception as e:
+            print(f"[decompose] LLM decomposition failed, using rules: {e}", flush=True)
+            mode = "rules"
+    if mode == "rules":
+        subs = decompose_rules(question, config.DECOMPOSE_MAX_PARTS)
+    return {"primary": question, "subquestions": subs}
+
+
+# --- 2) Retrieve ---
+@functools.lru_cache(maxsize=1024)
+def embed_query(question: str):
+    """
+    Embeds a query once; repeated questions reuse the vector. Concurrent
+    questions are micro-batched into a single encode() call.
+    """
+    return get_embed_batcher().encode(question)
+
+
+def embed_queries(questions: list) -> list:
+    """
+    Embeds several queries in one encode() call.
+    """
+    return get_embed_batcher().encode_many(questions)
+
+
+@tracing.traced("image_search")
+def search_images(question: str, k: int = config.IMAGE_TOP_K, filters: dict = None) -> list:
+    """
+    Text-to-image search: embeds the question with CLIP's text encoder and
+    queries the image collection (only images matching filters, if given,
+    on any PDF page they appear on). Returns metadata dicts of close matches.
+    """
+    if not wants_images(filters):
+        return []
+    coll = get_image_collection()
+    count = coll.count()
+    if count == 0:
+        return []
+    model, processor = get_clip()
+    q_emb = embed_texts_for_images([question], model, processor)[0]
+    # images are stored with source_type "image", so that field is not
+    # matched against (wants_images() has already checked it)
+    image_filters = {f: v for f, v in (normalize_filters(filters) or {}).items()
+                     if f != "source_type"}
+    if image_filters:
+        # a where clause only sees an image's first page, not its aliases,
+        # so filter here and score the (few) images that pass exactly
+        got = coll.get(include=["metadatas", "embeddings"])
+        keep = [i for i, m in enumerate(got["metadatas"]) if matches(image_filters, m)]
+        if not keep:
+            return []
+        vecs = np.asarray([got["embeddings"][i] for i in keep], dtype=np.float32)
+        # cosine distance; CLIP vectors are L2-normalized
+        dists = 1.0 - vecs @ np.asarray(q_emb, dtype=np.float32)
+        return [got["metadatas"][keep[j]] for j in np.argsort(dists)[:k]
+                if dists[j] <= config.IMAGE_MAX_DISTANCE]
+    res = coll.query(query_embeddings=[q_emb.tolist()], n_results=min(k, count),
+                     include=["metadatas", "distances"])
+    return [m for m, d in zip(res["metadatas"][0], res["distances"][0])
+            if d <= config.IMAGE_MAX_DISTANCE]
+
+
+@tracing.traced("search")
+def search(question: str, q_emb, k: int = config.TOP_K, timings: dict = None,
+           images: bool = config.IMAGE_SEARCH, filters: dict = None):
+    """
+    Uncached retrieval: hybrid search (over-fetching candidates when
+    reranking is on), optional cross-encoder rerank, then image search,
+    all restricted to chunks matching filters. Returns (text hits, image
+    metadata); per-stage seconds go into timings.
+    """
+    timings = timings if timings is not None else {}
+    reranker = get_reranker() if config.RERANK else None
+
+    t = time.perf_counter()
+    n = reranker.candidate_count(k) if reranker else k
+    # dense + BM25, fused by reciprocal rank
+    hits = hybrid_search(question, n, q_emb=q_emb, filters=filters)
+    timings["search_s"] = round(time.perf_counter() - t, 4)
+
+    if reranker:
+        with tracing.span("rerank"):
+            hits, rerank_s = reranker.rerank(question, hits, k)
+        timings["rerank_s"] = round(rerank_s, 4)
+        timings["rerank_candidates"] = n
+
+    if not images:
+        return hits, []
+    t = time.perf_counter()
+    image_hits = search_images(question, filters=filters)
+    timings["image_search_s"] = round(time.perf_counter() - t, 4)
+    return hits, image_hits
+
+
+_subquery_pool = ThreadPoolExecutor(max_workers=config.SUBQUERY_WORKERS,
+                                    thread_name_prefix="subquery")
+
+
+def merge_hits(rankings: list, limit: int) -> list:
+    """
+    Interleaves several ranked hit lists (round-robin by rank), dropping
+    chunks already taken, until `limit` hits are collected.
+    """
+    merged, seen = [], set()
+    for rank in range(max(map(len, rankings), default=0)):
+        for hits in rankings:
+            if rank < len(hits) and hits[rank]["id"] not in seen:
+                seen.add(hits[rank]["id"])
+                merged.append(hits[rank])
+                if len(merged) == limit:
+                    return merged
+    return merged
+
+
+@tracing.traced("multi_search")
+def multi_search(queries: list, embeddings: list, k: int = config.TOP_K,
+                 timings: dict = None, filters: dict = None):
+    """
+    Runs search() for every query concurrently and merges the text hits by
+    chunk ID. The first query is the full question; only it is used for
+    image search. Returns (text hits, image metadata).
+    """
+    timings = timings if timings is not None else {}
+    t = time.perf_counter()
+    futures = [
+        _subquery_pool.submit(tracing.bind(search), q, emb, k, {},
+                              i == 0 and config.IMAGE_SEARCH, filters)
+        for i, (q, emb) in enumerate(zip(queries, embeddings))
+    ]
+    results = [f.result() for f in futures]
+    timings["search_s"] = round(time.perf_counter() - t, 4)
+    timings["subqueries"] = len(queries) - 1
+
+    limit = min(k * len(queries), max(k, config.MULTI_QUERY_MAX_CHUNKS))
+    hits = merge_hits([h for h, _ in results], limit)
+    return hits, results[0][1]
+
+
+@tracing.traced("pack_context")
+def pack_context(hits: list, images: list, timings: dict = None) -> str:
+    """
+    Builds the numbered context: whole text chunks, best first, under
+    CONTEXT_TOKEN_BUDGET with near-duplicates dropped, then the image hits.
+    Citations run [1]..[n] in rank order over what was kept.
+    """
+    timings = timings if timings is not None else {}
+    t = time.perf_counter()
+    packer = get_context_packer()
+    image_docs = [format_image_hit(m) for m in images]
+    reserved = sum(packer.count_tokens([f"[{i}] {d}" for i, d in enumerate(image_docs, 1)]))
+    entries = [f"[{i}] {h['document']}" for i, h in enumerate(hits, 1)]
+    embeddings = None
+    if config.CONTEXT_DEDUP_THRESHOLD is not None and len(hits) > 1:
+        embeddings = chunk_embeddings([h["id"] for h in hits])
+    kept, stats = packer.pack(entries, embeddings, reserved_tokens=reserved)
+
+    # image hits are numbered after the text chunks
+    docs = [hits[i]["document"] for i in kept] + image_docs
+    timings["pack_s"] = round(time.perf_counter() - t, 4)
+    timings["context_tokens"] = stats["tokens"]
+    timings["chunks_dropped"] = stats["dropped_duplicates"] + stats["dropped_over_budget"]
+    return "\n".join(f"[{i+1}] {d}" for i, d in enumerate(docs))
+
+
+@tracing.traced("retrieve")
+def retrieve_with_info(question: str, k: int = config.TOP_K,
+                       subquestions: list = None, filters: dict = None) -> dict:
+    """
+    Retrieves context for the question through the caches. With
+    sub-questions, each is retrieved as well and the hits are merged.
+    With filters (source_type, source_file, page_min / page_max; see
+    second_brain.filters), only matching chunks are searched.
+    Returns {"context", "images", "elapsed", "timings", "cache", "answer",
+    ...}, where "images" holds matching image metadata, "timings" the
+    seconds per stage, "cache" is "exact", "semantic" or "miss", and
+    "answer" is a previously generated answer when answer reuse is enabled
+    (else None).
+    """
+    # Keyed on the normalized question, k and the index fingerprint,
+    # so entries from before a reindex are never returned
+    subquestions = list(subquestions or [])
+    filters = normalize_filters(filters)
+    scope = filter_key(filters)
+    fingerprint = collection_fingerprint()
+    cache = get_retrieval_cache()
+    key = cache.make_key(" | ".join([question] + subquestions), k,
+                         f"{fingerprint}\x1f{scope}" if scope else fingerprint)
+    with tracing.span("exact_cache"):
+        cached = cache.get(key)
+    if cached is not None:
+        tracing.count("cache_lookups_total", result="exact")
+        return {"context": cached["context"], "images": cached.get("images", []),
+                "elapsed": 0.0, "timings": {}, "cache": "exact",
+                "answer": cached.get("answer"), "key": key, "slot": None}
+
+    start = time.time()
+    timings = {}
+    with tracing.span("embed"):
+        if subquestions:
+            # full question and sub-questions share one encode() call
+            embeddings = embed_queries([question] + subquestions)
+            q_emb = embeddings[0]
+        else:
+            q_emb = embed_query(question)
+    timings["embed_s"] = round(time.time() - start, 4)
+
+    # Near-duplicate of a recent question?
+    semantic = get_semantic_cache()
+    with tracing.span("semantic_cache"):
+        slot, value, _ = semantic.lookup(
+            q_emb, fingerprint, match={"k": k, "subquestions": subquestions, "filters": scope})
+    if value is not None:
+        info = {"context": value["context"], "images": value.get("images", []),
+                "elapsed": time.time() - start, "timings": timings,
+                "cache": "semantic", "answer": value.get("answer"),
+                "key": key, "slot": slot}
+    else:
+        if subquestions:
+            hits, images = multi_search([question] + subquestions, embeddings, k, timings,
+                                        filters)
+        else:
+            hits, images = search(question, q_emb, k, timings, filters=filters)
+        context = pack_context(hits, images, timings)
+        slot = semantic.put(q_emb, {"context": context, "images": images, "k": k,
+                                    "subquestions": subquestions, "filters": scope},
+                            fingerprint)
+        info = {"context": context, "images": images, "elapsed": time.time() - start,
+                "timings": timings, "cache": "miss", "answer": None, "key": key, "slot": slot}
+
+    tracing.count("cache_lookups_total", result=info["cache"])
+    entry = {"context": info["context"], "images": info["images"]}
+    if info["answer"]:
+        entry["answer"] = info["answer"]
+    cache.put(key, entry)
+    return info
+
+
+def cache_stats() -> dict:
+    """
+    Hit/miss metrics for tuning SEMANTIC_CACHE_THRESHOLD.
+    """
+    return {
+        "semantic": get_semantic_cache().stats(),
+        "exact_entries": len(get_retrieval_cache()),
+    }
+
+
+def serving_stats() -> dict:
+    """
+    Queue depth, wait times and embedding batch sizes for the serving layer.
+    """
+    return {
+        "workers": get_worker_pool().stats(),
+        "embed_batching": get_embed_batcher().stats(),
+        "cache": cache_stats(),
+        "recent_traces": tracing.recent()[-5:],
+    }
+
+
+def remember_answer(info: dict, answer: str):
+    """
+    Stores a generated answer next to its cached context, so near-duplicate
+    questions can skip generation when SEMANTIC_CACHE_ANSWERS is on.
+    """
+    if not config.SEMANTIC_CACHE_ANSWERS or not answer:
+        return
+    get_retrieval_cache().put(info["key"], {"context": info["context"],
+                                            "images": info["images"], "answer": answer})
+    get_semantic_cache().update(info["slot"], answer=answer)
+
+
+def retrieve(question: str, k: int = config.TOP_K, subquestions: list = None,
+             filters: dict = None):
+    """
+    Returns (context, elapsed_seconds) for the question.
+    The context is the top-k chunks, numbered [1]..[k] (more when
+    sub-questions are merged in), from the chunks matching filters.
+    """
+    info = retrieve_with_info(question, k, subquestions, filters)
+    return info["context"], info["elapsed"]
+
+
+# --- 3) Generate ---
+def build_prompt(question: str, context: str) -> str:
+    return (
+        "You are an academic assistant. Use the context below to answer.\n\n"
+        f"Context:\n{context}\n\n"
+        f"Question: {question}\n\n"
+        "Answer in detail:"
+    )
+
+
+@tracing.traced("generate")
+def generate(question: str, context: str, model: str = config.LLM_MODEL) -> str:
+    """
+    Asks the local LLM to answer the question from the context.
+    """
+    return get_llm().generate(build_prompt(question, context), model=model)
+
+
+def generate_stream(question: str, context: str, model: str = config.LLM_MODEL):
+    """
+    Like generate(), but yields tokens as the LLM produces them.
+    """
+    yield from get_llm().stream(build_prompt(question, context), model=model)
+
+
+# --- 4) Format ---
+def format_answer(raw: str) -> str:
+    """
+    Simple formatter: split into lines and prefix bullets.
+    """
+    lines = raw.split("\n")
+    return "\n".join(f"- {line.strip()}" for line in lines if line.strip())
+
+
+def run_pipeline(query: str, filters: dict = None) -> dict:
+    """
+    Runs decompose -> retrieve -> generate -> format in-process.
+    Returns a dict with every intermediate result.
+    """
+    with tracing.request("query"):
+        dec = decompose(query)
+        primary = dec["primary"]
+        info = retrieve_with_info(primary, subquestions=dec["subquestions"], filters=filters)
+        context = info["context"]
+
+        raw = info["answer"] if config.SEMANTIC_CACHE_ANSWERS else None
+        if not raw:
+            raw = generate(primary, context)
+            remember_answer(info, raw)
+    return {
+        "primary": primary,
+        "subquestions": dec["subquestions"],
+        "context": context,
+        "images": [m.get("image_path") for m in info["images"]],
+        "retrieval_time_s": round(info["elapsed"], 3),
+        "timings": info["timings"],
+        "cache": info["cache"],
+        "answer": raw,
+        "formatted": format_answer(raw),
+    }
+
+
+def stream_pipeline(query: str, filters: dict = None):
+    """
+    Like run_pipeline(), but yields partial results while the answer is
+    generated: dicts with "done": False and the answer so far, then one
+    final dict with "done": True and the formatted answer.
+    """
+    trace = tracing.begin("query")
+    try:
+        yield from _stream_pipeline(query, trace, filters)
+    finally:
+        tracing.end(trace)
+
+
+def _stream_pipeline(query: str, trace, filters: dict = None):
+    # the generator may resume on another thread between yields, so the
+    # trace is activated per section and generation is timed by hand
+    with tracing.activate(trace):
+        dec = decompose(query)
+        primary = dec["primary"]
+        info = retrieve_with_info(primary, subquestions=dec["subquestions"], filters=filters)
+    result = {
+        "primary": primary,
+        "subquestions": dec["subquestions"],
+        "context": info["context"],
+        "images": [m.get("image_path") for m in info["images"]],
+        "retrieval_time_s": round(info["elapsed"], 3),
+        "timings": info["timings"],
+        "cache": info["cache"],
+        "answer": "",
+        "done": False,
+    }
+
+    raw = info["answer"] if config.SEMANTIC_CACHE_ANSWERS else None
+    if not raw:
+        parts = []
+        t = time.perf_counter()
+        for token in generate_stream(primary, info["context"]):
+            if not parts:
+                tracing.observe("stage_seconds", time.perf_counter() - t, stage="first_token")
+            parts.append(token)
+            result["answer"] = "".join(parts)
+            yield dict(result)
+        seconds = time.perf_counter() - t
+        tracing.observe("stage_seconds", seconds, stage="generate")
+        if trace is not None:
+            trace.add("generate", seconds, start=t)
+        raw = "".join(parts).strip()
+        remember_answer(info, raw)
+
+    result.update(answer=raw, formatted=format_answer(raw), done=True)
+    yield result
@@ -0,0 +1,53 @@
+import threading
+import time
+
+
+class Reranker:
+    """
+    Cross-encoder reranking of retrieval candidates.
+
+    All (question, chunk) pairs are scored in one batched forward pass.
+    The number of candidates to over-fetch adapts to a latency budget using
+    a running estimate of the per-pair scoring cost, so reranking never
+    costs much more than `budget_ms` however slow the host is.
+    """
+
+    def __init__(self, model, budget_ms=150, max_candidates=30, smoothing=0.2):
+        self.model = model
+        self.budget_s = budget_ms / 1000
+        self.max_candidates = max_candidates
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._per_pair_s = None   # unknown until the first call
+
+    def candidate_count(self, k):
+        """
+        How many candidates to fetch so scoring fits the budget (never
+        fewer than k, never more than max_candidates).
+        """
+        with self._lock:
+            per_pair = self._per_pair_s
+        if per_pair is None or per_pair <= 0:
+            return max(k, self.max_candidates)
+        return max(k, min(self.max_candidates, int(self.budget_s / per_pair)))
+
+    def rerank(self, question, hits, k):
+        """
+        Returns (top-k hits with a "rerank_score", seconds spent scoring).
+        """
+        if not hits:
+            return [], 0.0
+        start = time.perf_counter()
+        pairs = [(question, h["document"]) for h in hits]
+        scores = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            sample = elapsed / len(pairs)
+            if self._per_pair_s is None:
+                self._per_pair_s = sample
+            else:
+                self._per_pair_s += self.smoothing * (sample - self._per_pair_s)
+
+        ranked = sorted(zip(hits, scores), key=lambda hs: float(hs[1]), reverse=True)[:k]
+        return [{**h, "rerank_score": float(s)} for h, s in ranked], elapsed
@@ -0,0 +1,284 @@
+import os
+import threading
+
+from . import config
+
+# Heavy objects are created on first use and shared for the process lifetime
+_lock = threading.Lock()
+_embedder = None
+_client = None
+_collection = None
+
+
+def get_embedder():
+    """
+    Returns the shared SentenceTransformer used for query and chunk
+    embeddings, on the EMBED_BACKEND runtime.
+    """
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                from .embedder import load_embedder
+                _embedder = load_embedder(config.EMBED_MODEL, config.EMBED_BACKEND,
+                                          config.EMBED_ONNX_FILE)
+    return _embedder
+
+
+def get_client():
+    """
+    Returns the shared persistent Chroma client.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import chromadb
+                _client = chromadb.PersistentClient(path=config.DB_PATH)
+    return _client
+
+
+def get_collection():
+    """
+    Returns the main text collection, creating it if it does not exist yet.
+    """
+    global _collection
+    if _collection is None:
+        client = get_client()
+        with _lock:
+            if _collection is None:
+                _collection = client.get_or_create_collection(name=config.COLLECTION)
+    return _collection
+
+
+_cache = None
+
+
+def get_retrieval_cache():
+    """
+    Returns the shared SQLite-backed retrieval cache.
+    """
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                from .cache import RetrievalCache
+                _cache = RetrievalCache(
+                    config.CACHE_DB,
+                    max_entries=config.CACHE_MAX_ENTRIES,
+                    ttl_s=config.CACHE_TTL_S,
+                )
+    return _cache
+
+
+def collection_fingerprint():
+    """
+    Identifies the current state of the index: the version written by
+    build_rag_db plus the vector count. Changes whenever the index does.
+    """
+    version = "0"
+    if os.path.exists(config.INDEX_VERSION_FILE):
+        with open(config.INDEX_VERSION_FILE, "r", encoding="utf-8") as f:
+            version = f.read().strip() or "0"
+    return f"{version}:{get_collection().count()}"
+
+
+_semantic_cache = None
+
+
+def get_semantic_cache():
+    """
+    Returns the shared in-memory semantic (near-duplicate question) cache.
+    """
+    global _semantic_cache
+    if _semantic_cache is None:
+        dim = get_embedder().get_sentence_embedding_dimension()
+        with _lock:
+            if _semantic_cache is None:
+                from .semantic_cache import SemanticCache
+                _semantic_cache = SemanticCache(
+                    dim,
+                    capacity=config.SEMANTIC_CACHE_SIZE,
+                    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                )
+    return _semantic_cache
+
+
+_llm = None
+
+
+def get_llm():
+    """
+    Returns the shared Ollama HTTP client.
+    """
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                from .llm import OllamaClient
+                _llm = OllamaClient(
+                    config.OLLAMA_URL, config.LLM_MODEL,
+                    keep_alive=config.LLM_KEEP_ALIVE, timeout=config.LLM_TIMEOUT_S,
+                )
+    return _llm
+
+
+_pool = None
+_batcher = None
+
+
+def get_worker_pool():
+    """
+    Returns the shared admission-controlled worker pool.
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                from .serving import WorkerPool
+                _pool = WorkerPool(
+                    max_workers=config.SERVE_WORKERS,
+                    max_queue=config.SERVE_MAX_QUEUE,
+                    timeout_s=config.SERVE_QUEUE_TIMEOUT_S,
+                )
+    return _pool
+
+
+def get_embed_batcher():
+    """
+    Returns the shared query-embedding micro-batcher.
+    """
+    global _batcher
+    if _batcher is None:
+        embedder = get_embedder()
+        with _lock:
+            if _batcher is None:
+                from .serving import EmbedBatcher
+                _batcher = EmbedBatcher(
+                    embedder,
+                    max_batch=config.EMBED_BATCH_MAX,
+                    max_wait_ms=config.EMBED_BATCH_WAIT_MS,
+                )
+    return _batcher
+
+
+_clip = None
+_image_collection = None
+
+
+def get_clip():
+    """
+    Returns the shared (CLIPModel, CLIPProcessor) pair, in eval mode.
+    """
+    global _clip
+    if _clip is None:
+        with _lock:
+            if _clip is None:
+                from transformers import CLIPModel, CLIPProcessor
+                model = CLIPModel.from_pretrained(config.CLIP_MODEL).eval()
+                processor = CLIPProcessor.from_pretrained(config.CLIP_MODEL)
+                _clip = (model, processor)
+    return _clip
+
+
+def get_image_collection():
+    """
+    Returns the CLIP image collection (kept apart from the 384-dim text
+    vectors), creating it if needed.
+    """
+    global _image_collection
+    if _image_collection is None:
+        client = get_client()
+        with _lock:
+            if _image_collection is None:
+                _image_collection = client.get_or_create_collection(
+                    name=config.IMAGE_COLLECTION, metadata={"hnsw:space": "cosine"}
+                )
+    return _image_collection
+
+
+_lexical = None
+
+
+def get_lexical_index():
+    """
+    Returns the shared BM25 inverted index.
+    """
+    global _lexical
+    if _lexical is None:
+        with _lock:
+            if _lexical is None:
+                from .lexical import LexicalIndex
+                _lexical = LexicalIndex(config.LEXICAL_INDEX,
+                                        max_postings=config.LEXICAL_MAX_POSTINGS)
+    return _lexical
+
+
+_reranker = None
+
+
+def get_reranker():
+    """
+    Returns the shared cross-encoder Reranker.
+    """
+    global _reranker
+    if _reranker is None:
+        with _lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                from .rerank import Reranker
+                _reranker = Reranker(
+                    CrossEncoder(config.RERANK_MODEL),
+                    budget_ms=config.RERANK_BUDGET_MS,
+                    max_candidates=config.RERANK_MAX_CANDIDATES,
+                )
+    return _reranker
+
+
+_packer = None
+
+
+def get_context_packer():
+    """
+    Returns the shared ContextPacker. Without CONTEXT_TOKENIZER it counts
+    with the embedder's WordPiece tokenizer, which splits English into at
+    least as many pieces as Llama 3's larger BPE vocabulary, so the budget
+    errs on the safe side.
+    """
+    global _packer
+    if _packer is None:
+        tokenizer = None if config.CONTEXT_TOKENIZER else get_embedder().tokenizer
+        with _lock:
+            if _packer is None:
+                from .context import ContextPacker
+                if config.CONTEXT_TOKENIZER:
+                    from transformers import AutoTokenizer
+                    tokenizer = AutoTokenizer.from_pretrained(config.CONTEXT_TOKENIZER)
+                _packer = ContextPacker(
+                    tokenizer,
+                    budget_tokens=config.CONTEXT_TOKEN_BUDGET,
+                    dedup_threshold=config.CONTEXT_DEDUP_THRESHOLD,
+                )
+    return _packer
+
+
+_vector_store = None
+
+
+def get_vector_store():
+    """
+    Returns the FlatIndex used when VECTOR_BACKEND is "flat". It is
+    reopened when build_rag_db rewrites it, so a running app picks up a
+    reindex without a restart.
+    """
+    global _vector_store
+    from .vector_store import FlatIndex, current_generation
+    generation = current_generation(config.FLAT_INDEX_DIR)
+    if generation is None:
+        raise RuntimeError(f"No flat index at {config.FLAT_INDEX_DIR}; "
+                           "run scripts/build_rag_db.py with --export-flat")
+    if _vector_store is None or _vector_store.generation != generation:
+        with _lock:
+            if _vector_store is None or _vector_store.generation != generation:
+                _vector_store = FlatIndex(config.FLAT_INDEX_DIR)
+    return _vector_store
@@ -0,0 +1,126 @@
+import numpy as np
+
+from . import config, tracing
+from .filters import chroma_where, filter_key, matches, normalize_filters
+from .lexical import reciprocal_rank_fusion
+from .resources import get_collection, get_embedder, get_lexical_index, get_vector_store
+
+
+def _store():
+    """
+    Where chunk text, metadata and vectors are read from: the flat index
+    or the Chroma collection, per VECTOR_BACKEND.
+    """
+    return get_vector_store() if config.VECTOR_BACKEND == "flat" else get_collection()
+
+
+@tracing.traced("dense_search")
+def dense_search_batch(q_embs, n, filters=None):
+    """
+    Vector search for several query embeddings at once. Returns one list
+    of hits per query, each hit a dict:
+    {"id", "document", "metadata", "distance"}, closest first. With
+    filters (see second_brain.filters), only matching chunks are searched.
+    """
+    filters = normalize_filters(filters)
+    if config.VECTOR_BACKEND == "flat":
+        store = get_vector_store()
+        rows = None
+        if filters:
+            rows = store.matching_rows(lambda m: matches(filters, m), filter_key(filters))
+        return store.query(q_embs, n, rows)
+    kwargs = {"where": chroma_where(filters)} if filters else {}
+    res = get_collection().query(
+        query_embeddings=[list(map(float, q)) for q in q_embs], n_results=n,
+        include=["documents", "metadatas", "distances"], **kwargs
+    )
+    results = [
+        [{"id": i, "document": d, "metadata": m, "distance": dist}
+         for i, d, m, dist in zip(*cols)]
+        for cols in zip(res["ids"], res["documents"], res["metadatas"], res["distances"])
+    ]
+    if filters:
+        results = _add_alias_matches(results, q_embs, n, filters)
+    return results
+
+
+def _add_alias_matches(results, q_embs, n, filters):
+    """
+    Chroma's where clause only sees a chunk's own source, so chunks that
+    match through a near-duplicate alias are scored here (exactly, with
+    the collection's squared-L2 distance) and merged in.
+    """
+    extra = get_lexical_index().alias_matches(filters)
+    if not extra:
+        return results
+    got = get_collection().get(ids=extra, include=["embeddings", "documents", "metadatas"])
+    if not len(got["ids"]):
+        return results
+    vecs = np.asarray(got["embeddings"], dtype=np.float32)
+    merged = []
+    for q, hits in zip(q_embs, results):
+        dists = ((vecs - np.asarray(q, dtype=np.float32)) ** 2).sum(axis=1)
+        found = [{"id": i, "document": d, "metadata": m, "distance": float(dist)}
+                 for i, d, m, dist in zip(got["ids"], got["documents"], got["metadatas"], dists)]
+        merged.append(sorted(hits + found, key=lambda h: h["distance"])[:n])
+    return merged
+
+
+def dense_search(q_emb, n, filters=None):
+    """
+    Vector search for one query embedding (see dense_search_batch).
+    """
+    return dense_search_batch([q_emb], n, filters)[0]
+
+
+@tracing.traced("hybrid_search")
+def hybrid_search(question, k=config.TOP_K, q_emb=None, candidates=config.HYBRID_CANDIDATES,
+                  filters=None):
+    """
+    Dense (MiniLM) and lexical (BM25) candidates fused with reciprocal-rank
+    fusion. Returns the top-k hits, each with its fused "score". Exact terms
+    (equation names, acronyms, course codes) that embeddings blur are
+    picked up by the BM25 side. Filters restrict both retrievers.
+    """
+    if q_emb is None:
+        q_emb = get_embedder().encode(question)
+    n = max(k, candidates)
+    dense = dense_search(q_emb, n, filters)
+    if not config.HYBRID_SEARCH:
+        return dense[:k]
+
+    with tracing.span("lexical_search"):
+        lexical = get_lexical_index().search(question, n, filters=filters)
+    fused = reciprocal_rank_fusion(
+        [[h["id"] for h in dense], [cid for cid, _ in lexical]], k=config.RRF_K
+    )[:k]
+
+    by_id = {h["id"]: h for h in dense}
+    missing = [cid for cid, _ in fused if cid not in by_id]
+    if missing:
+        # lexical-only hits: fetch their text and metadata from the store
+        with tracing.span("fetch_lexical_hits"):
+            got = _store().get(ids=missing, include=["documents", "metadatas"])
+        for cid, d, m in zip(got["ids"], got["documents"], got["metadatas"]):
+            by_id[cid] = {"id": cid, "document": d, "metadata": m, "distance": None}
+    return [{**by_id[cid], "score": score} for cid, score in fused if cid in by_id]
+
+
+def chunk_embeddings(ids):
+    """
+    Stored embeddings for chunk IDs, as rows in the order given.
+    """
+    if not ids:
+        return []
+    if config.VECTOR_BACKEND == "flat":
+        return get_vector_store().vectors(ids)
+    got = get_collection().get(ids=list(ids), include=["embeddings"])
+    by_id = dict(zip(got["ids"], got["embeddings"]))
+    return [by_id[cid] for cid in ids]
+
+
+def format_context(hits, start=1):
+    """
+    Numbers hits as [1] .. [n], one per line.
+    """
+    return "\n".join(f"[{i}] {h['document']}" for i, h in enumerate(hits, start))
@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    In-memory cache keyed on query meaning rather than spelling.
+
+    Query embeddings live in one preallocated (capacity, dim) float32
+    matrix of L2-normalized rows, so a lookup is a single mat-vec product.
+    A lookup hits when the best cosine similarity reaches `threshold`.
+    When full, the least-recently-used row is overwritten. The cache is
+    cleared whenever the collection fingerprint changes.
+
+    Entries are addressed by a handle (slot, entry id); ids are never
+    reused, so a handle kept across an eviction or reset goes stale
+    instead of pointing at another question's entry.
+    """
+
+    def __init__(self, dim, capacity=2048, threshold=0.92):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._values = [None] * capacity
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._next_id = 0
+        self._size = 0
+        self._tick = 0
+        self._fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.near_misses = 0     # best similarity within 0.05 of the threshold
+        self._hit_sim_total = 0.0
+
+    @staticmethod
+    def _normalize(vec):
+        vec = np.asarray(vec, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _check_fingerprint(self, fingerprint):
+        if fingerprint != self._fingerprint:
+            self._size = 0
+            self._values = [None] * self.capacity
+            self._fingerprint = fingerprint
+
+    def lookup(self, embedding, fingerprint=None, match=None):
+        """
+        Returns (handle, value, similarity) for the closest cached query
+        that passes the threshold and whose value has the fields in `match`
+        (e.g. the same k), else (None, None, best_similarity).
+        """
+        q = self._normalize(embedding)
+        match = match or {}
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            if self._size == 0:
+                self.misses += 1
+                return None, None, 0.0
+            sims = self._matrix[:self._size] @ q
+            best = float(sims.max())
+            above = np.flatnonzero(sims >= self.threshold)
+            for slot in above[np.argsort(-sims[above])].tolist():
+                value = self._values[slot]
+                if any(value.get(f) != v for f, v in match.items()):
+                    continue
+                sim = float(sims[slot])
+                self._tick += 1
+                self._last_used[slot] = self._tick
+                self.hits += 1
+                self._hit_sim_total += sim
+                return (slot, int(self._ids[slot])), value, sim
+            self.misses += 1
+            if best >= self.threshold - 0.05:
+                self.near_misses += 1
+            return None, None, best
+
+    def put(self, embedding, value, fingerprint=None):
+        """
+        Stores value under the query embedding; returns its handle.
+        """
+        q = self._normalize(embedding)
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._tick += 1
+            self._matrix[slot] = q
+            self._last_used[slot] = self._tick
+            self._values[slot] = value
+            self._next_id += 1
+            self._ids[slot] = self._next_id
+            return slot, self._next_id
+
+    def update(self, handle, **fields):
+        """
+        Adds fields (e.g. a generated answer) to an existing entry. No-op
+        when the entry has since been evicted or the cache was reset.
+        """
+        if handle is None:
+            return
+        slot, entry_id = handle
+        with self._lock:
+            if (slot < self._size and self._values[slot] is not None
+                    and self._ids[slot] == entry_id):
+                self._values[slot] = {**self._values[slot], **fields}
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "near_misses": self.near_misses,
+                "evictions": self.evictions,
+                "avg_hit_similarity": round(self._hit_sim_total / self.hits, 4) if self.hits else None,
+            }
@@ -0,0 +1,184 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class ServerBusy(RuntimeError):
+    """
+    Raised when the request queue is full or a request waited too long.
+    """
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class WorkerPool:
+    """
+    Admission control for question answering.
+
+    At most `max_workers` requests run at once (they share the process-wide
+    embedder, collection and LLM client). Up to `max_queue` more wait their
+    turn, and anything beyond that is rejected immediately with ServerBusy
+    instead of piling up and exhausting RAM.
+    """
+
+    def __init__(self, max_workers=4, max_queue=16, timeout_s=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout_s = timeout_s
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self._waits = collections.deque(maxlen=1000)
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds one worker slot for the duration of the with-block (which may
+        wrap a streaming generator).
+        """
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise ServerBusy("Server is busy, please try again shortly.")
+            self.waiting += 1
+        start = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.timeout_s)
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.active += 1
+                self._waits.append(waited)
+        if not acquired:
+            raise ServerBusy(f"Timed out after {waited:.0f}s waiting for a worker.")
+        try:
+            yield waited
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Runs fn in a worker slot and returns its result.
+        """
+        with self.slot():
+            return fn(*args, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                "workers": self.max_workers,
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_p50_s": _round(_percentile(waits, 50)),
+                "wait_p95_s": _round(_percentile(waits, 95)),
+                "wait_max_s": _round(max(waits) if waits else None),
+            }
+
+
+def _round(value, digits=4):
+    return None if value is None else round(value, digits)
+
+
+class EmbedBatcher:
+    """
+    Micro-batches query embeddings from concurrent requests.
+
+    Callers block on encode(text); a single background thread gathers
+    whatever arrives within `max_wait_ms` (up to `max_batch` texts) and
+    embeds it with one encode() call.
+    """
+
+    def __init__(self, embedder, max_batch=32, max_wait_ms=5):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, text, timeout=None):
+        """
+        Returns the embedding of one text (NumPy array).
+        """
+        fut = Future()
+        self._queue.put((text, fut))
+        return fut.result(timeout=timeout)
+
+    def encode_many(self, texts, timeout=None):
+        """
+        Returns the embeddings of several texts, in order. They are queued
+        back to back, so they usually share an encode() call, but a batch
+        that fills up (max_batch) or is already due may split them.
+        """
+        futures = [Future() for _ in texts]
+        for text, fut in zip(texts, futures):
+            self._queue.put((text, fut))
+        return [fut.result(timeout=timeout) for fut in futures]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.embedder.encode(
+                    texts, batch_size=len(texts),
+                    convert_to_numpy=True, show_progress_bar=False
+                )
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), emb in zip(batch, embeddings):
+                fut.set_result(emb)
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch": round(self.items / self.batches, 2) if self.batches else None,
+                "largest_batch": self.largest_batch,
+            }
@@ -0,0 +1,317 @@
+import contextlib
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+from . import config
+
+# Latency histogram buckets (seconds), Prometheus-style upper bounds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+PREFIX = "second_brain_"
+
+_lock = threading.Lock()
+_histograms = {}   # (name, labels) -> [bucket counts..., sum, count]
+_counters = {}     # (name, labels) -> value
+_recent = deque(maxlen=config.TRACE_KEEP)
+_local = threading.local()
+
+_NOOP = contextlib.nullcontext()
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    """
+    Adds one observation to a latency histogram.
+    """
+    if not config.TRACING:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        h[-2] += seconds
+        h[-1] += 1
+
+
+def count(name, value=1, **labels):
+    """
+    Increments a counter.
+    """
+    if not config.TRACING:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class Trace:
+    """
+    The spans of one request (a question or an ingest run) with their
+    start offsets and nesting depth. With PROFILE_DIR set, the
+    traced sections also run under cProfile and the stats are dumped to
+    PROFILE_DIR/<name>-<timestamp>.prof when the trace ends.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.spans = []
+        self.total_s = None
+        self.profile_path = None
+        self.profiler = cProfile.Profile() if config.PROFILE_DIR else None
+        # one Profile can only follow one thread: sections running on other
+        # threads at the same time get their own, merged by end()
+        self.profiler_thread = None
+        self.thread_profilers = []
+
+    def add(self, name, seconds, depth=0, start=None):
+        """
+        Records a span measured outside span() (e.g. across yields).
+        """
+        offset = (start if start is not None else time.perf_counter() - seconds) - self.start
+        self.spans.append({"name": name, "start_ms": round(offset * 1000, 2),
+                           "ms": round(seconds * 1000, 2), "depth": depth})
+
+    def to_dict(self):
+        return {"name": self.name, "started": time.strftime("%H:%M:%S", time.localtime(self.wall_start)),
+                "total_ms": round((self.total_s or 0) * 1000, 2),
+                "spans": sorted(self.spans, key=lambda sp: sp["start_ms"]),
+                "profile": self.profile_path}
+
+
+class _Span:
+    __slots__ = ("name", "t", "trace", "depth")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = getattr(_local, "trace", None)
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.t = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.t
+        _local.depth = self.depth
+        observe("stage_seconds", seconds, stage=self.name)
+        if self.trace is not None:
+            self.trace.add(self.name, seconds, self.depth, start=self.t)
+        return False
+
+
+def span(name):
+    """
+    Times a block as stage `name`: into the stage latency histogram and,
+    inside an active trace, onto the trace. A shared no-op context when
+    tracing is off.
+    """
+    if not config.TRACING:
+        return _NOOP
+    return _Span(name)
+
+
+def traced(name):
+    """
+    Decorator: runs the function inside span(name).
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not config.TRACING:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def begin(name):
+    """
+    Starts a trace; returns None when tracing is off. Pair with end().
+    """
+    if not config.TRACING:
+        return None
+    return Trace(name)
+
+
+@contextlib.contextmanager
+def activate(trace):
+    """
+    Makes spans on this thread land on `trace` (and profiles them) for the
+    duration of the block. Generators that yield between sections activate
+    each section separately, since they may resume on another thread.
+    """
+    if trace is None:
+        yield
+        return
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    profiler = owned = None
+    if trace.profiler is not None:
+        with _lock:
+            if trace.profiler_thread in (None, threading.get_ident()):
+                profiler = trace.profiler
+                owned = trace.profiler_thread is None
+                trace.profiler_thread = threading.get_ident()
+            else:
+                profiler = cProfile.Profile()
+                trace.thread_profilers.append(profiler)
+        try:
+            profiler.enable()
+        except ValueError:
+            profiler = None   # another profiler is already active on this thread
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if owned:
+            trace.profiler_thread = None
+        _local.trace = previous
+
+
+def bind(fn):
+    """
+    Wraps fn so that, run on another thread (a pool worker), its spans land
+    on the calling thread's trace, nested under the current span, and are
+    profiled with it. fn itself when no trace is active.
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return fn
+    depth = getattr(_local, "depth", 0)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "depth", 0)
+        _local.depth = depth
+        try:
+            with activate(trace):
+                return fn(*args, **kwargs)
+        finally:
+            _local.depth = previous
+    return wrapper
+
+
+def end(trace):
+    """
+    Finishes a trace: records its total, keeps it among the recent traces
+    and writes its profile.
+    """
+    if trace is None:
+        return
+    trace.total_s = time.perf_counter() - trace.start
+    observe("request_seconds", trace.total_s, kind=trace.name)
+    if trace.profiler is not None:
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(config.PROFILE_DIR, f"{trace.name}-{time.strftime('%Y%m%d-%H%M%S')}"
+                                                f"-{int(trace.start * 1e6) % 1000000:06d}.prof")
+        stats = None
+        for profiler in [trace.profiler, *trace.thread_profilers]:
+            profiler.create_stats()
+            if profiler.stats:
+                stats = pstats.Stats(profiler) if stats is None else stats.add(profiler)
+        if stats is None:
+            trace.profiler.dump_stats(path)
+        else:
+            stats.dump_stats(path)
+        trace.profile_path = path
+    with _lock:
+        _recent.append(trace.to_dict())
+
+
+@contextlib.contextmanager
+def request(name):
+    """
+    begin() + activate() + end() around a block. Yields the trace (None
+    when tracing is off).
+    """
+    trace = begin(name)
+    try:
+        with activate(trace):
+            yield trace
+    finally:
+        end(trace)
+
+
+def recent():
+    """
+    The most recent finished traces, newest last.
+    """
+    with _lock:
+        return list(_recent)
+
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def export_prometheus():
+    """
+    All counters and histograms in the Prometheus text exposition format.
+    """
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, list(v)) for k, v in _histograms.items())
+    lines, typed = [], set()
+    for (name, labels), value in counters:
+        metric = PREFIX + name
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_fmt_labels(labels)} {value}")
+    for (name, labels), h in histograms:
+        metric = PREFIX + name
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h):
+            cumulative += n
+            lines.append(f"{metric}_bucket{_fmt_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{metric}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {h[-1]}")
+        lines.append(f"{metric}_sum{_fmt_labels(labels)} {h[-2]:.6f}")
+        lines.append(f"{metric}_count{_fmt_labels(labels)} {h[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """
+    Per-stage call counts and seconds, slowest total first.
+    """
+    with _lock:
+        rows = [(dict(labels).get("stage"), h[-1], h[-2])
+                for (name, labels), h in _histograms.items() if name == "stage_seconds"]
+    rows.sort(key=lambda r: -r[2])
+    return [{"stage": s, "calls": n, "total_s": round(t, 4),
+             "mean_ms": round(t / n * 1000, 3) if n else None} for s, n, t in rows]
+
+
+def print_summary(tag):
+    """
+    Prints summary() as "[tag] ..." lines (scripts call this at exit).
+    """
+    if not config.TRACING:
+        return
+    for row in summary():
+        print(f"[{tag}] stage {row['stage']}: {row['calls']} calls, "
+              f"{row['total_s']} s total, {row['mean_ms']} ms mean")
@@ -0,0 +1,268 @@
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE  = "scales.npy"
+META_FILE    = "meta.json"
+CURRENT_FILE = "CURRENT"     # names the generation directory readers open
+
+# rows scored per matrix product, so the float32 copy of a block stays small
+BLOCK_ROWS = 65536
+
+# distinct filters whose matching rows are kept per index
+FILTER_CACHE_SIZE = 64
+
+
+def current_generation(path):
+    """
+    Name of the index generation at path ("" for an index written before
+    generations, directly in path), or None when there is no index.
+    """
+    try:
+        with open(os.path.join(path, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "" if os.path.exists(os.path.join(path, META_FILE)) else None
+
+
+def normalize(vectors):
+    """
+    L2-normalizes rows (float32).
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, dtype):
+    """
+    Returns (stored array, per-row scales or None) for "float16" or "int8".
+    int8 is symmetric per row: v ~= q * scale, with scale = max|v| / 127.
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        if not len(vectors):
+            return vectors.astype(np.int8), np.zeros(0, np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        q = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return q, scales
+    raise ValueError(f"Unsupported dtype: {dtype} (use 'float16' or 'int8')")
+
+
+class FlatIndex:
+    """
+    Brute-force vector index in a directory: L2-normalized embeddings,
+    stored as float16 or int8 in a memory-mapped .npy file, plus a JSON
+    sidecar with the chunk IDs, documents and metadata.
+
+    At the corpus sizes of a personal knowledge base, one matrix product
+    over the whole (memory-mapped) matrix and an argpartition for the
+    top-k is faster than a round-trip through Chroma, and the result is
+    exact. Scores are cosine similarities; hits carry the cosine distance.
+
+    Each write goes to a new generation directory and a one-line pointer
+    file is swapped to it, so an open index never changes underneath its
+    reader; the files of one generation are never rewritten.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.generation = current_generation(path)
+        if self.generation is None:
+            raise FileNotFoundError(f"No flat index at {path}")
+        gen_dir = os.path.join(path, self.generation)
+        with open(os.path.join(gen_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dtype = meta["dtype"]
+        self.version = meta.get("version")
+        self.ids = meta["ids"]
+        self.documents = meta["documents"]
+        self.metadatas = meta["metadatas"]
+        self._row = {cid: i for i, cid in enumerate(self.ids)}
+        self._filtered_rows = OrderedDict()   # filter key -> matching rows, LRU
+        self._filter_lock = threading.Lock()
+        self._vectors = np.load(os.path.join(gen_dir, VECTORS_FILE), mmap_mode="r")
+        self._scales = None
+        if self.dtype == "int8":
+            self._scales = np.load(os.path.join(gen_dir, SCALES_FILE))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def write(path, ids, embeddings, documents, metadatas, dtype="float16", version=None):
+        """
+        Writes a new generation of the index at path and then points
+        CURRENT at it, so readers see either the old index or the new one,
+        never a mix. Generations older than the previous one are removed.
+        """
+        os.makedirs(path, exist_ok=True)
+        vectors = normalize(embeddings) if len(ids) else np.zeros((0, 0), np.float32)
+        stored, scales = quantize(vectors, dtype)
+
+        previous = current_generation(path)
+        gens = [int(d[len("gen-"):]) for d in os.listdir(path)
+                if d.startswith("gen-") and d[len("gen-"):].isdigit()]
+        generation = f"gen-{max(gens, default=0) + 1:06d}"
+        gen_dir = os.path.join(path, generation)
+        os.makedirs(gen_dir)
+
+        with open(os.path.join(gen_dir, VECTORS_FILE), "wb") as f:
+            np.save(f, stored)
+        if scales is not None:
+            with open(os.path.join(gen_dir, SCALES_FILE), "wb") as f:
+                np.save(f, scales)
+        meta = {"dtype": dtype, "version": version, "ids": list(ids),
+                "documents": list(documents), "metadatas": list(metadatas)}
+        with open(os.path.join(gen_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        tmp = os.path.join(path, CURRENT_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(generation + "\n")
+        os.replace(tmp, os.path.join(path, CURRENT_FILE))
+
+        # the previous generation may still be open in a running app
+        for name in os.listdir(path):
+            if name.startswith("gen-") and name not in (generation, previous):
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        if previous == "":
+            for name in (VECTORS_FILE, SCALES_FILE, META_FILE):
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+
+    def scores(self, queries, rows=None):
+        """
+        Cosine similarities of each query (row) against every vector, or
+        only against the given rows (in that order).
+        """
+        q = normalize(queries)
+        if rows is not None:
+            vecs = np.asarray(self._vectors[rows], dtype=np.float32)
+            s = q @ vecs.T
+            if self._scales is not None:
+                s *= self._scales[rows]
+            return s
+        out = np.empty((len(q), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), BLOCK_ROWS):
+            block = np.asarray(self._vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            s = q @ block.T
+            if self._scales is not None:
+                s *= self._scales[start:start + BLOCK_ROWS]
+            out[:, start:start + BLOCK_ROWS] = s
+        return out
+
+    def matching_rows(self, predicate, key):
+        """
+        Rows whose metadata passes predicate, cached under key (a
+        generation is immutable; a rewrite is opened as a new index with
+        an empty cache). The FILTER_CACHE_SIZE most recent keys are kept.
+        """
+        with self._filter_lock:
+            rows = self._filtered_rows.get(key)
+            if rows is not None:
+                self._filtered_rows.move_to_end(key)
+                return rows
+        rows = np.array([i for i, m in enumerate(self.metadatas) if predicate(m)],
+                        dtype=np.int64)
+        with self._filter_lock:
+            self._filtered_rows[key] = rows
+            while len(self._filtered_rows) > FILTER_CACHE_SIZE:
+                self._filtered_rows.popitem(last=False)
+        return rows
+
+    def search(self, queries, k, rows=None):
+        """
+        Top-k for a batch of queries, over all vectors or only the given
+        rows. Returns, per query, a list of (row, cosine similarity), best
+        first.
+        """
+        n = len(self.ids) if rows is None else len(rows)
+        if not n:
+            return [[] for _ in np.atleast_2d(queries)]
+        scores = self.scores(queries, rows)
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if rows is not None:
+            top = rows[top]
+        return [list(zip(r.tolist(), sims.tolist())) for r, sims in zip(top, top_scores)]
+
+    def query(self, queries, k, rows=None):
+        """
+        Like search(), but returns hits shaped like dense_search():
+        {"id", "document", "metadata", "distance"}, per query.
+        """
+        return [
+            [{"id": self.ids[r], "document": self.documents[r],
+              "metadata": self.metadatas[r], "distance": 1.0 - s} for r, s in hits]
+            for hits in self.search(queries, k, rows)
+        ]
+
+    def get(self, ids, include=None):
+        """
+        Documents and metadata for chunk IDs; unknown IDs are skipped.
+        Returns {"ids", "documents", "metadatas"} like Chroma's get()
+        (`include` is accepted for compatibility and ignored).
+        """
+        rows = [self._row[cid] for cid in ids if cid in self._row]
+        return {"ids": [self.ids[r] for r in rows],
+                "documents": [self.documents[r] for r in rows],
+                "metadatas": [self.metadatas[r] for r in rows]}
+
+    def vectors(self, ids):
+        """
+        Stored (dequantized, normalized) vectors for chunk IDs, as rows.
+        """
+        rows = [self._row[cid] for cid in ids]
+        vecs = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self._scales is not None:
+            vecs *= self._scales[rows][:, None]
+        return vecs
+
+
+def export_collection(collection, path, dtype="float16", version=None, page_size=5000):
+    """
+    Copies a Chroma collection (IDs, embeddings, documents, metadata) into
+    a FlatIndex directory. Returns the number of vectors written.
+    """
+    ids, embeddings, documents, metadatas = [], [], [], []
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        got = collection.get(limit=page_size, offset=offset,
+                             include=["embeddings", "documents", "metadatas"])
+        ids.extend(got["ids"])
+        embeddings.extend(got["embeddings"])
+        documents.extend(got["documents"])
+        metadatas.extend(got["metadatas"])
+    FlatIndex.write(path, ids, np.asarray(embeddings, dtype=np.float32),
+                    documents, metadatas, dtype=dtype, version=version)
+    return len(ids)
+
+
+def recall_at_k(index, collection, queries, k=10):
+    """
+    Agreement of a FlatIndex with Chroma on a batch of query embeddings:
+    the mean fraction of Chroma's top-k IDs that the flat index also
+    returns in its top-k.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    flat = index.search(queries, k)
+    res = collection.query(query_embeddings=queries.tolist(), n_results=k, include=[])
+    recalls = []
+    for chroma_ids, hits in zip(res["ids"], flat):
+        if not chroma_ids:
+            continue
+        found = {index.ids[r] for r, _ in hits}
+        recalls.append(len(found.intersection(chroma_ids)) / len(chroma_ids))
+    return float(np.mean(recalls)) if recalls else None
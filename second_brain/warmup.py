@@ -0,0 +1,147 @@
+import threading
+import time
+
+from . import config, tracing
+
+# Imported first thing by app.py: startup times are measured from here
+_launched_at = time.time()
+
+
+def _warm_embedder():
+    from .pipeline import embed_query
+    embed_query("warmup")   # loads the model and starts the batcher
+
+
+def _warm_collection():
+    from .resources import get_collection, get_lexical_index, get_vector_store
+    get_collection().count()
+    get_lexical_index().count()
+    if config.VECTOR_BACKEND == "flat":
+        get_vector_store()
+
+
+def _warm_llm():
+    from .resources import get_llm
+    get_llm().preload()
+
+
+def _warm_reranker():
+    from .resources import get_reranker
+    get_reranker()
+
+
+def _warm_clip():
+    from .resources import get_clip, get_image_collection
+    if get_image_collection().count():
+        get_clip()
+
+
+def default_steps():
+    """
+    (name, function) pairs in warmup order: what the first question needs
+    first, the LLM (slowest, runs on the Ollama side) last.
+    """
+    steps = [("embedder", _warm_embedder), ("collection", _warm_collection)]
+    if config.RERANK:
+        steps.append(("reranker", _warm_reranker))
+    if config.IMAGE_SEARCH:
+        steps.append(("clip", _warm_clip))
+    steps.append(("llm", _warm_llm))
+    return steps
+
+
+class Warmup:
+    """
+    Loads models and opens stores on a background thread, so the UI is up
+    immediately and the first question does not pay for the loads. Each
+    step's status and duration are exposed for a readiness indicator;
+    a failed step is reported and skipped (it is retried lazily on first
+    use, as before).
+    """
+
+    def __init__(self, steps=None):
+        self.steps = steps if steps is not None else default_steps()
+        self.status = {name: {"state": "pending", "seconds": None, "error": None}
+                       for name, _ in self.steps}
+        self.started_at = None
+        self.finished_at = None
+        self.first_answer_s = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        with tracing.request("warmup"):
+            for name, fn in self.steps:
+                with self._lock:
+                    self.status[name]["state"] = "running"
+                t = time.perf_counter()
+                try:
+                    with tracing.span(f"warmup.{name}"):
+                        fn()
+                    state, error = "ready", None
+                except Exception as e:
+                    state, error = "failed", str(e)
+                    print(f"[warmup] {name} failed: {e}", flush=True)
+                with self._lock:
+                    self.status[name].update(state=state, error=error,
+                                             seconds=round(time.perf_counter() - t, 2))
+        self.finished_at = time.time()
+        print(f"[warmup] Done in {self.finished_at - self.started_at:.1f}s: "
+              + ", ".join(f"{n} {s['state']} ({s['seconds']}s)" for n, s in self.status.items()),
+              flush=True)
+
+    @property
+    def ready(self):
+        return self.finished_at is not None
+
+    def record_answer(self):
+        """
+        Call after each answered question; the first one after launch is
+        kept as time-to-first-answer.
+        """
+        with self._lock:
+            if self.first_answer_s is not None:
+                return
+            self.first_answer_s = since_launch()
+        print(f"[warmup] Time to first answer after launch: {self.first_answer_s}s "
+              f"(warmup {'finished' if self.ready else 'still running'})", flush=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "steps": {n: dict(s) for n, s in self.status.items()},
+                "warmup_s": round(self.finished_at - self.started_at, 2) if self.ready else None,
+                "time_to_first_answer_s": self.first_answer_s,
+            }
+
+    def summary(self):
+        """
+        One line for the readiness indicator.
+        """
+        stats = self.stats()
+        if stats["ready"]:
+            failed = [n for n, s in stats["steps"].items() if s["state"] == "failed"]
+            line = f"🟢 Ready (warmed up in {stats['warmup_s']} s)"
+            if failed:
+                line = f"🟡 Ready, but {', '.join(failed)} failed to load (see Server Status)"
+        else:
+            running = [n for n, s in stats["steps"].items() if s["state"] == "running"]
+            line = f"🟠 Warming up: loading {', '.join(running) or '…'}"
+        if stats["time_to_first_answer_s"] is not None:
+            line += f" · first answer {stats['time_to_first_answer_s']} s after launch"
+        return line
+
+
+def since_launch():
+    """
+    Seconds since this module was first imported (app startup).
+    """
+    return round(time.time() - _launched_at, 2)
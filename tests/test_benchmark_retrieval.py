@@ -0,0 +1,30 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+from benchmark_retrieval import ranking_quality, summarize, synthetic_corpus
+
+
+def test_synthetic_corpus_is_reproducible_and_labeled():
+    records, queries = synthetic_corpus(20, 5, seed=3)
+    assert (records, queries) == synthetic_corpus(20, 5, seed=3)
+    sources = {r["source_file"] for r in records}
+    assert len(sources) == 20 and len(queries) == 5
+    assert all(set(q["relevant"]) <= sources for q in queries)
+
+
+def test_recall_and_mrr():
+    def hits(*sources):
+        return [{"metadata": {"source_file": s}} for s in sources]
+    queries = [{"relevant": ["a"]}, {"relevant": ["b"]}, {"relevant": ["c"]}]
+    quality = ranking_quality([hits("a", "x"), hits("x", "b"), hits("x", "y", "c")], queries, k=2)
+    assert quality == {"recall@2": round(2 / 3, 4), "mrr": 0.5}
+
+
+def test_latency_summary():
+    s = summarize([0.001, 0.002, 0.003, 0.004])
+    assert s["n"] == 4 and s["p50_ms"] == 2.5 and s["mean_ms"] == 2.5
+    assert s["qps"] == 400.0
+    assert summarize([]) is None
@@ -0,0 +1,234 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+pytest.importorskip("chromadb")
+pytest.importorskip("tqdm")
+import build_rag_db
+from second_brain import config
+from second_brain.chunking import Chunker
+from second_brain.lexical import LexicalIndex
+
+
+class FakeCollection:
+    """
+    The part of a Chroma collection build_rag_db uses, in a dict.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.upserts = 0
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.upserts += 1
+        for i, e, m, d in zip(ids, embeddings, metadatas, documents):
+            self.rows[i] = {"embedding": e, "metadata": m, "document": d}
+
+    def update(self, ids, metadatas):
+        for i, m in zip(ids, metadatas):
+            if i in self.rows:
+                self.rows[i]["metadata"] = m
+
+    def delete(self, ids):
+        for i in ids:
+            self.rows.pop(i, None)
+
+    def get(self, ids=None, include=(), limit=None, offset=0):
+        ids = [i for i in (ids if ids is not None else sorted(self.rows)) if i in self.rows]
+        ids = ids[offset:offset + limit] if limit else ids
+        return {"ids": ids,
+                "metadatas": [self.rows[i]["metadata"] for i in ids],
+                "documents": [self.rows[i]["document"] for i in ids]}
+
+    def count(self):
+        return len(self.rows)
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    for name in ("INDEX_MANIFEST", "SOURCE_CATALOG", "INDEX_VERSION_FILE"):
+        monkeypatch.setattr(config, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(config, "VECTOR_BACKEND", "chroma")
+    monkeypatch.setattr(build_rag_db, "CHECKPOINT_FILE", str(tmp_path / "checkpoint.json"))
+    monkeypatch.setattr(build_rag_db, "CHUNK_STATS_FILE", str(tmp_path / "chunk_stats.json"))
+    monkeypatch.setattr(build_rag_db, "collection", FakeCollection())
+    monkeypatch.setattr(build_rag_db, "image_collection", FakeCollection())
+    monkeypatch.setattr(build_rag_db, "lexical_index",
+                        LexicalIndex(str(tmp_path / "lexical.sqlite")))
+    monkeypatch.setattr(build_rag_db, "dedup_index", None)
+    monkeypatch.setattr(build_rag_db, "chunker", Chunker(max_tokens=64))
+    monkeypatch.setattr(build_rag_db, "text_model", FakeEncoder())
+    monkeypatch.setattr(build_rag_db, "embed_workers", 1)
+    return build_rag_db
+
+
+def write_corpus(path, sources):
+    """
+    sources: {file name: [page text, ...]}, written as text records.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for name, pages in sources.items():
+            for page, text in enumerate(pages, 1):
+                f.write(json.dumps({"source_type": "text", "source_file": name,
+                                    "page_or_segment": page, "text": text}) + "\n")
+    return str(path)
+
+
+def test_batches_share_one_encode_and_upsert(build, tmp_path):
+    corpus = write_corpus(tmp_path / "corpus.jsonl", {
+        f"doc{i}.json": [f"Page {p} of document {i} is about topic {i * 10 + p}."
+                         for p in range(1, 4)]
+        for i in range(4)})
+    build.process_corpus(corpus, batch_size=6)
+    # 12 chunks in batches of (at least) 6: two encode() calls, two upserts
+    assert build.collection.count() == 12
+    assert [len(c) for c in build.text_model.calls] == [6, 6]
+    assert build.collection.upserts == 2
+    assert build.lexical_index.count() == 12
+
+
+def test_reindex_only_touches_changed_sources(build, tmp_path):
+    sources = {"a.json": ["Alpha talks about apples."], "b.json": ["Beta talks about bees."],
+               "c.json": ["Gamma talks about grapes."]}
+    corpus = write_corpus(tmp_path / "corpus.jsonl", sources)
+    build.process_corpus(corpus)
+    first = set(build.collection.rows)
+    build.text_model.calls.clear()
+
+    build.process_corpus(corpus)
+    assert build.text_model.calls == []
+    assert set(build.collection.rows) == first
+
+    sources["b.json"] = ["Beta now talks about bears."]
+    del sources["c.json"]
+    write_corpus(tmp_path / "corpus.jsonl", sources)
+    build.process_corpus(corpus)
+    assert build.text_model.calls == [["Beta now talks about bears."]]
+    assert sorted(m["metadata"]["source_file"] for m in build.collection.rows.values()) == \
+        ["a.json", "b.json"]
+    assert build.lexical_index.search("bees") == []
+    assert build.lexical_index.count() == 2
+
+
+def test_sources_stream_with_their_end_offsets(tmp_path):
+    path = write_corpus(tmp_path / "corpus.jsonl",
+                        {"a.json": ["one", "two"], "b.json": ["three"]})
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    with open(path, "rb") as f:
+        got = [(key, len(records), end)
+               for key, records, _, end in build_rag_db.iter_sources(build_rag_db.iter_lines(f))]
+    assert got == [("text:a.json", 2, len(lines[0]) + len(lines[1])),
+                   ("text:b.json", 1, sum(map(len, lines)))]
+    # resuming at a source's end offset reads only the sources after it
+    with open(path, "rb") as f:
+        f.seek(got[0][2])
+        assert [key for key, *_ in build_rag_db.iter_sources(build_rag_db.iter_lines(f))] == \
+            ["text:b.json"]
+
+
+def test_resume_continues_after_the_last_commit(build, tmp_path, monkeypatch):
+    texts = [f"Document {i} covers subject {i}." for i in range(4)]
+    corpus = write_corpus(tmp_path / "corpus.jsonl",
+                          {f"doc{i}.json": [t] for i, t in enumerate(texts)})
+    real, written = build.embed_and_add_batch, []
+
+    def crash_on_third(batch, batch_size):
+        if batch:
+            written.append(batch)
+            if len(written) == 3:
+                raise RuntimeError("killed")
+        return real(batch, batch_size)
+    monkeypatch.setattr(build, "embed_and_add_batch", crash_on_third)
+    with pytest.raises(RuntimeError):
+        build.process_corpus(corpus, batch_size=1)
+    assert os.path.exists(build.CHECKPOINT_FILE)
+
+    monkeypatch.setattr(build, "embed_and_add_batch", real)
+    build.text_model.calls.clear()
+    build.process_corpus(corpus, batch_size=1, resume=True)
+    assert build.text_model.calls == [[texts[2]], [texts[3]]]
+    assert build.collection.count() == 4
+    assert not os.path.exists(build.CHECKPOINT_FILE)
+
+
+def test_shared_image_is_embedded_once(build, tmp_path, monkeypatch):
+    embedded = []
+
+    def fake_embed(batch):
+        embedded.extend(item_id for item_id, _, _ in batch)
+        build.image_collection.upsert([i for i, _, _ in batch], [[1.0]] * len(batch),
+                                      [build.clean_metadata(m) for _, _, m in batch],
+                                      ["" for _ in batch])
+        return len(batch), set()
+    monkeypatch.setattr(build, "embed_and_add_images", fake_embed)
+    image = tmp_path / "img_1.png"
+    image.write_bytes(b"png bytes")
+
+    def write_images(occurrences):
+        with open(tmp_path / "corpus.jsonl", "w", encoding="utf-8") as f:
+            for pdf, pages in sorted(occurrences.items()):
+                f.write(json.dumps({
+                    "source_type": "image", "source_file": pdf.replace(".pdf", ".json"),
+                    "page_or_segment": min(pages), "text": "[Image: img_1.png]",
+                    "extra": {"path": str(image), "image_file": "img_1.png", "pdf_file": pdf,
+                              "occurrences": occurrences}}) + "\n")
+        return str(tmp_path / "corpus.jsonl")
+
+    build.process_corpus(write_images({"a.pdf": [4, 2], "b.pdf": [1]}))
+    assert len(embedded) == 1 and build.image_collection.count() == 1
+    (meta,) = [row["metadata"] for row in build.image_collection.rows.values()]
+    assert (meta["source_file"], meta["page_or_segment"]) == ("a.json", 2)
+    assert [(a["source_file"], a["page_or_segment"]) for a in json.loads(meta["aliases"])] == \
+        [("a.json", 4), ("b.json", 1)]
+
+    # b.pdf no longer has it: the vector stays (a.pdf still does), re-described
+    build.process_corpus(write_images({"a.pdf": [2]}))
+    assert len(embedded) == 1 and build.image_collection.count() == 1
+    (meta,) = [row["metadata"] for row in build.image_collection.rows.values()]
+    assert json.loads(meta["aliases"]) == []
+
+    with open(tmp_path / "corpus.jsonl", "w", encoding="utf-8"):
+        pass
+    build.process_corpus(str(tmp_path / "corpus.jsonl"))
+    assert build.image_collection.count() == 0
+
+
+def test_duplicate_sources_are_aliased_and_reindexed_when_orphaned(build, tmp_path, monkeypatch):
+    from second_brain.dedup import DedupIndex
+    monkeypatch.setattr(build, "dedup_index",
+                        DedupIndex(str(tmp_path / "dedup.sqlite"), threshold=0.7))
+    text = ("Gradient descent updates the weights in the direction of the negative "
+            "gradient of the loss, scaled by the learning rate.")
+    sources = {"a.json": [text], "copy.json": [text]}
+    corpus = write_corpus(tmp_path / "corpus.jsonl", sources)
+    build.process_corpus(corpus)
+    assert build.collection.count() == 1 and len(build.text_model.calls) == 1
+    (row,) = build.collection.rows.values()
+    assert [a["source_file"] for a in json.loads(row["metadata"]["aliases"])] == ["copy.json"]
+    assert [cid for cid, _ in build.lexical_index.search("gradient",
+                                                         filters={"source_file": "copy.json"})] \
+        == list(build.collection.rows)
+
+    # the canonical chunk's source goes away: the copy is embedded itself
+    del sources["a.json"]
+    write_corpus(tmp_path / "corpus.jsonl", sources)
+    build.process_corpus(corpus)
+    (row,) = build.collection.rows.values()
+    assert row["metadata"]["source_file"] == "copy.json"
+    assert build.dedup_index.count() == (1, 0)
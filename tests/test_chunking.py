@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.chunking import Chunker, estimate_tokens
+
+TEXT = ("Short one. " * 40
+        + "This sentence is deliberately very long, with commas, clauses and "
+          "internationalization-heavy vocabulary " * 8
+        + "\n\nA closing paragraph; it ends here!")
+
+
+def test_estimate_is_additive():
+    parts = ["Hello, world.", "Tokenization-friendly estimates", "x"]
+    assert estimate_tokens(" ".join(parts)) == sum(estimate_tokens(p) for p in parts)
+
+
+def test_chunks_fit_budget_without_tokenizer():
+    chunker = Chunker(tokenizer=None, max_tokens=20)
+    chunks = chunker.chunk(TEXT, "text")
+    assert len(chunks) > 1
+    assert max(chunker.count_tokens(chunks)) <= 20
+    assert chunker.stats.summary()["text"]["max_tokens"] <= 20
+    # nothing dropped: every word of the input is in some chunk
+    assert set(TEXT.split()) <= set(" ".join(chunks).split())
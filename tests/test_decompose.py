@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.decompose import decompose_rules
+
+
+def test_splits_on_semicolon_with_or_without_space():
+    expected = ["what is BM25", "who proposed it"]
+    assert decompose_rules("what is BM25; who proposed it") == expected
+    assert decompose_rules("what is BM25 ; who proposed it") == expected
+
+
+def test_splits_on_conjunction_before_question_word():
+    assert decompose_rules("What is RRF and how does it weight ranks?") == \
+        ["What is RRF", "how does it weight ranks?"]
+
+
+def test_single_question_is_not_split():
+    assert decompose_rules("What is reciprocal rank fusion?") == []
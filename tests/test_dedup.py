@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.dedup import DedupIndex
+
+TEXT = ("Gradient descent updates the weights in the direction of the negative gradient "
+        "of the loss, scaled by the learning rate, until the loss stops improving.")
+
+
+def test_near_duplicates_become_aliases(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.sqlite"), threshold=0.7)
+    assert index.find_or_add("a", TEXT, "text:a.json", {"source_file": "a.json"}) == ("a", 1.0)
+    # the same passage re-extracted: case, spacing and punctuation differ
+    copy = TEXT.upper().replace(",", " ;")
+    canonical, similarity = index.find_or_add("b", copy, "text:b.json", {"source_file": "b.json"})
+    assert canonical == "a" and similarity >= 0.7
+    other = "Attention weighs every token of the sequence by its similarity to the query."
+    assert index.find_or_add("c", other, "text:c.json", {"source_file": "c.json"})[0] == "c"
+    assert index.count() == (2, 1)
+    assert index.aliases(["a", "c"]) == {"a": [{"source_file": "b.json"}], "c": []}
+
+
+def test_removing_a_canonical_chunk_orphans_its_aliases(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.sqlite"), threshold=0.7)
+    index.find_or_add("a", TEXT, "text:a.json", {})
+    index.find_or_add("b", TEXT, "text:b.json", {})
+    index.find_or_add("c", TEXT + " Again.", "text:c.json", {})
+    # an alias going away only changes its canonical chunk's list
+    assert index.remove(["c"]) == ({"a"}, {})
+    # the canonical going away leaves its aliases to be indexed again
+    assert index.remove(["a"]) == (set(), {"text:b.json": {"b"}})
+    assert index.count() == (0, 0)
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from second_brain import embed_pool
+from second_brain.embed_pool import EmbedPool, default_workers
+
+
+def test_default_workers_follow_the_core_count():
+    assert default_workers(cores=16, threads_per_worker=4) == 4
+    assert default_workers(cores=2, threads_per_worker=4) == 1
+
+
+def test_shards_are_concatenated_in_input_order(monkeypatch):
+    shards = []
+
+    def encode_shard(texts, batch_size):
+        shards.append(list(texts))
+        return np.array([[float(t)] for t in texts])
+    monkeypatch.setattr(embed_pool, "encode_shard", encode_shard)
+    pool = EmbedPool("model", workers=3, threads_per_worker=1, pin=False)
+    pool._pool.shutdown()
+    pool._pool = ThreadPoolExecutor(max_workers=3)   # no model processes
+    try:
+        out = pool.encode([str(i) for i in range(7)])
+    finally:
+        pool.close()
+    assert out[:, 0].tolist() == list(range(7))
+    assert sorted(map(len, shards)) == [1, 3, 3]
+
+
+def test_spawned_workers_import_nothing_heavy_before_their_setup():
+    # what a spawned worker imports before init_worker() sets the thread
+    # variables: the build script (as __mp_main__) and the worker module
+    code = ("import runpy, sys; "
+            "runpy.run_path('scripts/build_rag_db.py', run_name='__mp_main__'); "
+            "import second_brain.embed_worker; "
+            "print(sorted(m for m in ('numpy', 'torch', 'chromadb', 'tqdm') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == "[]"
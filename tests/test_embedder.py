@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.embedder import backend_signature, compare_embedders
+
+
+class HashEmbedder:
+    """
+    Deterministic unit vectors per text, optionally perturbed by noise.
+    """
+
+    def __init__(self, noise=0.0):
+        self.noise = noise
+
+    def encode(self, texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False,
+               normalize_embeddings=True):
+        rows = []
+        for t in texts:
+            rng = np.random.default_rng(sum(map(ord, t)))
+            v = rng.normal(size=16) + self.noise * np.random.default_rng(len(t)).normal(size=16)
+            rows.append(v / np.linalg.norm(v))
+        return np.array(rows)
+
+
+CORPUS = [f"chunk number {i} about {w}" for i, w in enumerate("abcdefghijklmnopqrst" * 2)]
+QUERIES = [f"question {w}" for w in "abcde"]
+
+
+def test_identical_models_agree():
+    report = compare_embedders(HashEmbedder(), HashEmbedder(), CORPUS, QUERIES, k=5)
+    assert report["cosine_min"] > 0.9999
+    assert report["recall@5"] == 1.0 and report["recall@5_mixed"] == 1.0
+
+
+def test_a_perturbed_model_scores_lower():
+    report = compare_embedders(HashEmbedder(), HashEmbedder(noise=1.0), CORPUS, QUERIES, k=5)
+    assert report["cosine_mean"] < 0.99
+    assert report["recall@5_mixed"] < 1.0
+
+
+def test_only_non_default_backends_salt_the_index():
+    assert backend_signature("torch") == ""
+    assert backend_signature("int8") != backend_signature("onnx", "onnx/model_qint8_avx2.onnx")
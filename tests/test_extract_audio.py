@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+pytest.importorskip("tqdm")
+import extract_audio
+
+
+def test_windows_overlap_the_next_one(monkeypatch):
+    monkeypatch.setattr(extract_audio, "probe_duration", lambda path: 25.0)
+    duration, tasks = extract_audio.plan_chunks("talk.mp3", 10, overlap=2)
+    assert duration == 25.0
+    assert [(index, start, length) for _, index, start, length in tasks] == \
+        [(0, 0.0, 12), (1, 10.0, 12), (2, 20.0, 5.0)]
+    monkeypatch.setattr(extract_audio, "probe_duration", lambda path: None)
+    assert extract_audio.plan_chunks("talk.mp3", 10)[1] == [("talk.mp3", 0, 0.0, None)]
+
+
+def test_stitch_keeps_each_overlapped_segment_once():
+    def seg(start, end, text):
+        return {"start": start, "end": end, "text": text}
+    parts = [
+        # window 0 hears 0-12 s, window 1 hears 10-22 s
+        {"index": 1, "text": "", "segments": [seg(9.5, 11.5, "cut"), seg(11.6, 14.0, "three"),
+                                               seg(14.0, 18.0, "four")]},
+        {"index": 0, "text": "", "segments": [seg(0.0, 5.0, "one"), seg(5.0, 11.5, "two"),
+                                               seg(11.5, 12.0, "thr")]},
+    ]
+    out = extract_audio.stitch("talk.mp3", 22.0, parts, {0: 0.0, 1: 10.0})
+    assert out["transcript"] == "one two three four"
+    assert [s["start"] for s in out["segments"]] == [0.0, 5.0, 11.6, 14.0]
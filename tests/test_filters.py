@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.filters import matches, normalize_filters
+from second_brain.lexical import LexicalIndex
+
+CANONICAL = {"source_type": "text", "source_file": "a.json", "page_or_segment": 1,
+             "aliases": json.dumps([{"source_type": "text", "source_file": "b.json",
+                                     "page_or_segment": 7}])}
+
+
+def test_matches_through_alias():
+    assert matches(normalize_filters({"source_file": "b.json"}), CANONICAL)
+    assert matches(normalize_filters({"page_min": 5, "page_max": 8}), CANONICAL)
+    assert not matches(normalize_filters({"source_file": "b.json", "page_max": 3}), CANONICAL)
+
+
+def test_lexical_search_matches_through_alias(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    index.add([("c1", "backpropagation through time", CANONICAL),
+               ("c2", "backpropagation basics",
+                {"source_type": "text", "source_file": "c.json", "page_or_segment": 2})])
+    found = [cid for cid, _ in index.search("backpropagation", 5, filters={"source_file": "b.json"})]
+    assert found == ["c1"]
+    assert index.alias_matches({"source_file": "b.json"}) == ["c1"]
+    assert index.alias_matches({"source_file": "a.json"}) == []
+    index.set_aliases([("c1", [])])
+    assert index.search("backpropagation", 5, filters={"source_file": "b.json"}) == []
+
+
+def test_filtered_image_search_matches_through_aliases(monkeypatch):
+    from second_brain import pipeline
+
+    metas = [{"source_type": "image", "source_file": "a.json", "page_or_segment": 2,
+              "aliases": json.dumps([{"source_type": "image", "source_file": "b.json",
+                                      "page_or_segment": 7}])},
+             {"source_type": "image", "source_file": "c.json", "page_or_segment": 1,
+              "aliases": "[]"}]
+
+    class Images:
+        def count(self):
+            return len(metas)
+
+        def get(self, include=()):
+            return {"metadatas": metas, "embeddings": [[1.0, 0.0], [1.0, 0.0]]}
+
+    monkeypatch.setattr(pipeline, "get_image_collection", Images)
+    monkeypatch.setattr(pipeline, "get_clip", lambda: (None, None))
+    monkeypatch.setattr(pipeline, "embed_texts_for_images",
+                        lambda texts, model, processor: np.array([[1.0, 0.0]]))
+    hits = pipeline.search_images("diagram", filters={"source_file": "b.json", "page_min": 5})
+    assert [m["source_file"] for m in hits] == ["a.json"]
+    assert pipeline.search_images("diagram", filters={"source_file": "b.json",
+                                                      "page_max": 5}) == []
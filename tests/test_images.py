@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+from normalize_data import load_images
+from second_brain import config, pipeline
+from second_brain.images import format_image_hit
+
+
+def test_extracted_images_are_listed_under_their_pdfs(tmp_path):
+    diagrams = tmp_path / "diagrams"
+    diagrams.mkdir()
+    for name in ("img_1.png", "upload.png"):
+        (diagrams / name).write_bytes(b"png")
+    index = tmp_path / "image_index.json"
+    index.write_text(json.dumps({"img_1.png": {"occurrences": {"b.pdf": [3], "a.pdf": [5, 2]}}}))
+    records = list(load_images(str(diagrams), str(index)))
+    assert [(r["source_file"], r["page_or_segment"]) for r in records] == \
+        [("a.json", 2), ("b.json", 3), ("upload.png", None)]
+    assert all(r["source_type"] == "image" for r in records)
+    assert format_image_hit({**records[0], **records[0]["extra"], "image_path": "d/img_1.png"}) == \
+        "[Image: img_1.png] d/img_1.png from a.json (page 2)"
+
+
+def test_image_search_keeps_close_matches(monkeypatch):
+    class Images:
+        def count(self):
+            return 3
+
+        def query(self, query_embeddings, n_results, include):
+            return {"metadatas": [[{"image_file": "near.png"}, {"image_file": "far.png"}]],
+                    "distances": [[0.1, config.IMAGE_MAX_DISTANCE + 0.1]]}
+
+    monkeypatch.setattr(pipeline, "get_image_collection", Images)
+    monkeypatch.setattr(pipeline, "get_clip", lambda: (None, None))
+    monkeypatch.setattr(pipeline, "embed_texts_for_images",
+                        lambda texts, model, processor: np.array([[1.0, 0.0]]))
+    assert pipeline.search_images("diagram", k=2) == [{"image_file": "near.png"}]
+    assert pipeline.search_images("diagram", filters={"source_type": "text"}) == []
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.lexical import LexicalIndex
+
+# "common" is in every chunk; "rare" in a few, which also repeat "common"
+# less than the chunks the capped read of "common" starts with
+CHUNKS = ([(f"c{i}", "common common common filler") for i in range(40)]
+          + [(f"r{i}", f"rare common {'pad ' * i}") for i in range(5)])
+
+
+def test_capped_search_matches_exact(tmp_path):
+    path = str(tmp_path / "lexical.sqlite")
+    capped = LexicalIndex(path, max_postings=10)
+    capped.add(CHUNKS)
+    exact = LexicalIndex(path, max_postings=None)
+    for query in ("rare common", "common", "rare"):
+        assert capped.search(query, k=5) == exact.search(query, k=5)
+    # the capped read of "common" misses the r* chunks; their score for it is
+    # filled in afterwards
+    assert [cid for cid, _ in capped.search("rare common", k=5)] == [f"r{i}" for i in range(5)]
+
+
+def test_impacts_are_backfilled_for_old_indexes(tmp_path):
+    path = str(tmp_path / "lexical.sqlite")
+    LexicalIndex(path).add(CHUNKS)
+    db = sqlite3.connect(path)
+    db.executescript("""
+        DROP INDEX postings_impact;
+        CREATE TABLE old AS SELECT term_id, doc_id, tf FROM postings;
+        DROP TABLE postings;
+        CREATE TABLE postings (term_id INTEGER NOT NULL, doc_id INTEGER NOT NULL,
+            tf INTEGER NOT NULL, PRIMARY KEY (term_id, doc_id)) WITHOUT ROWID;
+        INSERT INTO postings SELECT * FROM old;
+        DROP TABLE old;
+    """)
+    db.close()
+    index = LexicalIndex(path, max_postings=10)
+    assert index._db.execute("SELECT COUNT(*) FROM postings WHERE impact IS NULL").fetchone()[0] == 0
+    assert [cid for cid, _ in index.search("rare common", k=5)] == [f"r{i}" for i in range(5)]
+
+
+def test_readd_replaces_aliases(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    alias = '[{"source_type": "pdf", "source_file": "b.json", "page_or_segment": 3}]'
+    index.add([("c1", "shared text", {"source_type": "pdf", "source_file": "a.json",
+                                      "aliases": alias})])
+    assert index.alias_matches({"source_file": "b.json"}) == ["c1"]
+    index.add([("c1", "shared text", {"source_type": "pdf", "source_file": "a.json"})])
+    assert index.alias_count() == 0
+    assert index.search("shared", filters={"source_file": "b.json"}) == []
+
+
+def test_filtered_capped_search_matches_exact(tmp_path):
+    path = str(tmp_path / "lexical.sqlite")
+    capped = LexicalIndex(path, max_postings=10)
+    capped.add([(cid, text, {"source_type": "audio" if i % 3 == 0 else "pdf",
+                             "source_file": "one.json" if i == 0 else "many.json"})
+                for i, (cid, text) in enumerate(CHUNKS)])
+    exact = LexicalIndex(path, max_postings=None)
+    for filters in ({"source_type": "audio"}, {"source_file": "one.json"}):
+        for query in ("rare common", "common", "rare"):
+            assert capped.search(query, k=5, filters=filters) == exact.search(query, k=5, filters=filters)
+    # a write through another connection drops the cached lengths and masks
+    exact.add([("new", "rare rare rare", {"source_type": "audio"})])
+    assert capped.search("rare", k=1, filters={"source_type": "audio"})[0][0] == "new"
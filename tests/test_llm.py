@@ -0,0 +1,31 @@
+import os
+import sys
+import threading
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+from second_brain.llm import OllamaClient
+from stub_ollama import ANSWER, serve
+
+
+def test_interleaved_streams_on_one_thread():
+    server = serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = OllamaClient(f"http://127.0.0.1:{server.server_address[1]}", "stub")
+        first, second = client.stream("a"), client.stream("b")
+        parts = {1: [], 2: []}
+        for a, b in zip(first, second):
+            parts[1].append(a)
+            parts[2].append(b)
+        parts[1].extend(first)
+        parts[2].extend(second)
+        assert "".join(parts[1]) == ANSWER
+        assert "".join(parts[2]) == ANSWER
+        # both connections went back to the pool and are reused
+        assert len(client._idle) == 2
+        assert client.generate("c") == ANSWER
+    finally:
+        server.shutdown()
+        server.server_close()
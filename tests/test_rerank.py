@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.rerank import Reranker
+
+
+class SlowModel:
+    """
+    Scores a pair by its chunk's length, taking `pair_s` per pair.
+    """
+
+    def __init__(self, pair_s):
+        self.pair_s = pair_s
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls.append(len(pairs))
+        time.sleep(self.pair_s * len(pairs))
+        return [len(doc) for _, doc in pairs]
+
+
+def test_rerank_scores_all_candidates_in_one_call():
+    model = SlowModel(0)
+    hits = [{"id": str(i), "document": "x" * i} for i in (2, 9, 5)]
+    top, _ = Reranker(model).rerank("q", hits, k=2)
+    assert model.calls == [3]
+    assert [h["id"] for h in top] == ["9", "5"]
+    assert top[0]["rerank_score"] == 9.0
+
+
+def test_candidate_count_follows_the_latency_budget():
+    reranker = Reranker(SlowModel(0.01), budget_ms=100, max_candidates=30, smoothing=1.0)
+    assert reranker.candidate_count(5) == 30      # no estimate yet
+    reranker.rerank("q", [{"id": "a", "document": "a"}] * 10, k=5)
+    # ~10 ms a pair: about 10 pairs fit in 100 ms, and never fewer than k
+    assert 5 <= reranker.candidate_count(5) <= 10
+    assert reranker.candidate_count(20) == 20
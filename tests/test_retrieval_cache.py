@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import cache as cache_module
+from second_brain.cache import RetrievalCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module.time, "time", Clock())
+    cache = RetrievalCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put("a", {"context": "A"})
+    cache.put("b", {"context": "B"})
+    assert cache.get("a") == {"context": "A"}   # b is now least recently used
+    cache.put("c", {"context": "C"})
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"context": "A"} and cache.get("c") == {"context": "C"}
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    cache = RetrievalCache(str(tmp_path / "cache.sqlite"), ttl_s=10)
+    cache.put("a", {"context": "A"})
+    assert cache.get("a") == {"context": "A"}
+    clock.now += 60
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_keys_follow_the_index_version():
+    key = RetrievalCache.make_key("What is  BM25?", 5, "v1")
+    assert key == RetrievalCache.make_key("what is bm25?", 5, "v1")
+    assert key != RetrievalCache.make_key("what is bm25?", 5, "v2")
+    assert key != RetrievalCache.make_key("what is bm25?", 3, "v1")
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.semantic_cache import SemanticCache
+
+
+def _vec(i, dim=8):
+    v = np.zeros(dim, dtype=np.float32)
+    v[i] = 1.0
+    return v
+
+
+def test_update_after_eviction_is_a_no_op():
+    cache = SemanticCache(dim=8, capacity=2, threshold=0.9)
+    handle_a = cache.put(_vec(0), {"context": "A"})
+    cache.put(_vec(1), {"context": "B"})
+    cache.lookup(_vec(1))                    # A is now least recently used
+    cache.put(_vec(2), {"context": "C"})     # evicts A's slot
+    cache.update(handle_a, answer="answer to A")
+    _, value, _ = cache.lookup(_vec(2))
+    assert value == {"context": "C"}
+
+
+def test_update_after_reset_is_a_no_op():
+    cache = SemanticCache(dim=8, capacity=4, threshold=0.9)
+    handle = cache.put(_vec(0), {"context": "A"}, fingerprint="v1")
+    cache.put(_vec(1), {"context": "B"}, fingerprint="v2")
+    cache.update(handle, answer="answer to A")
+    _, value, _ = cache.lookup(_vec(1), fingerprint="v2")
+    assert "answer" not in value
+
+
+def test_mismatched_entries_are_misses():
+    cache = SemanticCache(dim=8, capacity=4, threshold=0.9)
+    cache.put(_vec(0), {"context": "A", "k": 5})
+    handle, value, _ = cache.lookup(_vec(0), match={"k": 3})
+    assert handle is None and value is None
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 1
+    cache.put(_vec(0), {"context": "A3", "k": 3})
+    _, value, _ = cache.lookup(_vec(0), match={"k": 3})
+    assert value["context"] == "A3"
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain.serving import EmbedBatcher, ServerBusy, WorkerPool
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_requests_beyond_the_queue_are_rejected():
+    pool = WorkerPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+    running = threading.Thread(target=pool.run, args=(release.wait,))
+    running.start()
+    _wait_for(lambda: pool.active == 1)
+    queued = threading.Thread(target=pool.run, args=(lambda: None,))
+    queued.start()
+    _wait_for(lambda: pool.waiting == 1)
+
+    with pytest.raises(ServerBusy):
+        pool.run(lambda: None)
+    release.set()
+    running.join()
+    queued.join()
+    stats = pool.stats()
+    assert (stats["completed"], stats["rejected"], stats["active"]) == (2, 1, 0)
+
+
+def test_waiting_past_the_timeout_is_rejected():
+    pool = WorkerPool(max_workers=1, max_queue=4, timeout_s=0.05)
+    with pool.slot():
+        with pytest.raises(ServerBusy):
+            pool.run(lambda: None)
+    assert pool.run(lambda: "ok") == "ok"
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        self.batches.append(list(texts))
+        return np.array([[float(len(t))] for t in texts])
+
+
+def test_concurrent_queries_share_an_encode_call():
+    embedder = CountingEmbedder()
+    batcher = EmbedBatcher(embedder, max_batch=8, max_wait_ms=50)
+    texts = ["a", "bb", "ccc", "dddd"]
+    results = [batcher.encode_many(texts)]
+    assert [float(v[0]) for v in results[0]] == [1.0, 2.0, 3.0, 4.0]
+    assert embedder.batches == [texts]
+
+    threads = [threading.Thread(target=lambda t=t: results.append(batcher.encode(t)))
+               for t in ("x", "yy")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(embedder.batches) == 2 and sorted(embedder.batches[1]) == ["x", "yy"]
+    assert batcher.stats()["largest_batch"] == 4
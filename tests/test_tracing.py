@@ -0,0 +1,24 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import config, tracing
+
+
+def test_bound_tasks_land_on_the_callers_trace(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TRACING", True)
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+
+    def work(i):
+        with tracing.span(f"sub{i}"):
+            return sum(range(1000))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        with tracing.request("question") as trace:
+            with tracing.span("multi_search"):
+                futures = [pool.submit(tracing.bind(work), i) for i in range(2)]
+                [f.result() for f in futures]
+    spans = {sp["name"]: sp["depth"] for sp in trace.to_dict()["spans"]}
+    assert spans == {"multi_search": 0, "sub0": 1, "sub1": 1}
+    assert os.path.exists(trace.profile_path)
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from second_brain import vector_store
+from second_brain.vector_store import FlatIndex, current_generation
+
+
+def _write(path, n, dtype="int8"):
+    rng = np.random.default_rng(n)
+    ids = [f"c{i}" for i in range(n)]
+    FlatIndex.write(str(path), ids, rng.normal(size=(n, 8)), ids,
+                    [{"n": i} for i in range(n)], dtype=dtype, version=str(n))
+
+
+def test_open_index_survives_rewrite(tmp_path):
+    _write(tmp_path, 10)
+    old = FlatIndex(str(tmp_path))
+    _write(tmp_path, 25, dtype="float16")
+    new = FlatIndex(str(tmp_path))
+    assert new.generation != old.generation == "gen-000001"
+    # the old reader still sees its own consistent rows, ids and scales
+    assert len(old) == 10 and old._vectors.shape[0] == 10
+    assert old.search(old.vectors(["c3"]), 1)[0][0][0] == 3
+    assert len(new) == 25 and new.dtype == "float16"
+    _write(tmp_path, 5)
+    assert sorted(d for d in os.listdir(tmp_path) if d.startswith("gen-")) == \
+        ["gen-000002", "gen-000003"]
+    assert current_generation(str(tmp_path)) == "gen-000003"
+
+
+def test_filtered_rows_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "FILTER_CACHE_SIZE", 3)
+    _write(tmp_path, 10)
+    index = FlatIndex(str(tmp_path))
+    for i in range(5):
+        rows = index.matching_rows(lambda m, i=i: m["n"] >= i, key=str(i))
+        assert rows.tolist() == list(range(i, 10))
+    assert list(index._filtered_rows) == ["2", "3", "4"]
+
+
+def test_empty_int8_index(tmp_path):
+    FlatIndex.write(str(tmp_path), [], [], [], [], dtype="int8")
+    index = FlatIndex(str(tmp_path))
+    assert len(index) == 0 and index.dtype == "int8"
+    assert index._scales.shape == (0,)
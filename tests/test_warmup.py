@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from second_brain.warmup import Warmup
+
+
+def test_steps_run_in_order_and_a_failure_is_skipped():
+    ran = []
+
+    def fail():
+        ran.append("clip")
+        raise RuntimeError("no weights")
+    warmup = Warmup(steps=[("embedder", lambda: ran.append("embedder")), ("clip", fail),
+                           ("llm", lambda: ran.append("llm"))])
+    assert "Warming up" in warmup.summary()
+    warmup.start()._thread.join()
+    assert ran == ["embedder", "clip", "llm"]
+    stats = warmup.stats()
+    assert stats["ready"]
+    assert {n: s["state"] for n, s in stats["steps"].items()} == \
+        {"embedder": "ready", "clip": "failed", "llm": "ready"}
+    assert stats["steps"]["clip"]["error"] == "no weights"
+    assert "clip failed to load" in warmup.summary()
+
+
+def test_importing_the_pipeline_loads_no_models():
+    code = ("import sys; import second_brain.pipeline, second_brain.warmup; "
+            "print(sorted(m for m in ('torch', 'sentence_transformers', 'transformers', "
+            "'chromadb', 'gradio') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -1,23 +1,26 @@
-import os
-import chromadb
-from sentence_transformers import SentenceTransformer
+import argparse
+import time
 
-# --- 1. Configuration ---
-# The path MUST be the same as in your build and verification scripts
-db_path = os.path.join("data", "chroma_db")
+import numpy as np
+
+from second_brain import config
+from second_brain.resources import get_collection, get_embedder, get_vector_store
+from second_brain.retrieval import dense_search
+from second_brain.vector_store import recall_at_k
 
-# Load the same text embedding model you used to create the database
-# This is crucial for getting accurate results.
+# --- 1. Configuration ---
+# The database path, collection and embedding model come from
+# second_brain/config.py, the same ones the build script uses.
 print("Loading embedding model...")
-text_model = SentenceTransformer("all-MiniLM-L6-v2")
+text_model = get_embedder()
 print("Model loaded.")
 
 # --- 2. Connect to the Persistent Database ---
-print(f"Connecting to ChromaDB at: {db_path}")
+print(f"Connecting to ChromaDB at: {config.DB_PATH}")
 try:
-    client = chromadb.PersistentClient(path=db_path)
-    collection = client.get_collection(name="ai_second_brain")
-    print("Successfully connected to the 'ai_second_brain' collection.")
+    collection = get_collection()
+    print(f"Successfully connected to the '{config.COLLECTION}' collection "
+          f"(dense search backend: {config.VECTOR_BACKEND}).")
 except Exception as e:
     print(f"\n❌ Failed to connect to ChromaDB: {e}")
     exit() # Exit the script if connection fails
@@ -32,7 +35,8 @@ def search(query_text, n_results=5):
         n_results (int): The number of results to return.
 
     Returns:
-        The results of the query.
+        The results of the query, as lists of distances, metadatas and
+        documents for the single query.
     """
     if not query_text:
         print("Query cannot be empty.")
@@ -41,26 +45,57 @@ def search(query_text, n_results=5):
     print(f"\n🔍 Searching for: '{query_text}'...")
 
     # Create an embedding for the query text
-    query_embedding = text_model.encode(query_text).tolist()
+    query_embedding = text_model.encode(query_text)
+
+    # Perform the query through the configured backend (Chroma or flat index)
+    hits = dense_search(query_embedding, n_results)
+    return {
+        "distances": [[h["distance"] for h in hits]],
+        "metadatas": [[h["metadata"] for h in hits]],
+        "documents": [[h["document"] for h in hits]],
+    }
+
 
-    # Perform the query
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=n_results,
-        include=["metadatas", "documents", "distances"] # Specify what to include in the results
-    )
+# --- 3b. Flat index vs Chroma ---
+def compare_backends(n_queries=200, k=10):
+    """
+    Recall@k of the flat index against Chroma, and batched search latency
+    of each, using stored chunk embeddings (lightly perturbed) as queries.
+    """
+    index = get_vector_store()
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(index), size=min(n_queries, len(index)), replace=False)
+    queries = index.vectors([index.ids[r] for r in rows])
+    queries += rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+
+    t = time.perf_counter()
+    collection.query(query_embeddings=queries.tolist(), n_results=k, include=[])
+    chroma_ms = (time.perf_counter() - t) * 1000 / len(queries)
+    t = time.perf_counter()
+    index.search(queries, k)
+    flat_ms = (time.perf_counter() - t) * 1000 / len(queries)
 
-    return results
+    recall = recall_at_k(index, collection, queries, k)
+    print(f"\nFlat index ({index.dtype}, {len(index)} vectors) vs Chroma, "
+          f"{len(queries)} queries:")
+    print(f"   recall@{k}: {recall:.4f}")
+    print(f"   Chroma: {chroma_ms:.2f} ms/query   flat: {flat_ms:.2f} ms/query")
 
 # --- 4. Example Usage ---
 if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--query", default="what is a transformer model")
+    p.add_argument("--compare", action="store_true",
+                   help="measure recall@k and latency of the flat index against Chroma")
+    args = p.parse_args()
+
     # Check if the collection is empty before searching
     if collection.count() == 0:
         print("\n⚠️ The collection is empty. Please run your build script first.")
     else:
         # --- Perform a search ---
-        # Change this query to whatever you want to find!
-        my_query = "what is a transformer model"
+        # Pass --query to search for something else
+        my_query = args.query
         search_results = search(my_query, n_results=5)
 
         # --- Print the results ---
@@ -89,4 +124,7 @@ if __name__ == "__main__":
                 else:
                     # The 'documents' field contains the text chunk
                     print(f"   Content:     \"{documents[i]}...\"")
-                print("-" * 20)
\ No newline at end of file
+                print("-" * 20)
+
+        if args.compare:
+            compare_backends()